@@ -0,0 +1,172 @@
+class Field:
+    """
+    Поле ответа: какие столбцы нужны из базы (пути для only())
+    и как получить значение из объекта.
+    """
+
+    def __init__(self, columns, get):
+        self.columns = columns
+        self.get = get
+
+
+class Serializer:
+    """
+    Представление объекта модели в JSON.
+
+    fields — поля ответа в порядке вывода, includes — связанные
+    объекты, которые по ?include= встраиваются целиком вместо
+    короткой ссылки: имя поля и сериализатор связанной модели.
+    Из базы читаются только столбцы выбранных полей, а встроенные
+    объекты приходят тем же запросом через select_related.
+    """
+
+    fields = {}
+    includes = {}
+    # Столбцы, которые меняются при любой правке объекта: по ним
+    # считается ETag без чтения самих данных
+    versions = ('id',)
+
+    def __init__(self, fields=None, include=()):
+        unknown = set(fields or ()) - set(self.fields)
+        unknown |= set(include) - set(self.includes)
+        if unknown:
+            raise ValueError(
+                'Неизвестные поля: ' + ', '.join(sorted(unknown))
+            )
+        self.selected = [
+            name for name in self.fields
+            if not fields or name in fields or name in include
+        ]
+        self.included = {
+            name: self.includes[name]()
+            for name in include if name in self.selected
+        }
+
+    def columns(self, prefix=''):
+        """
+        Столбцы для only() и связи для select_related(), которые
+        нужны выбранным полям, с префиксом пути от основной модели.
+        """
+        columns, related = set(), set()
+        for name in self.selected:
+            if name in self.included:
+                path = f'{prefix}{name}'
+                nested_columns, nested_related = self.included[name].columns(
+                    f'{path}__',
+                )
+                columns |= {path} | nested_columns
+                related |= {path} | nested_related
+                continue
+            for column in self.fields[name].columns:
+                columns.add(f'{prefix}{column}')
+                if '__' in column:
+                    related.add(f'{prefix}{column.rsplit("__", 1)[0]}')
+        return columns, related
+
+    def prepare(self, queryset, extra=()):
+        """
+        Queryset, который читает только нужные столбцы и связи.
+        В extra передаются столбцы, нужные не ответу, а запросу,
+        например ключ сортировки для курсора.
+        """
+        columns, related = self.columns()
+        pk = queryset.model._meta.pk.name
+        columns |= {pk if column == 'pk' else column for column in extra}
+        if related:
+            queryset = queryset.select_related(*sorted(related))
+        return queryset.only(*sorted(columns))
+
+    def version_columns(self, prefix=''):
+        """Столбцы версий объекта и встроенных в ответ связанных объектов."""
+        columns = [f'{prefix}{column}' for column in self.versions]
+        for name, serializer in self.included.items():
+            columns += serializer.version_columns(f'{prefix}{name}__')
+        return columns
+
+    def to_dict(self, obj):
+        data = {}
+        for name in self.selected:
+            if name in self.included:
+                related = getattr(obj, name)
+                data[name] = (
+                    self.included[name].to_dict(related)
+                    if related is not None else None
+                )
+            else:
+                data[name] = self.fields[name].get(obj)
+        return data
+
+
+def _username(attribute):
+    def get(obj):
+        user = getattr(obj, attribute)
+        return user.username
+    return get
+
+
+class UserSerializer(Serializer):
+    fields = {
+        'id': Field(('id',), lambda user: user.pk),
+        'username': Field(('username',), lambda user: user.username),
+        'first_name': Field(('first_name',), lambda user: user.first_name),
+        'last_name': Field(('last_name',), lambda user: user.last_name),
+    }
+    versions = ('id', 'username', 'first_name', 'last_name')
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': Field(('id',), lambda group: group.pk),
+        'title': Field(('title',), lambda group: group.title),
+        'slug': Field(('slug',), lambda group: group.slug),
+        'description': Field(
+            ('description',), lambda group: group.description,
+        ),
+    }
+    versions = ('id', 'title', 'slug', 'description')
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': Field(('id',), lambda post: post.pk),
+        'text': Field(('text',), lambda post: post.text),
+        'pub_date': Field(('pub_date',), lambda post: post.pub_date),
+        'author': Field(('author', 'author__username'), _username('author')),
+        'group': Field(
+            ('group', 'group__slug'),
+            lambda post: post.group.slug if post.group_id else None,
+        ),
+        'image': Field(
+            ('image',),
+            lambda post: post.image.url if post.image else None,
+        ),
+        'comment_count': Field(
+            ('comment_count',), lambda post: post.comment_count,
+        ),
+    }
+    includes = {'author': UserSerializer, 'group': GroupSerializer}
+    versions = ('id', 'version', 'comment_count')
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': Field(('id',), lambda comment: comment.pk),
+        'post': Field(('post',), lambda comment: comment.post_id),
+        'author': Field(
+            ('author', 'author__username'), _username('author'),
+        ),
+        'text': Field(('text',), lambda comment: comment.text),
+        'created': Field(('created',), lambda comment: comment.created),
+    }
+    includes = {'author': UserSerializer}
+
+
+class FollowSerializer(Serializer):
+    fields = {
+        'id': Field(('id',), lambda follow: follow.pk),
+        'user': Field(('user', 'user__username'), _username('user')),
+        'author': Field(
+            ('author', 'author__username'), _username('author'),
+        ),
+    }
+    includes = {'author': UserSerializer}
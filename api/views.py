@@ -0,0 +1,409 @@
+import base64
+import binascii
+import hashlib
+import itertools
+import json
+from functools import wraps
+
+from django.contrib.auth import authenticate
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (
+    Http404, HttpResponse, JsonResponse, StreamingHttpResponse,
+)
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.views.decorators.csrf import csrf_exempt
+
+from posts import graph, images
+from posts.forms import CommentForm, PostForm
+from posts.models import Follow, Group, Post, User
+from posts.paginator import CursorPaginator, InvalidCursor
+from posts.permissions import can_edit, can_follow
+from yatube.metrics import query_budget
+from yatube.routers import read_only, use_primary
+from yatube.sqlite import retry_on_lock
+
+from .serializers import (
+    CommentSerializer, FollowSerializer, GroupSerializer, PostSerializer,
+    UserSerializer,
+)
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+SAFE_METHODS = ('GET', 'HEAD')
+
+_encoder = DjangoJSONEncoder()
+_csrf = CsrfViewMiddleware()
+
+
+class BadRequest(Exception):
+    pass
+
+
+def error(status, detail, **extra):
+    return JsonResponse({'detail': detail, **extra}, status=status)
+
+
+def unauthorized():
+    response = error(401, 'Нужна авторизация')
+    response['WWW-Authenticate'] = 'Basic realm="yatube"'
+    return response
+
+
+def _basic_user(request):
+    """
+    Пользователь из заголовка Authorization: Basic. None — заголовка
+    нет, False — логин или пароль не подошли.
+    """
+    scheme, _, credentials = request.META.get(
+        'HTTP_AUTHORIZATION', '',
+    ).partition(' ')
+    if scheme.lower() != 'basic':
+        return None
+    try:
+        decoded = base64.b64decode(credentials, validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        return False
+    username, _, password = decoded.partition(':')
+    user = authenticate(request, username=username, password=password)
+    return user or False
+
+
+def api_view(*methods):
+    """
+    Представление API: принимает только перечисленные методы, пускает
+    по сессии или HTTP Basic и отвечает об ошибках в JSON. Запись
+    по сессии браузера, как и в формах сайта, требует CSRF-токена,
+    а по Basic — нет: такой запрос чужая страница подделать не может.
+    Запись выполняется в транзакции с повтором при блокировке SQLite.
+    """
+    allowed = set(methods) | ({'HEAD'} if 'GET' in methods else set())
+
+    def decorator(view):
+        write = retry_on_lock(view)
+
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in allowed:
+                response = error(405, 'Метод не поддерживается')
+                response['Allow'] = ', '.join(sorted(allowed))
+                return response
+            user = _basic_user(request)
+            if user is False:
+                return unauthorized()
+            if user is not None:
+                request.user = user
+            safe = request.method in SAFE_METHODS
+            if not safe and not request.user.is_authenticated:
+                return unauthorized()
+            if not safe and user is None and \
+                    _csrf.process_view(request, None, (), {}) is not None:
+                return error(403, 'Нет CSRF-токена')
+            try:
+                return (view if safe else write)(request, *args, **kwargs)
+            except Http404:
+                return error(404, 'Не найдено')
+            except BadRequest as reason:
+                return error(400, str(reason))
+        return wrapper
+    return decorator
+
+
+def _serializer(serializer_class, params):
+    """Сериализатор с полями из ?fields= и связями из ?include=."""
+    fields, include = (
+        [name for name in params.get(key, '').split(',') if name]
+        for key in ('fields', 'include')
+    )
+    try:
+        return serializer_class(fields, include)
+    except ValueError as reason:
+        raise BadRequest(str(reason))
+
+
+def _limit(params):
+    try:
+        limit = int(params.get('limit', PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return min(max(limit, 1), MAX_PAGE_SIZE)
+
+
+def _payload(request):
+    """Тело записи: JSON-объект или, для POST, обычная форма."""
+    if request.content_type != 'application/json':
+        if request.method != 'POST':
+            raise BadRequest('Ожидается тело в JSON')
+        return request.POST.dict(), request.FILES
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise BadRequest('Некорректный JSON')
+    if not isinstance(data, dict):
+        raise BadRequest('Ожидается JSON-объект')
+    return data, None
+
+
+def _etag(rows):
+    """ETag по столбцам версий: сами данные для него не читаются."""
+    digest = hashlib.md5(repr(list(rows)).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _cached(response, etag):
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ('Cookie', 'Authorization'))
+    return response
+
+
+def _stream(objects, serializer, paginator, limit, request):
+    yield '{"results": ['
+    last = None
+    for number, obj in enumerate(objects):
+        if number == limit:
+            break
+        yield (', ' if number else '') + _encoder.encode(
+            serializer.to_dict(obj),
+        )
+        last = obj
+    else:
+        last = None
+    next_url = None
+    if last is not None:
+        params = request.GET.copy()
+        params['after'] = paginator.cursor(last)
+        next_url = f'{request.path}?{params.urlencode()}'
+    yield f'], "next": {_encoder.encode(next_url)}}}'
+
+
+def list_response(request, queryset, serializer_class):
+    """
+    Страница списка по курсору after, ответ пишется потоком по одному
+    объекту. Если у клиента та же версия страницы, отвечает 304.
+    """
+    serializer = _serializer(serializer_class, request.GET)
+    limit = _limit(request.GET)
+    paginator = CursorPaginator(queryset, limit, jump_limit=0)
+    try:
+        rows = paginator.after(request.GET)
+    except InvalidCursor:
+        raise BadRequest('Некорректный курсор after')
+    etag = _etag(
+        rows[:limit + 1].values_list(*serializer.version_columns()),
+    )
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return _cached(response, etag)
+    ordering = [field.lstrip('-') for field in paginator.ordering]
+    objects = serializer.prepare(rows, ordering)[:limit + 1].iterator()
+    # Первый объект читается здесь, чтобы запрос выполнился внутри
+    # представления: с выбранной репликой и в учёте метрик
+    first = list(itertools.islice(objects, 1))
+    response = StreamingHttpResponse(
+        _stream(
+            itertools.chain(first, objects), serializer, paginator, limit,
+            request,
+        ),
+        content_type='application/json',
+    )
+    return _cached(response, etag)
+
+
+def object_response(request, queryset, serializer_class):
+    """Один объект с ETag по его версии."""
+    serializer = _serializer(serializer_class, request.GET)
+    version = queryset.values_list(*serializer.version_columns())[:1]
+    if not version:
+        raise Http404
+    etag = _etag(version)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        obj = serializer.prepare(queryset).get()
+        response = JsonResponse(serializer.to_dict(obj))
+    return _cached(response, etag)
+
+
+def created(serializer_class, obj):
+    return JsonResponse(serializer_class().to_dict(obj), status=201)
+
+
+def invalid(form):
+    return error(400, 'Ошибка в данных', errors=form.errors)
+
+
+def _group_by_slug(data):
+    # В ответах группа — это slug, и в запросах тоже принимается slug
+    slug = data.get('group')
+    if slug and not isinstance(slug, int):
+        group = Group.objects.filter(slug=slug).values_list('pk', flat=True)
+        data['group'] = group.first() or slug
+    return data
+
+
+@read_only
+@use_primary
+@api_view('GET', 'POST')
+def posts(request):
+    if request.method in SAFE_METHODS:
+        queryset = Post.objects.order_by('-pub_date', '-pk')
+        if request.GET.get('author'):
+            queryset = queryset.filter(
+                author__username=request.GET['author'],
+            )
+        if request.GET.get('group'):
+            queryset = queryset.filter(group__slug=request.GET['group'])
+        return list_response(request, queryset, PostSerializer)
+
+    data, files = _payload(request)
+    form = PostForm(_group_by_slug(data), files=files)
+    if not form.is_valid():
+        return invalid(form)
+    post = form.save(commit=False)
+    post.author = request.user
+    post.save()
+    images.schedule(post)
+    return created(PostSerializer, post)
+
+
+@read_only
+@use_primary
+@api_view('GET', 'PATCH', 'DELETE')
+def post_detail(request, post_id):
+    if request.method in SAFE_METHODS:
+        return object_response(
+            request, Post.objects.filter(pk=post_id), PostSerializer,
+        )
+
+    post = get_object_or_404(Post, pk=post_id)
+    if not can_edit(request.user, post):
+        return error(403, 'Изменять пост может только автор')
+    if request.method == 'DELETE':
+        post.delete()
+        return HttpResponse(status=204)
+
+    data, _ = _payload(request)
+    form = PostForm(
+        _group_by_slug({'text': post.text, 'group': post.group_id, **data}),
+        instance=post,
+    )
+    if not form.is_valid():
+        return invalid(form)
+    form.save()
+    return JsonResponse(PostSerializer().to_dict(post))
+
+
+@read_only
+@use_primary
+@api_view('GET', 'POST')
+def comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.method in SAFE_METHODS:
+        return list_response(
+            request,
+            post.comments.order_by('created', 'pk'),
+            CommentSerializer,
+        )
+
+    data, _ = _payload(request)
+    form = CommentForm(data)
+    if not form.is_valid():
+        return invalid(form)
+    comment = form.save(commit=False)
+    comment.post = post
+    comment.author = request.user
+    comment.save()
+    return created(CommentSerializer, comment)
+
+
+@query_budget(4)
+@read_only
+@api_view('GET')
+def groups(request):
+    return list_response(
+        request, Group.objects.order_by('pk'), GroupSerializer,
+    )
+
+
+@query_budget(4)
+@read_only
+@api_view('GET')
+def group_detail(request, slug):
+    return object_response(
+        request, Group.objects.filter(slug=slug), GroupSerializer,
+    )
+
+
+def _authors(data):
+    """id авторов по списку имён из поля authors."""
+    usernames = data.get('authors')
+    if not isinstance(usernames, list) or \
+            not all(isinstance(name, str) for name in usernames):
+        raise BadRequest('authors должен быть списком имён')
+    return User.objects.filter(
+        username__in=usernames,
+    ).values_list('pk', flat=True)
+
+
+@use_primary
+@api_view('GET', 'POST', 'DELETE')
+def follows(request):
+    """
+    Подписки пользователя. POST с author подписывает на одного автора,
+    а POST и DELETE со списком authors — сразу на нескольких или
+    от нескольких.
+    """
+    if not request.user.is_authenticated:
+        return unauthorized()
+    if request.method in SAFE_METHODS:
+        return list_response(
+            request,
+            Follow.objects.filter(user=request.user).order_by('pk'),
+            FollowSerializer,
+        )
+
+    data, _ = _payload(request)
+    if request.method == 'DELETE':
+        deleted = graph.unfollow(request.user, _authors(data))
+        return JsonResponse({'deleted': deleted})
+    if 'authors' in data:
+        followed = graph.follow(request.user, _authors(data))
+        return JsonResponse({'created': len(followed)}, status=201)
+    author = get_object_or_404(User, username=data.get('author') or '')
+    if not can_follow(request.user, author):
+        return error(400, 'Подписка невозможна', errors={
+            'author': ['Нельзя подписаться на себя или повторно'],
+        })
+    follow, _ = Follow.objects.get_or_create(
+        user=request.user, author=author,
+    )
+    return created(FollowSerializer, follow)
+
+
+@use_primary
+@api_view('DELETE')
+def follow_detail(request, username):
+    deleted, _ = Follow.objects.filter(
+        user=request.user, author__username=username,
+    ).delete()
+    if not deleted:
+        raise Http404
+    return HttpResponse(status=204)
+
+
+@query_budget(5)
+@read_only
+@api_view('GET')
+def suggestions(request):
+    """Авторы, которых читают те, на кого подписан пользователь."""
+    if not request.user.is_authenticated:
+        return unauthorized()
+    serializer = _serializer(UserSerializer, request.GET)
+    authors = graph.suggestions(request.user, _limit(request.GET))
+    return JsonResponse({
+        'results': [serializer.to_dict(author) for author in authors],
+    })
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post, Comment, Follow
 
 
@@ -9,6 +10,15 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date", "group")
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # В строке без слов искать по индексу нечего: MATCH '' — ошибка
+        if not search.match_expression(search_term) or not search.available():
+            return super().get_search_results(
+                request, queryset, search_term,
+            )
+        matching = search.matching_posts(search_term)
+        return queryset.filter(pk__in=matching), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("pk", "title", "slug", "description")
@@ -0,0 +1,20 @@
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models import F
+
+# Имя фрагмента {% cache %} в includes_posts/post_item.html
+CARD_FRAGMENT = 'post_card'
+
+
+def card_key(post):
+    return make_template_fragment_key(CARD_FRAGMENT, [post.pk, post.version])
+
+
+def forget(post):
+    """Удаляет из кеша карточку текущей версии поста."""
+    cache.delete(card_key(post))
+
+
+def bump(posts):
+    """Выпускает новую версию постов, старые карточки больше не читаются."""
+    posts.update(version=F('version') + 1)
@@ -0,0 +1,175 @@
+import datetime
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import counters, groups, versions
+from .models import Comment, GroupStats, Post, User
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def _version_key(scope):
+    return f'page:{scope}:version'
+
+
+def post_scopes(post, group_id=None):
+    """
+    Страницы, на которых видна карточка поста: автора и группы. group_id
+    — прежняя группа поста, если он из неё ушёл.
+    """
+    scopes = [author_scope(post.author_id)]
+    for group in {post.group_id, group_id} - {None}:
+        scopes.append(group_scope(group))
+    return scopes
+
+
+def forget(*scopes):
+    """
+    Меняет ETag и Last-Modified страниц scopes. Вызывается при каждой
+    записи, которую видно на странице, кроме счётчиков автора и группы:
+    они и так входят в ETag.
+    """
+    versions.bump(*(_version_key(scope) for scope in scopes))
+
+
+def _changed(scope):
+    stamp = versions.current(_version_key(scope))
+    return datetime.datetime.fromtimestamp(
+        stamp / 1000, tz=datetime.timezone.utc,
+    )
+
+
+def _comments_state(comments):
+    # Число комментариев берётся из comment_count постов, а дата
+    # последнего читается по индексу (post, created)
+    return comments.aggregate(newest=Max('created'))
+
+
+def _first(rows):
+    # first() добавил бы сортировку по pk, которая здесь не нужна
+    rows = list(rows[:1])
+    return rows[0] if rows else None
+
+
+def _author_state(username):
+    author = _first(User.objects.select_related('stats').filter(
+        username=username,
+    ))
+    if author is None:
+        return None
+    stats = counters.for_user(author)
+    return (
+        author.pk, author.first_name, author.last_name,
+        *(getattr(stats, name) for name in counters.FIELDS),
+    )
+
+
+def _post_state(username, post_id):
+    author = _author_state(username)
+    post = _first(Post.objects.filter(
+        pk=post_id, author__username=username,
+    ).order_by().values(
+        'pub_date', 'version', 'group_id', 'comment_count',
+    ))
+    if author is None or post is None:
+        return None
+    comments = _comments_state(Comment.objects.filter(post_id=post_id))
+    return (author, post, comments), (post['pub_date'], comments['newest'])
+
+
+def _profile_state(username):
+    author = _author_state(username)
+    if author is None:
+        return None
+    # Дата последнего поста читается по индексу (author, pub_date),
+    # остальное на странице меняется вместе с версией автора
+    newest = _first(Post.objects.filter(author_id=author[0]).order_by(
+        '-pub_date',
+    ).values_list('pub_date', flat=True))
+    changed = _changed(author_scope(author[0]))
+    return (author, newest, changed), (newest, changed)
+
+
+def _group_state(slug):
+    group = groups.lookup(slug)
+    if group is None:
+        return None
+    # Дату последнего поста хранит статистика группы
+    stats = _first(GroupStats.objects.filter(group_id=group.pk).values_list(
+        *counters.GROUP_FIELDS,
+    ))
+    changed = _changed(group_scope(group.pk))
+    newest = stats[-1] if stats else None
+    group = (group.pk, group.title, group.description)
+    return (group, stats, changed), (newest, changed)
+
+
+def _state(request, build, kwargs):
+    # condition() спрашивает ETag и Last-Modified по отдельности,
+    # а база должна быть опрошена один раз за запрос
+    if not hasattr(request, '_page_state'):
+        request._page_state = build(**kwargs)
+    return request._page_state
+
+
+def conditional_page(build):
+    """
+    Условный GET для страницы: ETag и Last-Modified считаются
+    запросом build(**kwargs) по датам, счётчикам и версиям страниц,
+    без отрисовки шаблона, и при совпадении отдаётся 304.
+
+    ETag учитывает всё, что видно на странице, зрителя и его CSRF-cookie:
+    кнопки подписки, ссылки на редактирование и токены форм у каждого
+    свои. Last-Modified
+    отдаётся только анонимам — по нему не отличить правку поста или
+    удаление от старой страницы, поэтому клиенты, приславшие оба
+    заголовка, проверяются по ETag. Ответ помечен no-cache и
+    Vary: Cookie, чтобы прокси не отдавали его без перепроверки
+    и не смешивали страницы разных пользователей.
+    """
+    def etag(request, **kwargs):
+        state = _state(request, build, kwargs)
+        if state is None:
+            return None
+        viewer = request.user.pk if request.user.is_authenticated else None
+        # Формы страницы несут CSRF-токен: после смены cookie старая
+        # копия с прежним токеном не должна считаться свежей
+        csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        fingerprint = repr((state[0], viewer, csrf)).encode()
+        return hashlib.md5(fingerprint).hexdigest()
+
+    def last_modified(request, **kwargs):
+        state = _state(request, build, kwargs)
+        if state is None or request.user.is_authenticated:
+            return None
+        dates = [date for date in state[1] if date is not None]
+        return max(dates) if dates else None
+
+    def decorator(view):
+        conditional = condition(etag_func=etag,
+                                last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+post_page = conditional_page(_post_state)
+profile_page = conditional_page(_profile_state)
+group_page = conditional_page(_group_state)
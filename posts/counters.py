@@ -0,0 +1,201 @@
+from django.db import transaction
+from django.db.models import (
+    Count, DateTimeField, F, IntegerField, Max, OuterRef, Q, Subquery,
+)
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, GroupStats, Post, User, UserStats
+
+# Счётчик и поле модели-источника, по которому он считается
+SOURCES = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+    'comments_count': (Comment, 'author'),
+}
+FIELDS = tuple(SOURCES)
+GROUP_FIELDS = ('posts_count', 'authors_count', 'last_post')
+
+
+def _source_count(model, field):
+    counts = model.objects.filter(
+        **{field: OuterRef('pk')},
+    ).order_by().values(field).annotate(count=Count('pk'))
+    return Coalesce(
+        Subquery(counts.values('count'), output_field=IntegerField()),
+        0,
+    )
+
+
+def source_counts(users):
+    """Пользователи с счётчиками, посчитанными по исходным таблицам."""
+    return users.annotate(**{
+        name: _source_count(model, field)
+        for name, (model, field) in SOURCES.items()
+    })
+
+
+def for_user(user):
+    """
+    Счётчики пользователя. Если строки со счётчиками ещё нет,
+    она создаётся по исходным таблицам.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        pass
+    counted = source_counts(User.objects.filter(pk=user.pk)).get()
+    stats, _ = UserStats.objects.get_or_create(
+        user=user,
+        defaults={name: getattr(counted, name) for name in FIELDS},
+    )
+    user.stats = stats
+    return stats
+
+
+def change(user_id, name, delta):
+    """
+    Сдвигает счётчик в базе. Отсутствующие строки не создаются:
+    их посчитает for_user() при первом чтении.
+    """
+    UserStats.objects.filter(user_id=user_id).update(
+        **{name: F(name) + delta},
+    )
+
+
+def change_many(user_ids, name, delta):
+    """Сдвигает один и тот же счётчик у нескольких пользователей сразу."""
+    UserStats.objects.filter(user_id__in=user_ids).update(
+        **{name: F(name) + delta},
+    )
+
+
+def change_comments(post_id, delta):
+    """Сдвигает сохранённое число комментариев поста."""
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + delta,
+    )
+
+
+def group_counts(groups):
+    """Группы со статистикой, посчитанной по постам."""
+    posts = Post.objects.filter(
+        group=OuterRef('pk'),
+    ).order_by().values('group')
+    return groups.annotate(
+        posts_count=Coalesce(Subquery(
+            posts.annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        ), 0),
+        authors_count=Coalesce(Subquery(
+            posts.annotate(
+                count=Count('author', distinct=True),
+            ).values('count'),
+            output_field=IntegerField(),
+        ), 0),
+        last_post=Subquery(
+            posts.annotate(last=Max('pub_date')).values('last'),
+            output_field=DateTimeField(),
+        ),
+    )
+
+
+def for_group(group):
+    """
+    Статистика группы. Если строки ещё нет, она создаётся по постам.
+    """
+    try:
+        return group.stats
+    except GroupStats.DoesNotExist:
+        pass
+    counted = group_counts(Group.objects.filter(pk=group.pk)).get()
+    stats, _ = GroupStats.objects.get_or_create(
+        group=group,
+        defaults={name: getattr(counted, name) for name in GROUP_FIELDS},
+    )
+    group.stats = stats
+    return stats
+
+
+def _has_other_posts(post, group_id):
+    return Post.objects.filter(
+        group_id=group_id, author_id=post.author_id,
+    ).exclude(pk=post.pk).exists()
+
+
+def group_post_added(post, group_id):
+    """Учитывает пост, который появился в группе или перенесён в неё."""
+    stats = GroupStats.objects.filter(group_id=group_id)
+    new_author = not _has_other_posts(post, group_id)
+    stats.update(
+        posts_count=F('posts_count') + 1,
+        authors_count=F('authors_count') + int(new_author),
+    )
+    stats.filter(
+        Q(last_post__isnull=True) | Q(last_post__lt=post.pub_date),
+    ).update(last_post=post.pub_date)
+
+
+def group_post_removed(post, group_id):
+    """
+    Учитывает пост, который удалён или перенесён в другую группу.
+    Дата последней записи перечитывается по индексу (group, pub_date).
+    """
+    stats = GroupStats.objects.filter(group_id=group_id)
+    last_author = not _has_other_posts(post, group_id)
+    last_post = Post.objects.filter(group_id=group_id).exclude(
+        pk=post.pk,
+    ).aggregate(last=Max('pub_date'))['last']
+    stats.update(
+        posts_count=F('posts_count') - 1,
+        authors_count=F('authors_count') - int(last_author),
+        last_post=last_post,
+    )
+
+
+def mismatches():
+    """Пользователи, у которых сохранённые счётчики разошлись с данными."""
+    users = source_counts(User.objects.select_related('stats'))
+    for user in users.iterator():
+        try:
+            stats = user.stats
+        except UserStats.DoesNotExist:
+            continue
+        diff = {
+            name: (getattr(stats, name), getattr(user, name))
+            for name in FIELDS
+            if getattr(stats, name) != getattr(user, name)
+        }
+        if diff:
+            yield user, diff
+
+
+@transaction.atomic
+def rebuild():
+    """
+    Пересчитывает по исходным таблицам счётчики всех пользователей,
+    статистику групп и число комментариев у постов.
+    """
+    Post.objects.update(comment_count=_source_count(Comment, 'post'))
+    GroupStats.objects.all().delete()
+    GroupStats.objects.bulk_create(
+        (
+            GroupStats(
+                group_id=group.pk,
+                **{name: getattr(group, name) for name in GROUP_FIELDS},
+            )
+            for group in group_counts(Group.objects.all()).iterator()
+        ),
+        batch_size=500,
+    )
+    UserStats.objects.all().delete()
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=user.pk,
+                **{name: getattr(user, name) for name in FIELDS},
+            )
+            for user in source_counts(User.objects.all()).iterator()
+        ),
+        batch_size=500,
+    )
@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+
+from . import graph
+from .models import FeedEntry, Follow, Post
+
+POPULAR_AUTHORS_KEY = 'feed:popular_authors'
+POPULAR_AUTHORS_TIMEOUT = 60 * 60
+BATCH_SIZE = 500
+
+
+def fanout_limit():
+    return settings.FEED_FANOUT_LIMIT
+
+
+def popular_authors():
+    """
+    Авторы, чьи посты не раскладываются по лентам подписчиков,
+    а подмешиваются в ленту при чтении.
+    """
+    authors = cache.get(POPULAR_AUTHORS_KEY)
+    if authors is None:
+        authors = set(
+            Follow.objects.values('author')
+            .annotate(followers=Count('pk'))
+            .filter(followers__gte=fanout_limit())
+            .values_list('author', flat=True)
+        )
+        cache.set(POPULAR_AUTHORS_KEY, authors, POPULAR_AUTHORS_TIMEOUT)
+    return authors
+
+
+def _bulk_insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries,
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in popular_authors():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id,
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_ids, author_id):
+    """Добавляет все посты автора в ленты перечисленных пользователей."""
+    posts = list(
+        Post.objects.filter(author_id=author_id).values_list('pk', 'pub_date')
+    )
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for user_id in user_ids
+        for post_id, pub_date in posts
+    )
+
+
+def follow_created(follow):
+    followers = Follow.objects.filter(author_id=follow.author_id).count()
+    if followers == fanout_limit():
+        cache.delete(POPULAR_AUTHORS_KEY)
+    if follow.author_id not in popular_authors():
+        backfill([follow.user_id], follow.author_id)
+
+
+def follow_deleted(follow):
+    FeedEntry.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id,
+    ).delete()
+    followers = Follow.objects.filter(author_id=follow.author_id)
+    if followers.count() == fanout_limit() - 1:
+        # Автор перестал быть популярным: его посты, которые раньше
+        # подмешивались при чтении, нужно разложить по лентам.
+        cache.delete(POPULAR_AUTHORS_KEY)
+        backfill(
+            followers.values_list('user_id', flat=True).iterator(),
+            follow.author_id,
+        )
+
+
+def rebuild(user=None):
+    """Пересобирает ленты с нуля по таблицам Follow и Post."""
+    entries = FeedEntry.objects.all()
+    follows = Follow.objects.exclude(author_id__in=popular_authors())
+    if user is not None:
+        entries = entries.filter(user=user)
+        follows = follows.filter(user=user)
+    entries.delete()
+    for follow in follows.iterator():
+        backfill([follow.user_id], follow.author_id)
+
+
+def timeline(user):
+    """
+    Посты авторов, на которых подписан пользователь, с датой в ленте
+    feed_date. Обычные авторы читаются из материализованной ленты,
+    популярные — подмешиваются напрямую из таблицы постов. Подписки
+    на популярных авторов берутся из кешированного графа подписок.
+    Вторым ключом сортировки идёт feed_post_id: по нему, в отличие
+    от pk поста, лента читается по индексу без досортировки.
+    """
+    popular = list(graph.followees(user.pk) & popular_authors())
+    if not popular:
+        return Post.objects.filter(
+            feed_entries__user=user,
+        ).annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_post_id=F('feed_entries__post'),
+        ).order_by('-feed_date', '-feed_post_id')
+    entries = FeedEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author_id__in=popular)
+    ).annotate(
+        feed_date=F('pub_date'),
+        feed_post_id=F('pk'),
+    ).order_by('-feed_date', '-feed_post_id')
@@ -0,0 +1,163 @@
+import heapq
+from array import array
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+
+from tasks.queue import enqueue
+
+from . import counters, tasks
+from .models import Follow, User
+
+# Множество авторов хранится в кеше отсортированным массивом
+# четырёхбайтовых id: это в разы компактнее списка или set в pickle
+TIMEOUT = 24 * 60 * 60
+# Сколько подписок пользователя смотреть, подбирая ему авторов
+SUGGESTION_SOURCES = 200
+
+
+def _key(user_id):
+    return f'graph:followees:{user_id}'
+
+
+def _pack(author_ids):
+    return array('I', sorted(author_ids)).tobytes()
+
+
+def _unpack(data):
+    author_ids = array('I')
+    author_ids.frombytes(data)
+    return frozenset(author_ids)
+
+
+def followees_many(user_ids):
+    """
+    Авторы, на которых подписан каждый из пользователей: словарь
+    id пользователя → frozenset id авторов. Всё, что есть в кеше,
+    читается одним обращением к нему, остальное — одним запросом.
+    """
+    user_ids = set(user_ids)
+    cached = cache.get_many([_key(user_id) for user_id in user_ids])
+    result = {
+        user_id: _unpack(cached[_key(user_id)])
+        for user_id in user_ids
+        if _key(user_id) in cached
+    }
+    missing = user_ids - set(result)
+    if missing:
+        loaded = {user_id: set() for user_id in missing}
+        rows = Follow.objects.filter(
+            user_id__in=missing,
+        ).values_list('user_id', 'author_id')
+        for user_id, author_id in rows.iterator():
+            loaded[user_id].add(author_id)
+        cache.set_many(
+            {
+                _key(user_id): _pack(author_ids)
+                for user_id, author_ids in loaded.items()
+            },
+            TIMEOUT,
+        )
+        result.update(
+            (user_id, frozenset(author_ids))
+            for user_id, author_ids in loaded.items()
+        )
+    return result
+
+
+def followees(user_id):
+    """Авторы, на которых подписан пользователь."""
+    return followees_many([user_id])[user_id]
+
+
+def follows(user, author_id):
+    """Подписан ли пользователь на автора; гость ни на кого не подписан."""
+    if not user.is_authenticated:
+        return False
+    return author_id in followees(user.pk)
+
+
+def forget(user_id):
+    """
+    Сбрасывает кешированные подписки пользователя. Сброс повторяется
+    после фиксации транзакции: иначе параллельный запрос успел бы
+    положить в кеш подписки, прочитанные до неё.
+    """
+    key = _key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@transaction.atomic
+def follow(user, author_ids):
+    """
+    Подписывает пользователя сразу на несколько авторов одной вставкой.
+    Себя и уже отслеживаемых авторов пропускает, несуществующих тоже.
+    Счётчики сдвигаются сразу на всю пачку, а ленты и рейтинг
+    дополняются в фоне двумя задачами на всю пачку. Возвращает id
+    новых авторов.
+    """
+    author_ids = set(author_ids) - {user.pk}
+    author_ids = set(
+        User.objects.filter(pk__in=author_ids).values_list('pk', flat=True)
+    )
+    rows = Follow.objects.filter(user=user, author_id__in=author_ids)
+    before = set(rows.values_list('author_id', flat=True))
+    if not author_ids - before:
+        return set()
+    Follow.objects.bulk_create(
+        [
+            Follow(user=user, author_id=author_id)
+            for author_id in author_ids - before
+        ],
+        ignore_conflicts=True,
+    )
+    # Часть строк могла успеть вставить параллельная подписка: её
+    # счётчики и задачи уже учтены, поэтому считаются только строки,
+    # которых не было до вставки
+    inserted = dict(
+        rows.exclude(author_id__in=before).values_list('pk', 'author_id')
+    )
+    if not inserted:
+        return set()
+    followed = set(inserted.values())
+    enqueue(tasks.follows_created, sorted(inserted))
+    enqueue(tasks.rescore_authors, sorted(followed))
+    counters.change(user.pk, 'following_count', len(followed))
+    counters.change_many(followed, 'followers_count', 1)
+    forget(user.pk)
+    return followed
+
+
+@transaction.atomic
+def unfollow(user, author_ids):
+    """Отписывает пользователя от нескольких авторов; число отписок."""
+    deleted, _ = Follow.objects.filter(
+        user=user, author_id__in=set(author_ids),
+    ).delete()
+    return deleted
+
+
+def suggestions(user, limit=10):
+    """
+    Авторы, на которых подписаны те, на кого подписан пользователь,
+    по числу таких общих подписок и затем по id. Считаются по
+    кешированному графу: одно обращение к кешу на все его подписки,
+    а из базы читаются только сами предложенные авторы.
+    """
+    mine = followees(user.pk)
+    sources = sorted(mine)[:SUGGESTION_SOURCES]
+    votes = Counter()
+    for theirs in followees_many(sources).values():
+        votes.update(theirs - mine)
+    votes.pop(user.pk, None)
+    author_ids = [
+        author_id
+        for _, author_id in heapq.nsmallest(
+            limit,
+            ((-count, author_id) for author_id, count in votes.items()),
+        )
+    ]
+    authors = User.objects.in_bulk(author_ids)
+    return [authors[pk] for pk in author_ids if pk in authors]
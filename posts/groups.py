@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import Group
+
+# Сколько групп держит в памяти один процесс
+CACHE_SIZE = 256
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+def lookup(slug):
+    """
+    Группа по slug из памяти процесса или из базы; None, если такой нет.
+    Давно не запрошенные группы вытесняются, а запись живёт не дольше
+    GROUP_CACHE_SECONDS: правку в другом процессе этот увидит не позже.
+    Правка или удаление в этом процессе, например в админке, убирает
+    группу из кеша сразу.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(slug)
+        if entry is not None and entry[1] > now:
+            _cache.move_to_end(slug)
+            return entry[0]
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return None
+    with _lock:
+        _cache[slug] = (group, now + settings.GROUP_CACHE_SECONDS)
+        _cache.move_to_end(slug)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return group
+
+
+def forget(group):
+    """
+    Убирает из кеша группу, в том числе под прежним slug, и всё, что
+    закешировано под её новым slug.
+    """
+    with _lock:
+        for slug, (cached, _) in list(_cache.items()):
+            if cached.pk == group.pk or slug == group.slug:
+                del _cache[slug]
+
+
+def clear():
+    with _lock:
+        _cache.clear()
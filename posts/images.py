@@ -0,0 +1,141 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from tasks.queue import enqueue
+
+from . import conditional
+from .models import Post
+
+# Пропорции карточки поста: 960x339
+ASPECT = 339 / 960
+THUMBNAIL_DIR = 'cache/posts'
+# Формат, которым браузер рисует картинку, если не понимает остальные
+FALLBACK_FORMAT = 'jpeg'
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp'}
+SAVE_OPTIONS = {
+    'jpeg': {'quality': 85, 'optimize': True, 'progressive': True},
+    'webp': {'quality': 80, 'method': 4},
+}
+
+_processes = None
+
+
+def processes():
+    global _processes
+    if _processes is None:
+        _processes = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSES or None,
+        )
+    return _processes
+
+
+def variant_size(width):
+    return width, round(width * ASPECT)
+
+
+def variant_name(image_name, width, image_format):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    width, height = variant_size(width)
+    extension = EXTENSIONS[image_format]
+    return f'{THUMBNAIL_DIR}/{stem}_{width}x{height}.{extension}'
+
+
+def thumbnail_name(image_name):
+    """Самый крупный вариант в запасном формате — src для <img>."""
+    return variant_name(
+        image_name,
+        max(settings.POST_IMAGE_WIDTHS),
+        FALLBACK_FORMAT,
+    )
+
+
+def encode_variants(data, widths, formats):
+    """
+    Нарезает картинку на варианты всех ширин и форматов.
+    Работает только с байтами, чтобы её можно было запускать
+    в отдельном процессе.
+    """
+    with Image.open(BytesIO(data)) as source:
+        image = source.convert('RGB')
+    variants = {}
+    for width in widths:
+        frame = ImageOps.fit(image, variant_size(width), Image.LANCZOS)
+        for image_format in formats:
+            buffer = BytesIO()
+            frame.save(
+                buffer,
+                image_format.upper(),
+                **SAVE_OPTIONS.get(image_format, {}),
+            )
+            variants[width, image_format] = buffer.getvalue()
+    return variants
+
+
+def render_variants(image_name):
+    """
+    Сохраняет рядом с кешем sorl.thumbnail кадры карточки всех ширин
+    POST_IMAGE_WIDTHS во всех форматах POST_IMAGE_FORMATS.
+    """
+    with default_storage.open(image_name) as source:
+        data = source.read()
+    arguments = (
+        data,
+        settings.POST_IMAGE_WIDTHS,
+        settings.POST_IMAGE_FORMATS,
+    )
+    if settings.IMAGE_PROCESSES == 0:
+        variants = encode_variants(*arguments)
+    else:
+        variants = processes().submit(encode_variants, *arguments).result()
+    for (width, image_format), content in variants.items():
+        name = variant_name(image_name, width, image_format)
+        default_storage.delete(name)
+        default_storage.save(name, ContentFile(content))
+    return thumbnail_name(image_name)
+
+
+def generate(post_id):
+    """Готовит варианты картинки поста и записывает адрес миниатюры."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author_id', 'group_id',
+    ).first()
+    if post is None or not post.image:
+        return
+    image = post.image.name
+    name = render_variants(image)
+    # Версия меняется, чтобы закешированная карточка взяла миниатюру
+    updated = Post.objects.filter(pk=post_id, image=image).update(
+        thumbnail=name,
+        version=F('version') + 1,
+    )
+    if updated:
+        conditional.forget(*conditional.post_scopes(post))
+
+
+def srcset(post, image_format):
+    """Значение атрибута srcset для картинки поста в заданном формате."""
+    return ', '.join(
+        '{} {}w'.format(
+            post.image.storage.url(
+                variant_name(post.image.name, width, image_format)
+            ),
+            width,
+        )
+        for width in sorted(settings.POST_IMAGE_WIDTHS)
+    )
+
+
+def schedule(post):
+    """Ставит подготовку миниатюры в очередь фоновых задач."""
+    if post.image:
+        from .tasks import thumbnail  # tasks сам импортирует images
+        enqueue(
+            thumbnail, post.pk, key=f'thumbnail:{post.pk}:{post.image.name}',
+        )
@@ -0,0 +1,707 @@
+import asyncio
+import html
+import io
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client, override_settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from posts import counters, feed, search, transfer, trending
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SIZES = (10000, 100000, 1000000)
+POSTS_PER_AUTHOR = 50
+FOLLOWS_PER_USER = 10
+COMMENTS_PER_POST = 0.5
+GROUPS = 20
+BATCH_SIZE = 500
+WORDS = (
+    'пост лента подписка автор группа комментарий картинка текст погода '
+    'город музыка кино книга кофе утро вечер дорога море работа отпуск '
+    'рецепт кот собака сад дом друзья праздник новости спорт'
+).split()
+
+# Доля запросов к каждой странице; add_comment — POST от вошедшего
+MIX = {
+    'index': 30,
+    'group_post': 15,
+    'profile': 20,
+    'post_view': 20,
+    'follow_index': 10,
+    'add_comment': 5,
+}
+LOGIN_REQUIRED = ('follow_index', 'add_comment')
+# Доля запросов ленты ко второй и следующим страницам
+DEEP_PAGES = 0.2
+# До скольких страниц после первой доходят такие запросы
+DEEP_DEPTH = 4
+# Ссылка на следующую страницу в includes_main/paginator.html
+NEXT_LINK = re.compile(r'<a class="page-link" href="\?([^"]*)">Следующая')
+SAMPLE_SIZE = 1000
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, rank):
+    """Перцентиль по ближайшему рангу: значение, не меньше rank% выборки."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * rank // 100) - 1)
+    return ordered[index]
+
+
+def summarize(samples, elapsed):
+    """Сводка по замерам (view, status, seconds, queries) прогона."""
+    by_view = defaultdict(list)
+    for sample in samples:
+        by_view[sample[0]].append(sample)
+    by_view['all'] = samples
+
+    views = {}
+    for view, rows in sorted(by_view.items()):
+        latencies = [row[2] * 1000 for row in rows]
+        views[view] = {
+            'requests': len(rows),
+            'errors': sum(1 for row in rows if row[1] >= 500),
+            'queries': round(sum(row[3] for row in rows) / len(rows), 2),
+            **{
+                f'p{rank}_ms': round(percentile(latencies, rank), 2)
+                for rank in PERCENTILES
+            },
+        }
+    views['all']['rps'] = round(len(samples) / elapsed, 1) if elapsed else 0
+    return views
+
+
+def regressions(result, baseline, tolerance):
+    """
+    Отличия от прошлого прогона хуже допустимого: рост p95 или числа
+    запросов к базе больше чем на tolerance, падение RPS и новые ошибки.
+    """
+    found = []
+    for view, before in baseline['views'].items():
+        after = result['views'].get(view)
+        if after is None:
+            continue
+        for metric in ('p95_ms', 'queries'):
+            if after[metric] > before[metric] * (1 + tolerance):
+                found.append(
+                    f'{view}: {metric} {before[metric]} -> {after[metric]}'
+                )
+        if after['errors'] > before['errors']:
+            found.append(
+                f'{view}: errors {before["errors"]} -> {after["errors"]}'
+            )
+    rps_before = baseline['views']['all']['rps']
+    rps_after = result['views']['all']['rps']
+    if rps_after < rps_before * (1 - tolerance):
+        found.append(f'all: rps {rps_before} -> {rps_after}')
+    return found
+
+
+def random_text():
+    words = random.choices(WORDS, k=random.randint(10, 60))
+    return ' '.join(words).capitalize()
+
+
+def scale(posts):
+    """
+    Дополняет базу синтетическими авторами, группами, постами,
+    подписками и комментариями до posts постов. Популярность авторов
+    распределена по закону Ципфа, так что у первых авторов подписчиков
+    больше FEED_FANOUT_LIMIT. Таблицы пишутся bulk_create в обход
+    сигналов, поэтому ленты, счётчики и поиск затем пересобираются.
+    """
+    missing = posts - Post.objects.count()
+    if missing <= 0:
+        return False
+    start = User.objects.count()
+    authors = max(1, posts // POSTS_PER_AUTHOR)
+    User.objects.bulk_create(
+        (
+            User(username=f'bench{start + i}', password='!')
+            for i in range(authors)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    Group.objects.bulk_create(
+        Group(
+            title=f'Группа {i}',
+            slug=f'bench-{i}',
+            description=random_text(),
+        )
+        for i in range(Group.objects.count(), GROUPS)
+    )
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    group_ids = list(Group.objects.values_list('pk', flat=True)) + [None]
+    weights = list(itertools.accumulate(
+        1 / rank for rank in range(1, len(user_ids) + 1)
+    ))
+
+    now = timezone.now()
+    with transfer.explicit_dates():
+        for offset in range(0, missing, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(
+                    text=random_text(),
+                    author_id=random.choice(user_ids),
+                    group_id=random.choice(group_ids),
+                    pub_date=now - timedelta(minutes=offset + i),
+                )
+                for i in range(min(BATCH_SIZE, missing - offset))
+            )
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        comments = int(missing * COMMENTS_PER_POST)
+        for offset in range(0, comments, BATCH_SIZE):
+            Comment.objects.bulk_create(
+                Comment(
+                    post_id=random.choice(post_ids),
+                    author_id=random.choice(user_ids),
+                    text=random_text(),
+                    created=now - timedelta(seconds=offset + i),
+                )
+                for i in range(min(BATCH_SIZE, comments - offset))
+            )
+
+    follows = set()
+    for user_id in user_ids:
+        for author_id in random.choices(
+            user_ids, cum_weights=weights, k=FOLLOWS_PER_USER,
+        ):
+            if author_id != user_id:
+                follows.add((user_id, author_id))
+    Follow.objects.bulk_create(
+        (Follow(user_id=user, author_id=author) for user, author in follows),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    cache.clear()
+    feed.rebuild()
+    counters.rebuild()
+    trending.rebuild()
+    if search.available():
+        search.rebuild()
+    return True
+
+
+def session_cookies(users):
+    """Cookie сессии и CSRF-токен для каждого пользователя."""
+    cookies = []
+    for user in users:
+        client = Client()
+        client.force_login(user)
+        request = HttpRequest()
+        token = get_token(request)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        cookies.append((
+            f'{settings.SESSION_COOKIE_NAME}={session}; '
+            f'{settings.CSRF_COOKIE_NAME}={request.META["CSRF_COOKIE"]}',
+            token,
+        ))
+    return cookies
+
+
+def next_pages(client, path, depth=DEEP_DEPTH):
+    """
+    Адреса до depth страниц списка path после первой. Как и читатель,
+    бенчмарк доходит до них по ссылке «Следующая» с предыдущей
+    страницы: в длинной ленте там курсор after, а номер ?page=
+    открыл бы первую страницу.
+    """
+    urls = []
+    url = path
+    while len(urls) < depth:
+        response = client.get(url)
+        match = NEXT_LINK.search(response.content.decode())
+        if response.status_code != 200 or match is None:
+            break
+        url = f'{path}?{html.unescape(match.group(1))}'
+        urls.append(url)
+    return urls
+
+
+def build_mix(total, mix, reader=None):
+    """
+    Случайные запросы к страницам ленты в пропорциях mix. Адреса
+    дальних страниц собираются заранее от имени reader: подписки
+    читаются только вошедшим.
+    """
+    posts = list(
+        Post.objects.select_related('author').order_by('?')[:SAMPLE_SIZE]
+    )
+    slugs = list(Group.objects.values_list('slug', flat=True))
+    views = list(mix)
+    weights = [mix[view] for view in views]
+    client = Client()
+    if reader is not None:
+        client.force_login(reader)
+    deep = {}
+
+    def page(path):
+        if random.random() >= DEEP_PAGES:
+            return path
+        if path not in deep:
+            deep[path] = next_pages(client, path)
+        return random.choice(deep[path]) if deep[path] else path
+
+    requests = []
+    for view in random.choices(views, weights, k=total):
+        post = random.choice(posts)
+        # Списки постов, у которых бывают дальние страницы
+        lists = {
+            'index': '/',
+            'group_post': f'/group/{random.choice(slugs)}/',
+            'profile': f'/{post.author.username}/',
+            'follow_index': '/follow/',
+        }
+        paths = {
+            'post_view': f'/{post.author.username}/{post.pk}/',
+            'add_comment': f'/{post.author.username}/{post.pk}/comment',
+        }
+        if view in lists:
+            paths[view] = page(lists[view])
+        request = {'method': 'GET', 'path': paths[view]}
+        if view == 'add_comment':
+            request = {
+                'method': 'POST',
+                'path': paths[view],
+                'data': {'text': random_text()},
+            }
+        request['login'] = view in LOGIN_REQUIRED or random.random() < 0.5
+        requests.append(request)
+    return requests
+
+
+def read_log(path, total):
+    """
+    Запросы из журнала JSONL: строки с полями path и, необязательно,
+    method и data. Строки без path пропускаются. Журнал повторяется
+    по кругу, пока не наберётся total запросов.
+    """
+    requests = []
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict) or not entry.get('path'):
+                continue
+            requests.append({
+                'method': entry.get('method', 'GET').upper(),
+                'path': entry['path'],
+                'data': entry.get('data') or {},
+                'login': entry.get('login', True),
+            })
+    if not requests:
+        raise CommandError(f'В {path} нет строк с полем path')
+    return list(itertools.islice(itertools.cycle(requests), total))
+
+
+def view_name(path):
+    try:
+        return resolve(urlsplit(path).path).url_name or 'other'
+    except Resolver404:
+        return 'not_found'
+
+
+def build_environ(request, cookies):
+    url = urlsplit(request['path'])
+    body = b''
+    environ = {
+        'REQUEST_METHOD': request['method'],
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'SERVER_NAME': '127.0.0.1',
+        'SERVER_PORT': '80',
+        'REMOTE_ADDR': '127.0.0.1',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if request['login'] and cookies:
+        cookie, token = random.choice(cookies)
+        environ['HTTP_COOKIE'] = cookie
+        if request['method'] == 'POST':
+            body = urlencode(
+                {**request.get('data', {}), 'csrfmiddlewaretoken': token}
+            ).encode()
+    environ['CONTENT_TYPE'] = 'application/x-www-form-urlencoded'
+    environ['CONTENT_LENGTH'] = str(len(body))
+    environ['wsgi.input'] = io.BytesIO(body)
+    return environ
+
+
+@contextmanager
+def counting(queries):
+    """Собирает в queries SQL-запросы текущего потока."""
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(
+                connections[alias].execute_wrapper(count_query)
+            )
+        yield
+
+
+def call(application, request, cookies, delay=0):
+    """
+    Прогоняет запрос через WSGI-приложение: (status, секунды, запросы).
+    delay — сколько клиент передаёт запрос и читает ответ: всё это
+    время поток WSGI-сервера занят.
+    """
+    environ = build_environ(request, cookies)
+    statuses = []
+    queries = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    started = time.perf_counter()
+    time.sleep(delay)
+    with counting(queries):
+        response = application(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+    return statuses[0], time.perf_counter() - started, len(queries)
+
+
+def replay(requests, concurrency, cookies, threads=None, delay=0):
+    """
+    Прогон через yatube.wsgi: concurrency клиентов на сервере
+    с threads потоками, лишние клиенты ждут свободный поток в очереди.
+    """
+    from yatube.wsgi import application
+
+    with ThreadPoolExecutor(max_workers=threads or concurrency) as server:
+        def run(request):
+            started = time.perf_counter()
+            status, _, queries = server.submit(
+                call, application, request, cookies, delay,
+            ).result()
+            return (
+                view_name(request['path']), status,
+                time.perf_counter() - started, queries,
+            )
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as clients:
+            samples = list(clients.map(run, requests))
+    return samples, time.perf_counter() - started
+
+
+def counted(asgi_application):
+    """
+    Адаптер yatube.asgi, который возвращает число SQL-запросов
+    в заголовке X-Bench-Queries: запрос выполняется в потоке пула.
+    """
+    class Counted(type(asgi_application)):
+        def run(self, environ):
+            queries = []
+            with counting(queries):
+                status, headers, chunks = super().run(environ)
+            headers.append((b'x-bench-queries', str(len(queries)).encode()))
+            return status, headers, chunks
+
+    return Counted(asgi_application.wsgi_application, None)
+
+
+async def call_asgi(application, request, cookies, delay=0):
+    """
+    Прогоняет запрос через ASGI-приложение. Передача запроса клиентом
+    (delay) идёт в цикле событий и поток пула не занимает.
+    """
+    environ = build_environ(request, cookies)
+    headers = [
+        (b'content-type', environ['CONTENT_TYPE'].encode()),
+        (b'content-length', environ['CONTENT_LENGTH'].encode()),
+    ]
+    if 'HTTP_COOKIE' in environ:
+        headers.append((b'cookie', environ['HTTP_COOKIE'].encode()))
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': environ['REQUEST_METHOD'],
+        'scheme': 'http',
+        'path': environ['PATH_INFO'],
+        'root_path': '',
+        'query_string': environ['QUERY_STRING'].encode(),
+        'headers': headers,
+        'client': ('127.0.0.1', 0),
+        'server': ('127.0.0.1', 80),
+    }
+    body = environ['wsgi.input'].getvalue()
+    result = {}
+
+    async def receive():
+        await asyncio.sleep(delay)
+        return {'type': 'http.request', 'body': body}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            result['status'] = message['status']
+            result['queries'] = int(
+                dict(message['headers']).get(b'x-bench-queries', 0)
+            )
+
+    started = time.perf_counter()
+    await application(scope, receive, send)
+    return result['status'], time.perf_counter() - started, result['queries']
+
+
+async def replay_asgi(requests, concurrency, cookies, threads=None, delay=0):
+    """Прогон через yatube.asgi: concurrency клиентов, пул из threads."""
+    from yatube.asgi import application
+
+    application = counted(application)
+    pending = iter(requests)
+    samples = []
+
+    async def client():
+        for request in pending:
+            status, seconds, queries = await call_asgi(
+                application, request, cookies, delay,
+            )
+            samples.append(
+                (view_name(request['path']), status, seconds, queries)
+            )
+
+    with ThreadPoolExecutor(max_workers=threads or concurrency) as pool:
+        application.executor = pool
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+REPLAYS = {
+    'wsgi': replay,
+    'asgi': lambda *args: asyncio.run(replay_asgi(*args)),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон: наполняет отдельную базу до нужного числа '
+        'постов, прогоняет смесь запросов через yatube.wsgi или '
+        'yatube.asgi и выводит перцентили задержки, RPS и число запросов '
+        'к базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts',
+            type=int,
+            choices=SIZES,
+            default=SIZES[0],
+            help='до скольких постов дополнить базу',
+        )
+        parser.add_argument(
+            '--db',
+            default=os.path.join(settings.BASE_DIR, 'bench.sqlite3'),
+            help='файл базы для прогона; рабочая база не трогается',
+        )
+        parser.add_argument(
+            '--fresh',
+            action='store_true',
+            help='пересоздать базу прогона',
+        )
+        parser.add_argument(
+            '--dump',
+            default=os.path.join(settings.BASE_DIR, 'dump.json'),
+            help='фикстура, с которой начинается пустая база',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='сколько запросов отправить',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=100,
+            help='сколько запросов отправить до замеров',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='число одновременных запросов',
+        )
+        parser.add_argument(
+            '--server',
+            choices=('wsgi', 'asgi', 'both'),
+            default='wsgi',
+            help='через что прогонять запросы; both — одну и ту же смесь '
+                 'через оба',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            help='потоков сервера, по умолчанию равно --concurrency',
+        )
+        parser.add_argument(
+            '--client-delay',
+            type=float,
+            default=0,
+            help='сколько миллисекунд клиент передаёт запрос',
+        )
+        parser.add_argument(
+            '--log',
+            help='журнал запросов JSONL вместо случайной смеси',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='зерно генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--output',
+            help='куда сохранить результаты в JSON',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='результаты прошлого прогона для сравнения',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='допустимое ухудшение относительно --baseline',
+        )
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        connection.settings_dict['TEST']['NAME'] = options['db']
+        if options['fresh'] and os.path.exists(options['db']):
+            os.remove(options['db'])
+        connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+            keepdb=True,
+            serialize=False,
+        )
+        # Соединения на чтение профиля production смотрят в ту же базу
+        for alias in connections:
+            test = connections[alias].settings_dict['TEST']
+            if test.get('MIRROR') == connection.alias:
+                connections[alias].creation.set_as_test_mirror(
+                    connection.settings_dict,
+                )
+
+        if not Post.objects.exists() and os.path.exists(options['dump']):
+            transfer.Importer(
+                options['dump'],
+                checkpoint=f'{options["db"]}.checkpoint',
+            ).run()
+        started = time.perf_counter()
+        if scale(options['posts']):
+            self.stdout.write(
+                f'База дополнена до {options["posts"]} постов за '
+                f'{time.perf_counter() - started:.0f} с'
+            )
+
+        readers = User.objects.order_by('?')[:50]
+        cookies = session_cookies(readers)
+        total = options['warmup'] + options['requests']
+        if options['log']:
+            requests = read_log(options['log'], total)
+        else:
+            requests = build_mix(
+                total, MIX, readers[0] if readers else None,
+            )
+
+        servers = ('wsgi', 'asgi') if options['server'] == 'both' \
+            else (options['server'],)
+        if len(servers) > 1 and (options['output'] or options['baseline']):
+            raise CommandError(
+                '--output и --baseline работают с одним --server'
+            )
+        arguments = (
+            options['concurrency'], cookies, options['threads'],
+            options['client_delay'] / 1000,
+        )
+        for server in servers:
+            cache.clear()
+            with override_settings(DEBUG=False):
+                REPLAYS[server](requests[:options['warmup']], *arguments)
+                samples, elapsed = REPLAYS[server](
+                    requests[options['warmup']:], *arguments,
+                )
+
+            result = {
+                'date': timezone.now().isoformat(),
+                'posts': Post.objects.count(),
+                'requests': len(samples),
+                'concurrency': options['concurrency'],
+                'server': server,
+                'threads': options['threads'] or options['concurrency'],
+                'client_delay_ms': options['client_delay'],
+                'views': summarize(samples, elapsed),
+            }
+            self.report(result)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(result, output, ensure_ascii=False, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline:
+                found = regressions(
+                    result, json.load(baseline), options['tolerance'],
+                )
+            if found:
+                raise CommandError(
+                    'Прогон хуже базового:\n' + '\n'.join(found)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def report(self, result):
+        self.stdout.write(
+            f'{result["server"].upper()}, постов: {result["posts"]}, '
+            f'запросов: {result["requests"]}, '
+            f'RPS: {result["views"]["all"]["rps"]}'
+        )
+        self.stdout.write(
+            f'{"страница":<14}{"запросов":>9}{"ошибок":>8}'
+            f'{"p50, мс":>9}{"p95, мс":>9}{"p99, мс":>9}{"SQL":>7}'
+        )
+        for view, stats in result['views'].items():
+            self.stdout.write(
+                f'{view:<14}{stats["requests"]:>9}{stats["errors"]:>8}'
+                f'{stats["p50_ms"]:>9}{stats["p95_ms"]:>9}'
+                f'{stats["p99_ms"]:>9}{stats["queries"]:>7}'
+            )
@@ -0,0 +1,87 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageOps
+
+from posts import images
+from posts.paginator import PER_PAGE
+
+# Ширина карточки в CSS-пикселях и плотность экрана типичных клиентов
+CLIENTS = {
+    'телефон': (360, 1),
+    'телефон@2x': (360, 2),
+    'планшет': (768, 1),
+    'ноутбук': (960, 1),
+    'ноутбук@2x': (960, 2),
+}
+
+
+def pick_width(widths, css_width, density):
+    """Ширина, которую браузер выберет из srcset."""
+    needed = css_width * density
+    fitting = [width for width in sorted(widths) if width >= needed]
+    return fitting[0] if fitting else max(widths)
+
+
+def measure(path):
+    with open(path, 'rb') as source:
+        data = source.read()
+    # Так картинку отдавал {% thumbnail %} из sorl: JPEG с качеством 95
+    with Image.open(BytesIO(data)) as source:
+        frame = ImageOps.fit(
+            source.convert('RGB'),
+            images.variant_size(960),
+            Image.LANCZOS,
+        )
+    buffer = BytesIO()
+    frame.save(buffer, 'JPEG', quality=95)
+    after = images.encode_variants(
+        data,
+        settings.POST_IMAGE_WIDTHS,
+        settings.POST_IMAGE_FORMATS,
+    )
+    return len(buffer.getvalue()), {
+        key: len(content) for key, content in after.items()
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает объём картинок на странице ленты: одна миниатюра '
+        '960x339 против набора ширин и форматов из srcset'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=PER_PAGE,
+            help='сколько картинок из media/posts взять (страница ленты)',
+        )
+
+    def handle(self, *args, **options):
+        folder = os.path.join(settings.MEDIA_ROOT, 'posts')
+        paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+        )[:options['images']]
+        with ProcessPoolExecutor() as pool:
+            results = list(pool.map(measure, paths))
+
+        widths = settings.POST_IMAGE_WIDTHS
+        best_format = settings.POST_IMAGE_FORMATS[0]
+        before = sum(size for size, _ in results)
+        self.stdout.write(
+            f'Картинок: {len(results)}; до: {before / 1024:.0f} КБ '
+            f'(JPEG 960x339 от sorl.thumbnail для всех клиентов)'
+        )
+        for client, (css_width, density) in CLIENTS.items():
+            width = pick_width(widths, css_width, density)
+            for image_format in (best_format, images.FALLBACK_FORMAT):
+                after = sum(sizes[width, image_format] for _, sizes in results)
+                self.stdout.write(
+                    f'{client:>10}: {image_format:<4} {width}w — '
+                    f'{after / 1024:.0f} КБ ({after / before:.0%} от прежнего)'
+                )
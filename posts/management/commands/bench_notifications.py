@@ -0,0 +1,113 @@
+import itertools
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+
+from posts import notifications
+from posts.models import Digest, Follow, Post, User
+
+AUTHOR = 'bench_author'
+BATCH_SIZE = 500
+BACKENDS = {
+    'file': 'django.core.mail.backends.filebased.EmailBackend',
+    'smtp': 'django.core.mail.backends.smtp.EmailBackend',
+    'dummy': 'django.core.mail.backends.dummy.EmailBackend',
+}
+
+
+def add_followers(author, total):
+    """Дополняет подписчиков автора до total."""
+    existing = Follow.objects.filter(author=author).count()
+    numbers = iter(range(existing, total))
+    while True:
+        chunk = list(itertools.islice(numbers, BATCH_SIZE))
+        if not chunk:
+            return
+        User.objects.bulk_create(
+            User(username=f'follower{i}', email=f'follower{i}@example.com')
+            for i in chunk
+        )
+        users = User.objects.filter(
+            username__in=[f'follower{i}' for i in chunk],
+        ).values_list('pk', flat=True)
+        Follow.objects.bulk_create(
+            Follow(user_id=user_id, author=author) for user_id in users
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет рассылку дайджеста автора с большим числом подписчиков: '
+        'пачки писем через одно соединение против отдельного соединения '
+        'на каждое письмо. Данные создаются в отдельной базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=100000,
+                            help='подписчиков у автора')
+        parser.add_argument('--posts', type=int, default=3,
+                            help='постов автора в окне дайджеста')
+        parser.add_argument('--db', default='bench_notifications.sqlite3',
+                            help='файл базы для замера')
+        parser.add_argument('--backend', choices=sorted(BACKENDS),
+                            default='file',
+                            help='file — письма в файлы, как локально; '
+                                 'smtp — на EMAIL_HOST:EMAIL_PORT; '
+                                 'dummy — только сборка писем')
+        parser.add_argument('--naive', type=int, default=1000,
+                            help='сколько писем отправить по одному '
+                                 'для сравнения')
+
+    def handle(self, *args, **options):
+        connection.settings_dict['TEST']['NAME'] = options['db']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=True, serialize=False,
+        )
+        author, _ = User.objects.get_or_create(username=AUTHOR)
+        started = time.perf_counter()
+        add_followers(author, options['followers'])
+        self.stdout.write(
+            f'Подписчиков: {options["followers"]}, подготовка '
+            f'{time.perf_counter() - started:.0f} с'
+        )
+        Digest.objects.all().delete()
+        Post.objects.filter(author=author).delete()
+        Post.objects.bulk_create(
+            Post(text=f'Пост для замера рассылки {i}', author=author)
+            for i in range(options['posts'])
+        )
+        after = timezone.now() + notifications.window()
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            EMAIL_BACKEND=BACKENDS[options['backend']],
+            EMAIL_FILE_PATH=directory,
+        ):
+            started = time.perf_counter()
+            sent = notifications.send_due(after)
+            pooled = time.perf_counter() - started
+            self.stdout.write(
+                f'пачками: {sent} писем за {pooled:.1f} с, '
+                f'{sent / pooled:.0f} писем/с'
+            )
+
+            digest = Digest.objects.latest('until')
+            digest.last_user = 0
+            sample = itertools.islice(
+                notifications.messages(digest), options['naive'],
+            )
+            count = 0
+            started = time.perf_counter()
+            for _, message in sample:
+                message.send()
+                count += 1
+            naive = time.perf_counter() - started
+            if count:
+                rate = count / naive
+                self.stdout.write(
+                    f'по одному: {rate:.0f} писем/с, на {sent} писем '
+                    f'ушло бы {sent / rate:.1f} с'
+                )
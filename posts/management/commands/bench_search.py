@@ -0,0 +1,103 @@
+import itertools
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+SYLLABLES = 'ба ве го да жи зо ка ли мо ну ра се ти фу хо ча шу ю'.split()
+VOCABULARY = 20000
+# Позиции слов в частотном словаре: частое, среднее и редкое.
+# None — слово с опечаткой, которого нет ни в одном посте
+QUERIES = (10, 1000, 15000, None)
+MISSING = 'опечатка'
+
+
+def vocabulary():
+    words = set()
+    while len(words) < VOCABULARY:
+        words.add(''.join(random.choices(SYLLABLES, k=random.randint(2, 4))))
+    words = sorted(words)
+    random.shuffle(words)
+    return words
+
+
+def build(path, posts, words):
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE post (id INTEGER PRIMARY KEY, text)')
+    connection.execute(
+        "CREATE VIRTUAL TABLE post_fts USING fts5("
+        "text, tokenize='unicode61 remove_diacritics 2')"
+    )
+    # Частоты слов в текстах убывают по закону Ципфа
+    weights = list(itertools.accumulate(
+        1 / rank for rank in range(1, len(words) + 1)
+    ))
+    rows = (
+        (i, ' '.join(random.choices(
+            words, cum_weights=weights, k=random.randint(20, 80),
+        )))
+        for i in range(1, posts + 1)
+    )
+    connection.executemany('INSERT INTO post VALUES (?, ?)', rows)
+    connection.execute(
+        'INSERT INTO post_fts(rowid, text) SELECT id, text FROM post'
+    )
+    connection.commit()
+    return connection
+
+
+def timed(connection, sql, argument):
+    start = time.perf_counter()
+    connection.execute(sql, [argument]).fetchall()
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск по LIKE и по полнотекстовому индексу FTS5 '
+        'на синтетической таблице постов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts',
+            type=int,
+            default=100000,
+            help='Сколько постов сгенерировать',
+        )
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        with tempfile.TemporaryDirectory() as directory:
+            words = vocabulary()
+            connection = build(
+                os.path.join(directory, 'bench.sqlite3'),
+                options['posts'],
+                words,
+            )
+            for rank in QUERIES:
+                word = MISSING if rank is None else words[rank]
+                like = timed(
+                    connection,
+                    'SELECT id FROM post WHERE text LIKE ? '
+                    'ORDER BY id DESC LIMIT 10',
+                    f'%{word}%',
+                )
+                fts = timed(
+                    connection,
+                    'SELECT rowid FROM post_fts WHERE post_fts MATCH ? '
+                    'ORDER BY rank LIMIT 10',
+                    f'"{word}"',
+                )
+                title = (
+                    'слова нет в постах' if rank is None
+                    else f'{rank + 1}-е по частоте слово'
+                )
+                self.stdout.write(
+                    f'{title}: LIKE {like * 1000:.1f} мс, '
+                    f'FTS5 {fts * 1000:.1f} мс'
+                )
+            connection.close()
@@ -0,0 +1,196 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from yatube.sqlite import RETRY_ATTEMPTS, RETRY_DELAY, is_locked
+from yatube.sqlite.base import PRAGMAS
+
+USERS = 1000
+POSTS = 50000
+TIMEOUT = 5
+
+READ_SQL = '''
+    SELECT post.id, post.text, user.username,
+           (SELECT count(*) FROM comment WHERE comment.post_id = post.id)
+    FROM post JOIN user ON user.id = post.author_id
+    ORDER BY post.pub_date DESC, post.id DESC
+    LIMIT 10 OFFSET ?
+'''
+
+
+def build(path):
+    connection = sqlite3.connect(path)
+    connection.executescript('''
+        CREATE TABLE user (id INTEGER PRIMARY KEY, username TEXT,
+                           comments INTEGER DEFAULT 0);
+        CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER,
+                           text TEXT, pub_date REAL);
+        CREATE INDEX post_pub_date ON post (pub_date);
+        CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER,
+                              author_id INTEGER, text TEXT);
+        CREATE INDEX comment_post ON comment (post_id);
+    ''')
+    connection.executemany(
+        'INSERT INTO user (id, username) VALUES (?, ?)',
+        ((i, f'user{i}') for i in range(1, USERS + 1)),
+    )
+    connection.executemany(
+        'INSERT INTO post VALUES (?, ?, ?, ?)',
+        (
+            (i, random.randint(1, USERS), 'текст поста ' * 20, i)
+            for i in range(1, POSTS + 1)
+        ),
+    )
+    connection.commit()
+    connection.close()
+
+
+class Profile:
+    """Как приложение обращается к базе: соединения, PRAGMA, повторы."""
+
+    def __init__(self, path, tuned):
+        self.path = path
+        self.tuned = tuned
+        self.local = threading.local()
+
+    def connect(self):
+        connection = sqlite3.connect(
+            self.path, timeout=TIMEOUT, isolation_level=None,
+            check_same_thread=False,
+        )
+        if self.tuned:
+            for name, value in PRAGMAS.items():
+                connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def connection(self):
+        # Настроенный профиль держит соединение потока, как CONN_MAX_AGE;
+        # обычный открывает новое на каждый запрос
+        if not self.tuned:
+            return self.connect()
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = self.connect()
+        return self.local.connection
+
+    def release(self, connection):
+        if not self.tuned:
+            connection.close()
+
+    def read(self):
+        connection = self.connection()
+        try:
+            connection.execute(
+                READ_SQL, [random.randint(0, 5) * 10],
+            ).fetchall()
+        finally:
+            self.release(connection)
+
+    def write(self):
+        attempts = RETRY_ATTEMPTS if self.tuned else 1
+        for attempt in range(attempts):
+            connection = self.connection()
+            try:
+                self._comment(connection)
+                return
+            except sqlite3.OperationalError as error:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                if not is_locked(error) or attempt == attempts - 1:
+                    raise
+            finally:
+                self.release(connection)
+            time.sleep(RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    @staticmethod
+    def _comment(connection):
+        # Как add_comment в transaction.atomic: сначала чтение поста,
+        # затем запись комментария и счётчика
+        post_id = random.randint(1, POSTS)
+        author_id = random.randint(1, USERS)
+        connection.execute('BEGIN')
+        connection.execute(
+            'SELECT id FROM post WHERE id = ?', [post_id],
+        ).fetchone()
+        connection.execute(
+            'INSERT INTO comment (post_id, author_id, text) '
+            'VALUES (?, ?, ?)',
+            [post_id, author_id, 'комментарий'],
+        )
+        connection.execute(
+            'UPDATE user SET comments = comments + 1 WHERE id = ?',
+            [author_id],
+        )
+        connection.execute('COMMIT')
+
+
+def run(profile, readers, writers, seconds):
+    results = Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind, action):
+        done = Counter()
+        while time.perf_counter() < deadline:
+            try:
+                action()
+                done[kind] += 1
+            except sqlite3.OperationalError as error:
+                done[f'{kind}_errors' if is_locked(error) else 'other'] += 1
+        with lock:
+            results.update(done)
+
+    threads = [
+        threading.Thread(target=worker, args=('reads', profile.read))
+        for _ in range(readers)
+    ] + [
+        threading.Thread(target=worker, args=('writes', profile.write))
+        for _ in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает обычное подключение к SQLite с профилем production '
+        '(WAL, PRAGMA, постоянные соединения, повтор при блокировке) '
+        'под одновременным чтением и записью из нескольких потоков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8,
+                            help='потоков, читающих ленту')
+        parser.add_argument('--writers', type=int, default=4,
+                            help='потоков, пишущих комментарии')
+        parser.add_argument('--seconds', type=float, default=5,
+                            help='длительность каждого прогона')
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        with tempfile.TemporaryDirectory() as directory:
+            for name, tuned in (('обычный', False), ('production', True)):
+                path = os.path.join(directory, f'{name}.sqlite3')
+                build(path)
+                results = run(
+                    Profile(path, tuned),
+                    options['readers'],
+                    options['writers'],
+                    options['seconds'],
+                )
+                seconds = options['seconds']
+                self.stdout.write(
+                    f'{name:>10}: чтений {results["reads"] / seconds:.0f}/с, '
+                    f'записей {results["writes"] / seconds:.0f}/с, '
+                    f'ошибок блокировки: чтение '
+                    f'{results["reads_errors"]}, запись '
+                    f'{results["writes_errors"]}'
+                )
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в JSON Lines, читая базу по частям'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='файл выгрузки; по умолчанию stdout',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=transfer.BATCH_SIZE,
+            help='сколько строк читать из базы за раз',
+        )
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            transfer.export(sys.stdout, options['batch_size'])
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            written = transfer.export(output, options['batch_size'])
+        self.stderr.write(f'Выгружено объектов: {written}')
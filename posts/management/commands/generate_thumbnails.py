@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры для картинок уже опубликованных постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='пересоздать и уже готовые миниатюры',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='число потоков',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(thumbnail='')
+        post_ids = list(posts.values_list('pk', flat=True))
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {
+                pool.submit(images.generate, post_id): post_id
+                for post_id in post_ids
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    done += 1
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'Пост {futures[future]}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово миниатюр: {done}, ошибок: {failed}'
+        ))
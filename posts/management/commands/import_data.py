@@ -0,0 +1,54 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_data или dumpdata пачками bulk_create. '
+        'После сбоя повторный запуск продолжает с контрольной точки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл выгрузки')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=transfer.BATCH_SIZE,
+            help='сколько объектов вставлять за раз',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='файл контрольной точки; по умолчанию <path>.checkpoint',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='забыть контрольную точку и загружать с начала',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if not os.path.exists(options['path']):
+            raise CommandError(f'Нет файла {options["path"]}')
+        importer = transfer.Importer(
+            options['path'],
+            checkpoint=options['checkpoint'],
+            batch_size=options['batch_size'],
+            progress=self.progress,
+        )
+        if options['restart'] and os.path.exists(importer.checkpoint):
+            os.remove(importer.checkpoint)
+        try:
+            done = importer.run()
+        except transfer.TransferError as error:
+            raise CommandError(error)
+        for label, count in done.items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
+
+    def progress(self, label, count):
+        if self.verbosity > 1:
+            self.stdout.write(f'{label}: {count}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Заполняет заново полнотекстовый индекс постов и комментариев'
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('Полнотекстовый поиск работает только в SQLite')
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Индекс пересобран'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг популярных постов по комментариям '
+        'и подписчикам авторов'
+    )
+
+    def handle(self, *args, **options):
+        trending.rebuild()
+        self.stdout.write(self.style.SUCCESS('Рейтинг пересчитан'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики записей, подписчиков и комментариев '
+        'пользователей и статистику групп'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='только сверить счётчики с исходными таблицами',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            counters.rebuild()
+            self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
+            return
+        broken = 0
+        for user, diff in counters.mismatches():
+            broken += 1
+            for name, (stored, actual) in diff.items():
+                self.stdout.write(
+                    f'{user.username}: {name} {stored} != {actual}'
+                )
+        if broken:
+            raise CommandError(f'Счётчики расходятся у {broken} польз.')
+        self.stdout.write(self.style.SUCCESS('Счётчики совпадают'))
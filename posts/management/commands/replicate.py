@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+def replicate(source, target):
+    """Копирует файл SQLite source в target через backup API."""
+    primary = sqlite3.connect(source)
+    replica = sqlite3.connect(target)
+    try:
+        primary.backup(replica)
+    finally:
+        replica.close()
+        primary.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замена репликации для локальной проверки: копирует основную '
+        'базу в файлы реплик из DATABASE_REPLICAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='повторять раз в столько секунд — так видно отставание',
+        )
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES[DEFAULT_DB_ALIAS]['NAME']
+        targets = {
+            settings.DATABASES[alias]['NAME']
+            for alias in settings.DATABASE_REPLICAS
+        } - {source}
+        if not targets:
+            raise CommandError(
+                'Нет реплик в отдельных файлах: запустите с YATUBE_DB=replica'
+            )
+        while True:
+            for target in sorted(targets):
+                replicate(source, target)
+            self.stdout.write('Реплики обновлены: ' + ', '.join(sorted(targets)))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
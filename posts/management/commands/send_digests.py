@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import notifications
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассылает подписчикам дайджесты новых постов за окна, которые '
+        'уже закончились, и дорассылает прерванные'
+    )
+
+    def handle(self, *args, **options):
+        sent = notifications.send_due()
+        self.stdout.write(self.style.SUCCESS(f'Отправлено писем: {sent}'))
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.20 on 2026-10-18 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Digest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('since', models.DateTimeField(verbose_name='Посты после')),
+                ('until', models.DateTimeField(unique=True, verbose_name='Посты до')),
+                ('last_user', models.PositiveIntegerField(default=0, help_text='id пользователя, после которого продолжится рассылка', verbose_name='Последний получатель')),
+                ('sent', models.PositiveIntegerField(default=0, verbose_name='Писем')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Разослан')),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.20 on 2026-10-18 04:24
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def fill_group_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    Post = apps.get_model('posts', 'Post')
+    counted = {
+        row['group']: row
+        for row in Post.objects.filter(group__isnull=False).order_by(
+        ).values('group').annotate(
+            posts_count=Count('pk'),
+            authors_count=Count('author', distinct=True),
+            last_post=Max('pub_date'),
+        )
+    }
+    GroupStats.objects.bulk_create(
+        (
+            GroupStats(
+                group_id=pk,
+                posts_count=counted.get(pk, {}).get('posts_count', 0),
+                authors_count=counted.get(pk, {}).get('authors_count', 0),
+                last_post=counted.get(pk, {}).get('last_post'),
+            )
+            for pk in Group.objects.values_list('pk', flat=True)
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group', verbose_name='Группа')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Записей')),
+                ('authors_count', models.PositiveIntegerField(default=0, verbose_name='Авторов')),
+                ('last_post', models.DateTimeField(blank=True, null=True, verbose_name='Последняя запись')),
+            ],
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.20 on 2026-10-18 04:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_groupstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('score', models.FloatField(verbose_name='Рейтинг')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='Подписчиков автора в рейтинге')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['score', 'post'], name='posts_trend_score_6cbdba_idx'),
+        ),
+    ]
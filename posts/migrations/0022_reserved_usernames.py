@@ -0,0 +1,34 @@
+# Generated by Django 2.2.20 on 2026-10-18 06:10
+
+from django.db import migrations
+
+# Копия users.validators.RESERVED_USERNAMES на момент миграции
+RESERVED_USERNAMES = (
+    '__debug__', 'about', 'admin', 'api', 'auth', 'follow', 'group',
+    'media', 'metrics', 'new', 'search', 'static', 'trending',
+)
+
+
+def rename_reserved(apps, schema_editor):
+    """
+    Профили пользователей с именами адресов сайта не открываются:
+    такие пользователи получают имя с суффиксом из своего id.
+    """
+    User = apps.get_model('auth', 'User')
+    for user in User.objects.filter(username__in=RESERVED_USERNAMES):
+        user.username = f'{user.username}_{user.pk}'
+        while User.objects.filter(username=user.username).exists():
+            user.username += '_'
+        user.save(update_fields=['username'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0021_trendingscore'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_reserved, migrations.RunPython.noop),
+    ]
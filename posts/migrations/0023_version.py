@@ -0,0 +1,20 @@
+# Generated by Django 2.2.20 on 2026-10-18 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_reserved_usernames'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Version',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('stamp', models.BigIntegerField(verbose_name='Время последнего изменения, мс')),
+            ],
+        ),
+    ]
@@ -11,6 +11,15 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """
+        Посты для вывода карточками: автор и группа подтягиваются
+        тем же запросом, число комментариев хранится в comment_count.
+        """
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name="Текст")
     pub_date = models.DateTimeField(
@@ -36,9 +45,52 @@ class Post(models.Model):
         blank=True,
         null=True
     )
+    thumbnail = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name="Миниатюра",
+    )
+
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name="Версия",
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Комментариев",
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    # Поля, которые меняют только .update() счётчиков и фоновых задач.
+    # Обычное сохранение записало бы их из устаревшего экземпляра
+    BACKGROUND_FIELDS = ('thumbnail', 'comment_count')
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=['pub_date']),
+            models.Index(fields=['author', 'pub_date']),
+            models.Index(fields=['group', 'pub_date']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and \
+                kwargs.get('update_fields') is None and \
+                not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.BACKGROUND_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def thumbnail_url(self):
+        return self.image.storage.url(self.thumbnail)
 
 
 class Comment(models.Model):
@@ -60,6 +112,12 @@ class Comment(models.Model):
         verbose_name="Дата комментария",
     )
 
+    class Meta:
+        ordering = ["created"]
+        indexes = [
+            models.Index(fields=['post', 'created']),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -77,3 +135,134 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ['user', 'author']
+        indexes = [
+            models.Index(fields=['author', 'user']),
+        ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Подписчик",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Пост",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Автор",
+    )
+    pub_date = models.DateTimeField(verbose_name="Дата публикации")
+
+    class Meta:
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post']),
+            models.Index(fields=['user', 'author']),
+        ]
+
+
+class TrendingScore(models.Model):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="trending",
+        verbose_name="Пост",
+    )
+    score = models.FloatField(verbose_name="Рейтинг")
+    followers = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Подписчиков автора в рейтинге",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['score', 'post']),
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Пользователь",
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Записей",
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Подписчиков",
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Подписок",
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Комментариев",
+    )
+
+
+class GroupStats(models.Model):
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Группа",
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Записей",
+    )
+    authors_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Авторов",
+    )
+    last_post = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Последняя запись",
+    )
+
+
+class Digest(models.Model):
+    since = models.DateTimeField(verbose_name="Посты после")
+    until = models.DateTimeField(unique=True, verbose_name="Посты до")
+    last_user = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Последний получатель",
+        help_text="id пользователя, после которого продолжится рассылка",
+    )
+    sent = models.PositiveIntegerField(default=0, verbose_name="Писем")
+    finished = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Разослан",
+    )
+
+    def __str__(self):
+        return f'{self.since:%d.%m %H:%M} – {self.until:%d.%m %H:%M}'
+
+
+class Version(models.Model):
+    key = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name="Ключ",
+    )
+    stamp = models.BigIntegerField(
+        verbose_name="Время последнего изменения, мс",
+    )
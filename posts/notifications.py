@@ -0,0 +1,144 @@
+import datetime
+import itertools
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from yatube.metrics import registry
+
+from .models import Digest, Follow
+
+logger = logging.getLogger(__name__)
+
+# Начало отсчёта окон дайджеста: окна у всех процессов совпадают
+EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+EXCERPT_LENGTH = 200
+CHUNK_SIZE = 2000
+
+
+def window():
+    return datetime.timedelta(minutes=settings.NOTIFY_DIGEST_MINUTES)
+
+
+def window_end(moment):
+    """Конец окна дайджеста, в которое попадает moment."""
+    size = window()
+    return moment - (moment - EPOCH) % size + size
+
+
+def _rows(digest):
+    """
+    Пары «подписчик — новый пост» за окно дайджеста по графу подписок,
+    по порядку id подписчиков, начиная с того, на ком рассылка
+    остановилась. Строки читаются из базы частями.
+    """
+    return Follow.objects.filter(
+        user_id__gt=digest.last_user,
+        author__posts__pub_date__gt=digest.since,
+        author__posts__pub_date__lte=digest.until,
+    ).exclude(user__email='').order_by(
+        'user_id', 'author__posts__pub_date', 'author__posts__id',
+    ).values_list(
+        'user_id', 'user__username', 'user__email',
+        'author__username', 'author__posts__id', 'author__posts__text',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def messages(digest):
+    """Письма дайджеста: (id получателя, EmailMessage) по одному на адрес."""
+    domain = Site.objects.get_current().domain
+    # Шаблон разбирается один раз на всю рассылку, а не на каждое письмо
+    template = get_template('notifications/digest.txt')
+    links = {}
+    for user_id, rows in itertools.groupby(_rows(digest), lambda r: r[0]):
+        rows = list(rows)
+        posts = []
+        for _, _, _, author, post_id, text in rows:
+            if post_id not in links:
+                path = reverse('post', args=(author, post_id))
+                links[post_id] = f'http://{domain}{path}'
+            posts.append({
+                'author': author,
+                'text': text[:EXCERPT_LENGTH],
+                'url': links[post_id],
+            })
+        _, username, email = rows[0][:3]
+        body = template.render({'username': username, 'posts': posts})
+        yield user_id, EmailMessage(
+            f'Новые записи в Yatube: {len(posts)}',
+            body,
+            to=[email],
+        )
+
+
+def send(digest):
+    """
+    Рассылает дайджест пачками по NOTIFY_BATCH_SIZE писем через одно
+    соединение с почтовым сервером. После каждой пачки прогресс
+    фиксируется в базе, и повтор после сбоя продолжает со следующего
+    получателя, не отправляя письма второй раз.
+    """
+    batch_size = settings.NOTIFY_BATCH_SIZE
+    started = time.perf_counter()
+    sent = 0
+    with get_connection() as connection:
+        batches = iter(messages(digest))
+        while True:
+            batch = list(itertools.islice(batches, batch_size))
+            if not batch:
+                break
+            batch_started = time.perf_counter()
+            connection.send_messages([message for _, message in batch])
+            Digest.objects.filter(pk=digest.pk).update(
+                last_user=batch[-1][0],
+                sent=F('sent') + len(batch),
+            )
+            sent += len(batch)
+            registry.increment('notifications_sent', len(batch))
+            registry.increment('notification_batches')
+            registry.increment(
+                'notification_seconds',
+                time.perf_counter() - batch_started,
+            )
+    Digest.objects.filter(pk=digest.pk).update(finished=timezone.now())
+    elapsed = time.perf_counter() - started
+    logger.info(
+        'Дайджест %s: %s писем за %.1f с (%.0f писем/с)',
+        digest, sent, elapsed, sent / elapsed if elapsed else 0,
+    )
+    return sent
+
+
+def due_digest(now=None):
+    """
+    Дайджест, который пора рассылать: недоразосланный после сбоя
+    или новый — с конца прошлого до начала текущего окна.
+    """
+    unfinished = Digest.objects.filter(finished__isnull=True).order_by(
+        'until',
+    ).first()
+    if unfinished is not None:
+        return unfinished
+    until = window_end(now or timezone.now()) - window()
+    last = Digest.objects.order_by('-until').first()
+    since = last.until if last is not None else until - window()
+    if since >= until:
+        return None
+    return Digest.objects.create(since=since, until=until)
+
+
+def send_due(now=None):
+    """Рассылает все дайджесты, которым пора. Возвращает число писем."""
+    sent = 0
+    while True:
+        digest = due_digest(now)
+        if digest is None:
+            return sent
+        sent += send(digest)
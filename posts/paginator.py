@@ -0,0 +1,319 @@
+import base64
+import binascii
+import datetime
+import json
+import math
+from urllib.parse import urlencode
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+GROUPS_PER_PAGE = 30
+DEFAULT_ORDERING = ('-pub_date', '-pk')
+# Сколько страниц можно пролистать по номерам. Для лент длиннее
+# paginator переходит в режим «вперёд/назад» по курсору и не считает строки
+JUMP_LIMIT = 10
+# Целые за этими границами не поместятся в столбец SQLite или bigint
+MAX_INTEGER = 2 ** 63 - 1
+# GET-параметры, которые выбирают страницу ленты
+PAGE_PARAMS = ('after', 'before', 'page')
+
+
+class InvalidCursor(ValueError):
+    """Курсор из адреса не подходит к сортировке ленты."""
+
+
+class CursorEncoder(json.JSONEncoder):
+    """В отличие от DjangoJSONEncoder не отбрасывает микросекунды."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=CursorEncoder).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padding = '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token + padding))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list):
+        return None
+    return values
+
+
+def _clean_value(field, value):
+    if field.is_relation:
+        field = field.target_field
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise InvalidCursor(value)
+    if isinstance(field, models.DateTimeField):
+        if not isinstance(value, str):
+            raise InvalidCursor(value)
+        value = field.to_python(value)
+        if value is None or timezone.is_naive(value):
+            raise InvalidCursor(value)
+    elif isinstance(field, (models.IntegerField, models.AutoField)):
+        if not isinstance(value, int):
+            raise InvalidCursor(value)
+        if abs(value) > MAX_INTEGER:
+            raise InvalidCursor(value)
+    elif isinstance(field, models.FloatField):
+        value = field.to_python(value)
+        if not math.isfinite(value):
+            raise InvalidCursor(value)
+    elif not isinstance(value, str):
+        raise InvalidCursor(value)
+    return value
+
+
+def clean_cursor(values, fields):
+    """
+    Значения курсора, приведённые к типам полей сортировки fields.
+    Курсор приходит из адреса и может быть подделан, поэтому значение
+    неподходящего типа поднимает InvalidCursor, а не ошибку базы.
+    """
+    if values is None or len(values) != len(fields):
+        raise InvalidCursor(values)
+    try:
+        return [
+            _clean_value(field, value)
+            for field, value in zip(fields, values)
+        ]
+    except (ValidationError, TypeError, ValueError, OverflowError):
+        raise InvalidCursor(values)
+
+
+def first_query(params):
+    """
+    Запрос первой страницы: текущие GET-параметры, например q поиска,
+    без тех, что выбирают страницу.
+    """
+    return urlencode([
+        (name, value)
+        for name, values in params.lists()
+        if name not in PAGE_PARAMS
+        for value in values
+    ])
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, number=None,
+                 next_query=None, previous_query=None, first_query=''):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = number
+        self.next_query = next_query
+        self.previous_query = previous_query
+        self.first_query = first_query
+
+    def __repr__(self):
+        if self.number is None:
+            return '<Page>'
+        return f'<Page {self.number} of {self.paginator.num_pages}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def page_range(self):
+        if self.number is None:
+            return []
+        return self.paginator.page_range
+
+    def has_next(self):
+        return self.next_query is not None
+
+    def has_previous(self):
+        return self.previous_query is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Постраничный вывод по ключу сортировки (pub_date, id) без COUNT(*)
+    и OFFSET: следующая страница начинается сразу за последней записью
+    предыдущей, поэтому любая страница стоит столько же, сколько первая.
+
+    Ключ сортировки берётся из order_by() queryset, последним полем должен
+    идти уникальный pk. Значение ключа читается из одноимённого атрибута
+    объекта, поэтому сортировать можно по полям модели и аннотациям.
+    С jump_limit=0 страницы только листаются по курсору и строки
+    не считаются вовсе.
+    """
+
+    def __init__(self, object_list, per_page=PER_PAGE,
+                 jump_limit=JUMP_LIMIT):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = (
+            tuple(object_list.query.order_by) or DEFAULT_ORDERING
+        )
+        self.jump_limit = jump_limit
+        self._count = None
+
+    @property
+    def count(self):
+        """Число записей, но не больше, чем помещается в jump_limit страниц."""
+        if self._count is None:
+            limit = self.per_page * self.jump_limit + 1
+            self._count = self.object_list.order_by().values('pk')[
+                :limit
+            ].count()
+        return self._count
+
+    @property
+    def is_small(self):
+        return self.count <= self.per_page * self.jump_limit
+
+    @property
+    def num_pages(self):
+        return max(1, -(-self.count // self.per_page))
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def get_page(self, params):
+        """
+        Возвращает страницу по GET-параметрам after, before или page.
+        С негодным курсором открывается первая страница.
+        """
+        page = None
+        for direction in ('after', 'before'):
+            if not params.get(direction):
+                continue
+            try:
+                values = self.clean(params[direction])
+            except InvalidCursor:
+                continue
+            page = self._cursor_page(values, direction == 'before')
+            break
+        else:
+            if self.jump_limit and self.is_small:
+                page = self._numbered_page(params.get('page'))
+            else:
+                page = self._cursor_page(None, False)
+        page.first_query = first_query(params)
+        return page
+
+    def after(self, params):
+        """
+        Все записи после курсора after по порядку ключа сортировки.
+        В отличие от get_page() ничего не читает: срез и способ
+        чтения выбирает вызывающий, например iterator() для потоковой
+        отдачи. Негодный курсор поднимает InvalidCursor.
+        """
+        queryset = self.object_list.order_by(*self.ordering)
+        if params.get('after'):
+            values = self.clean(params['after'])
+            queryset = queryset.filter(self._seek(self.ordering, values))
+        return queryset
+
+    def clean(self, token):
+        """Значения курсора token, проверенные по полям сортировки."""
+        return clean_cursor(
+            decode_cursor(token),
+            [self._field(field.lstrip('-')) for field in self.ordering],
+        )
+
+    def _field(self, name):
+        query = self.object_list.query
+        if name in query.annotations:
+            return query.annotations[name].output_field
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def cursor(self, obj):
+        """Курсор, с которого начнётся страница после obj."""
+        return encode_cursor(self._values(obj))
+
+    def _numbered_page(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 1
+        number = min(max(number, 1), self.num_pages)
+        bottom = (number - 1) * self.per_page
+        object_list = list(
+            self.object_list.order_by(*self.ordering)[
+                bottom:bottom + self.per_page
+            ]
+        )
+        next_query = previous_query = None
+        if number < self.num_pages:
+            next_query = urlencode({'page': number + 1})
+        if number > 1:
+            previous_query = urlencode({'page': number - 1})
+        return CursorPage(
+            object_list, self, number, next_query, previous_query,
+        )
+
+    def _cursor_page(self, values, backwards):
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(self._reverse(field) for field in ordering)
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(ordering, values))
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if backwards:
+            object_list.reverse()
+
+        has_next = has_more if not backwards else True
+        has_previous = values is not None if not backwards else has_more
+        next_query = previous_query = None
+        if object_list and has_next:
+            next_query = urlencode(
+                {'after': encode_cursor(self._values(object_list[-1]))}
+            )
+        if object_list and has_previous:
+            previous_query = urlencode(
+                {'before': encode_cursor(self._values(object_list[0]))}
+            )
+        return CursorPage(
+            object_list, self, None, next_query, previous_query,
+        )
+
+    def _values(self, obj):
+        return [
+            getattr(obj, field.lstrip('-'))
+            for field in self.ordering
+        ]
+
+    @staticmethod
+    def _reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _seek(ordering, values):
+        """Условие «строго после курсора» для заданной сортировки."""
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            prefix = {
+                ordering[j].lstrip('-'): values[j] for j in range(i)
+            }
+            condition |= Q(**prefix, **{f'{name}__{lookup}': values[i]})
+        return condition
@@ -0,0 +1,15 @@
+from . import graph
+
+
+def can_edit(user, post):
+    """Править и удалять пост может только его автор."""
+    return user.is_authenticated and post.author_id == user.pk
+
+
+def can_follow(user, author):
+    """Подписаться можно на другого автора и только один раз."""
+    return (
+        user.is_authenticated
+        and user.pk != author.pk
+        and not graph.follows(user, author.pk)
+    )
@@ -0,0 +1,155 @@
+import re
+
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Comment, Post
+
+POST_INDEX = 'posts_post_fts'
+COMMENT_INDEX = 'posts_comment_fts'
+# Границы совпадения в snippet(): заменяются на <mark> после экранирования
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 16
+PER_PAGE = 10
+# Поля курсора after: ранг и id последнего найденного поста
+CURSOR_FIELDS = (models.FloatField(), Post._meta.pk)
+
+SEARCH_SQL = f"""
+    SELECT post_id, rank, snippet FROM (
+        SELECT post_id, min(rank) AS rank, snippet FROM (
+            SELECT rowid AS post_id, bm25({POST_INDEX}) AS rank,
+                   snippet({POST_INDEX}, 0, %s, %s, '…', %s) AS snippet
+            FROM {POST_INDEX} WHERE {POST_INDEX} MATCH %s
+            UNION ALL
+            SELECT post_id, 0.5 * bm25({COMMENT_INDEX}),
+                   snippet({COMMENT_INDEX}, 0, %s, %s, '…', %s)
+            FROM {COMMENT_INDEX} WHERE {COMMENT_INDEX} MATCH %s
+        ) GROUP BY post_id
+    )
+    WHERE (rank > %s OR (rank = %s AND post_id > %s))
+      AND post_id IN (SELECT id FROM {Post._meta.db_table})
+    ORDER BY rank, post_id
+    LIMIT %s
+"""
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """
+    Переводит строку из формы поиска в запрос FTS5: каждое слово
+    в кавычках, последнее ищется и как начало слова.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _execute(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def index_post(post):
+    unindex_post(post.pk)
+    _execute(
+        f'INSERT INTO {POST_INDEX}(rowid, text) VALUES (%s, %s)',
+        [post.pk, post.text],
+    )
+
+
+def unindex_post(post_id):
+    _execute(f'DELETE FROM {POST_INDEX} WHERE rowid = %s', [post_id])
+
+
+def index_comment(comment):
+    unindex_comment(comment.pk)
+    _execute(
+        f'INSERT INTO {COMMENT_INDEX}(rowid, text, post_id) '
+        f'VALUES (%s, %s, %s)',
+        [comment.pk, comment.text, comment.post_id],
+    )
+
+
+def unindex_comment(comment_id):
+    _execute(f'DELETE FROM {COMMENT_INDEX} WHERE rowid = %s', [comment_id])
+
+
+def unindex_post_comments(post_id):
+    """Убирает из индекса все комментарии поста одним запросом."""
+    _execute(
+        f'DELETE FROM {COMMENT_INDEX} WHERE rowid IN '
+        f'(SELECT id FROM {Comment._meta.db_table} WHERE post_id = %s)',
+        [post_id],
+    )
+
+
+def rebuild():
+    """Заполняет индексы заново по таблицам постов и комментариев."""
+    _execute(f'DELETE FROM {POST_INDEX}')
+    _execute(f'DELETE FROM {COMMENT_INDEX}')
+    _execute(
+        f'INSERT INTO {POST_INDEX}(rowid, text) '
+        f'SELECT id, text FROM {Post._meta.db_table}'
+    )
+    _execute(
+        f'INSERT INTO {COMMENT_INDEX}(rowid, text, post_id) '
+        f'SELECT id, text, post_id FROM {Comment._meta.db_table}'
+    )
+    _execute(f"INSERT INTO {POST_INDEX}({POST_INDEX}) VALUES ('optimize')")
+    _execute(
+        f"INSERT INTO {COMMENT_INDEX}({COMMENT_INDEX}) VALUES ('optimize')"
+    )
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(
+        MARK_START, '<mark>',
+    ).replace(MARK_END, '</mark>'))
+
+
+def matching_posts(query):
+    """Условие на pk для постов, в тексте которых есть запрос."""
+    return RawSQL(
+        f'SELECT rowid FROM {POST_INDEX} WHERE {POST_INDEX} MATCH %s',
+        [match_expression(query)],
+    )
+
+
+def search(query, after=None, limit=PER_PAGE):
+    """
+    Посты, в тексте которых или в комментариях к которым встречается
+    запрос, от самых релевантных. Совпадения в комментариях весят
+    вдвое меньше совпадений в самом посте. after — пара (rank, post_id)
+    последнего найденного поста предыдущей страницы.
+    У постов заполнены search_rank и search_snippet.
+    """
+    expression = match_expression(query)
+    if not expression or not available():
+        return []
+    rank, post_id = after or (float('-inf'), 0)
+    marks = [MARK_START, MARK_END, SNIPPET_TOKENS, expression]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SEARCH_SQL,
+            marks + marks + [rank, rank, post_id, limit],
+        )
+        hits = cursor.fetchall()
+    posts = Post.objects.for_feed().in_bulk([hit[0] for hit in hits])
+    found = []
+    for post_id, rank, snippet in hits:
+        post = posts.get(post_id)
+        if post is None:
+            continue
+        post.search_rank = rank
+        post.search_snippet = highlight(snippet)
+        found.append(post)
+    return found
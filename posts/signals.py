@@ -0,0 +1,176 @@
+import threading
+
+from django.db.models import Count, F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from tasks.queue import enqueue
+
+from . import (
+    cards, conditional, counters, feed, graph, groups, notifications, search,
+    syndication, tasks, trending,
+)
+from .models import Comment, Follow, Group, Post
+
+# Посты, которые удаляются сейчас в этом потоке: их комментарии
+# удаляются каскадом и учитываются одним запросом на весь пост
+_local = threading.local()
+
+
+def _deleting():
+    if not hasattr(_local, 'posts'):
+        _local.posts = set()
+    return _local.posts
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, update_fields=None, **kwargs):
+    if not instance._state.adding:
+        cards.forget(instance)
+        instance.version = F('version') + 1
+        if update_fields is None or 'group' in update_fields:
+            # Группа до правки: пост мог перейти в другую
+            instance._previous_group_id = Post.objects.filter(
+                pk=instance.pk,
+            ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    previous = None
+    if '_previous_group_id' in instance.__dict__:
+        previous = instance.__dict__.pop('_previous_group_id')
+        if previous != instance.group_id:
+            if previous is not None:
+                counters.group_post_removed(instance, previous)
+                syndication.forget(syndication.group_scope(previous))
+            if instance.group_id is not None:
+                counters.group_post_added(instance, instance.group_id)
+    if created:
+        counters.change(instance.author_id, 'posts_count', 1)
+        if instance.group_id is not None:
+            counters.group_post_added(instance, instance.group_id)
+        enqueue(tasks.fan_out, instance.pk, key=f'fan_out:{instance.pk}')
+        trending.post_added(instance)
+        # Устаревшие посты убираются из рейтинга раз в сутки
+        trim_at = trending.trim_at(timezone.now())
+        enqueue(
+            tasks.trim_trending,
+            key=f'trim_trending:{trim_at.isoformat()}',
+            delay=trim_at - timezone.now(),
+        )
+        # Одна рассылка на окно дайджеста, сразу после его конца
+        end = notifications.window_end(timezone.now())
+        enqueue(
+            tasks.send_digests,
+            key=f'digest:{end.isoformat()}',
+            delay=end - timezone.now(),
+        )
+    else:
+        instance.refresh_from_db(fields=['version', *Post.BACKGROUND_FIELDS])
+    syndication.forget(*syndication.post_scopes(instance))
+    conditional.forget(*conditional.post_scopes(instance, previous))
+    if search.available():
+        search.index_post(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    _deleting().add(instance.pk)
+    authors = Comment.objects.filter(post=instance).order_by().values(
+        'author',
+    ).annotate(count=Count('pk')).values_list('author', 'count')
+    for author_id, count in authors:
+        counters.change(author_id, 'comments_count', -count)
+    if search.available():
+        search.unindex_post_comments(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _deleting().discard(instance.pk)
+    counters.change(instance.author_id, 'posts_count', -1)
+    if instance.group_id is not None:
+        counters.group_post_removed(instance, instance.group_id)
+    cards.forget(instance)
+    syndication.forget(*syndication.post_scopes(instance))
+    conditional.forget(*conditional.post_scopes(instance))
+    if search.available():
+        search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    groups.forget(instance)
+    syndication.forget(syndication.group_scope(instance.pk))
+    if not created:
+        posts = Post.objects.filter(group=instance)
+        cards.bump(posts)
+        # Название группы видно и в карточках на страницах авторов,
+        # и в категориях постов общей ленты и лент авторов
+        authors = list(posts.order_by().values_list(
+            'author_id', 'author__username',
+        ).distinct())
+        conditional.forget(
+            conditional.group_scope(instance.pk),
+            *(conditional.author_scope(pk) for pk, _ in authors),
+        )
+        syndication.forget(
+            syndication.INDEX,
+            *(syndication.author_scope(name) for _, name in authors),
+        )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    groups.forget(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        graph.forget(instance.user_id)
+        counters.change(instance.author_id, 'followers_count', 1)
+        counters.change(instance.user_id, 'following_count', 1)
+        enqueue(
+            tasks.follow_created, instance.pk,
+            key=f'follow_created:{instance.pk}',
+        )
+        enqueue(tasks.rescore_author, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    graph.forget(instance.user_id)
+    counters.change(instance.author_id, 'followers_count', -1)
+    counters.change(instance.user_id, 'following_count', -1)
+    feed.follow_deleted(instance)
+    enqueue(tasks.rescore_author, instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change(instance.author_id, 'comments_count', 1)
+        counters.change_comments(instance.post_id, 1)
+        conditional.forget(*conditional.post_scopes(instance.post))
+        trending.comment_added(instance)
+    if search.available():
+        search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    # При удалении поста его комментарии уже учтены в post_deleting,
+    # а число комментариев, страницы и рейтинг поста уходят вместе с ним
+    if instance.post_id in _deleting():
+        return
+    counters.change(instance.author_id, 'comments_count', -1)
+    counters.change_comments(instance.post_id, -1)
+    conditional.forget(*conditional.post_scopes(instance.post))
+    trending.comment_removed(instance)
+    if search.available():
+        search.unindex_comment(instance.pk)
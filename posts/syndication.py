@@ -0,0 +1,222 @@
+import datetime
+import itertools
+import json
+from xml.sax.saxutils import escape, quoteattr
+
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.http import http_date
+from django.utils.text import Truncator
+
+from . import versions
+
+# Сколько последних постов отдаёт лента
+FEED_SIZE = 20
+BODY_TIMEOUT = 24 * 60 * 60
+TITLE_WORDS = 10
+INDEX = 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def _version_key(scope):
+    return f'syndication:{scope}:version'
+
+
+def version(scope):
+    """Версия лент scope — время их последнего изменения в миллисекундах."""
+    return versions.current(_version_key(scope))
+
+
+def forget(*scopes):
+    """Выпускает новую версию лент: тела прежних версий больше не читаются."""
+    versions.bump(*(_version_key(scope) for scope in scopes))
+
+
+def post_scopes(post):
+    """Ленты, в которые попадает пост: общая, автора и группы."""
+    scopes = [INDEX, author_scope(post.author.username)]
+    if post.group_id is not None:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+class Channel:
+    """Заголовок ленты и абсолютные адреса её страницы и самой ленты."""
+
+    def __init__(self, title, link, feed_url, updated, base):
+        self.title = title
+        self.link = link
+        self.feed_url = feed_url
+        self.updated = updated
+        self.base = base
+
+    def post_url(self, post):
+        path = reverse('post', args=(post.author.username, post.pk))
+        return self.base + path
+
+
+def _title(post):
+    return Truncator(post.text).words(TITLE_WORDS, truncate='…')
+
+
+def _rss(channel, posts):
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">'
+        f'<channel><title>{escape(channel.title)}</title>'
+        f'<link>{escape(channel.link)}</link>'
+        f'<description>{escape(channel.title)}</description>'
+        f'<atom:link href={quoteattr(channel.feed_url)} rel="self"/>'
+        f'<lastBuildDate>{rfc2822_date(channel.updated)}</lastBuildDate>'
+    )
+    for post in posts:
+        url = escape(channel.post_url(post))
+        category = ''
+        if post.group is not None:
+            category = f'<category>{escape(post.group.title)}</category>'
+        yield (
+            f'<item><title>{escape(_title(post))}</title>'
+            f'<link>{url}</link><guid isPermaLink="true">{url}</guid>'
+            f'<description>{escape(post.text)}</description>'
+            f'<pubDate>{rfc2822_date(post.pub_date)}</pubDate>'
+            f'{category}</item>'
+        )
+    yield '</channel></rss>\n'
+
+
+def _atom(channel, posts):
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">'
+        f'<title>{escape(channel.title)}</title>'
+        f'<link href={quoteattr(channel.link)}/>'
+        f'<link href={quoteattr(channel.feed_url)} rel="self"/>'
+        f'<id>{escape(channel.link)}</id>'
+        f'<updated>{rfc3339_date(channel.updated)}</updated>'
+    )
+    for post in posts:
+        url = channel.post_url(post)
+        category = ''
+        if post.group is not None:
+            category = (
+                f'<category term={quoteattr(post.group.slug)} '
+                f'label={quoteattr(post.group.title)}/>'
+            )
+        yield (
+            f'<entry><title>{escape(_title(post))}</title>'
+            f'<link href={quoteattr(url)}/><id>{escape(url)}</id>'
+            f'<updated>{rfc3339_date(post.pub_date)}</updated>'
+            f'<author><name>{escape(post.author.username)}</name></author>'
+            f'<content type="text">{escape(post.text)}</content>'
+            f'{category}</entry>'
+        )
+    yield '</feed>\n'
+
+
+def _json(channel, posts):
+    header = json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': channel.title,
+        'home_page_url': channel.link,
+        'feed_url': channel.feed_url,
+    }, ensure_ascii=False)
+    yield header[:-1] + ', "items": ['
+    for number, post in enumerate(posts):
+        url = channel.post_url(post)
+        item = {
+            'id': url,
+            'url': url,
+            'title': _title(post),
+            'content_text': post.text,
+            'date_published': post.pub_date.isoformat(),
+            'authors': [{'name': post.author.username}],
+        }
+        if post.group is not None:
+            item['tags'] = [post.group.title]
+        yield (', ' if number else '') + json.dumps(item, ensure_ascii=False)
+    yield ']}\n'
+
+
+# Формат ленты: запись тела и тип содержимого
+FORMATS = {
+    'rss': (_rss, 'application/rss+xml; charset=utf-8'),
+    'atom': (_atom, 'application/atom+xml; charset=utf-8'),
+    'json': (_json, 'application/feed+json; charset=utf-8'),
+}
+
+
+def _stored(key, chunks):
+    """Отдаёт части тела по мере записи и кеширует тело целиком."""
+    body = []
+    for chunk in chunks:
+        chunk = chunk.encode()
+        body.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(body), BODY_TIMEOUT)
+
+
+def _validated(response, etag, modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def response(request, scope, fmt, title, page_url, posts):
+    """
+    Лента scope в формате fmt. ETag и Last-Modified — версия лент,
+    поэтому условный GET отвечается 304 одним запросом к базе. Готовое
+    тело берётся из кеша, а без него посты из posts() читаются
+    потоком и лента пишется по одной записи, попутно попадая в кеш.
+    posts вызывается только тогда и может поднять Http404.
+    """
+    if fmt not in FORMATS:
+        raise Http404
+    write, content_type = FORMATS[fmt]
+    current = version(scope)
+    etag = f'"{current}-{fmt}"'
+    modified = current // 1000
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=modified,
+    )
+    if conditional is not None:
+        return _validated(conditional, etag, modified)
+
+    base = request.build_absolute_uri('/')[:-1]
+    key = f'syndication:{scope}:{current}:{fmt}:{base}'
+    body = cache.get(key)
+    if body is not None:
+        return _validated(
+            HttpResponse(body, content_type=content_type), etag, modified,
+        )
+    rows = posts().order_by('-pub_date', '-pk')[:FEED_SIZE].iterator()
+    # Первый пост читается здесь, чтобы запрос выполнился внутри
+    # представления: с выбранной репликой и в учёте метрик
+    first = list(itertools.islice(rows, 1))
+    channel = Channel(
+        title,
+        base + page_url,
+        request.build_absolute_uri(),
+        datetime.datetime.fromtimestamp(
+            current / 1000, tz=datetime.timezone.utc,
+        ),
+        base,
+    )
+    return _validated(
+        StreamingHttpResponse(
+            _stored(key, write(channel, itertools.chain(first, rows))),
+            content_type=content_type,
+        ),
+        etag,
+        modified,
+    )
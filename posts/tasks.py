@@ -0,0 +1,54 @@
+from tasks.queue import task
+
+from . import feed, images, notifications, trending
+from .models import Follow, Post
+
+
+@task
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        feed.fan_out(post)
+
+
+@task
+def follow_created(follow_id):
+    # Пока задача ждала очереди, пользователь мог уже отписаться
+    follow = Follow.objects.filter(pk=follow_id).first()
+    if follow is not None:
+        feed.follow_created(follow)
+
+
+@task
+def follows_created(follow_ids):
+    # Пачка подписок из graph.follow: одна задача на всю пачку
+    for follow in Follow.objects.filter(pk__in=follow_ids):
+        feed.follow_created(follow)
+
+
+@task
+def rescore_author(author_id):
+    trending.author_rescored(author_id)
+
+
+@task
+def rescore_authors(author_ids):
+    for author_id in author_ids:
+        trending.author_rescored(author_id)
+
+
+@task
+def trim_trending():
+    trending.trim()
+
+
+# Кодирование картинок идёт долго, а транзакция держала бы всё это
+# время блокировку базы; условный UPDATE в generate атомарен и так
+@task(atomic=False)
+def thumbnail(post_id):
+    images.generate(post_id)
+
+
+@task(atomic=False)
+def send_digests():
+    notifications.send_due()
@@ -0,0 +1,25 @@
+from django import template
+from django.conf import settings
+
+from posts import images
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes_posts/post_picture.html')
+def post_picture(post):
+    sources = [
+        {
+            'type': f'image/{image_format}',
+            'srcset': images.srcset(post, image_format),
+        }
+        for image_format in settings.POST_IMAGE_FORMATS
+        if image_format != images.FALLBACK_FORMAT
+    ]
+    return {
+        'post': post,
+        'sources': sources,
+        'srcset': images.srcset(post, images.FALLBACK_FORMAT),
+        'sizes': f'(max-width: {max(settings.POST_IMAGE_WIDTHS)}px) 100vw, '
+                 f'{max(settings.POST_IMAGE_WIDTHS)}px',
+    }
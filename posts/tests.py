@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from posts.models import Group, Post, Follow
 from django.contrib.auth.models import User
 from django.urls import reverse
@@ -9,7 +9,7 @@ import time
 
 def not_find_post(self, response, text, author):
     if "page" in response.context:
-        self.assertEqual(response.context["page"].object_list.count(), 0)
+        self.assertEqual(len(response.context["page"].object_list), 0)
     else:
         self.assertEqual(response.context["post"].count(), 0)
 
@@ -36,6 +36,7 @@ def find_comment(self, response, author, text):
     self.assertEqual(response.context["items"][0].author.username, author)
 
 
+@override_settings(TASKS_MODE='inline', TASK_POLL_INTERVAL=None)
 class TestStringMethods(TestCase):
     def setUp(self):
         print("SetUp")
@@ -0,0 +1,305 @@
+import datetime
+import json
+import os
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feed, search, trending
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+READ_SIZE = 64 * 1024
+# Порядок выгрузки и загрузки: сначала те, на кого ссылаются
+MODELS = (
+    ('auth.user', User, (
+        'username', 'password', 'first_name', 'last_name', 'email',
+        'is_active', 'date_joined', 'last_login',
+    )),
+    ('posts.group', Group, ('title', 'slug', 'description')),
+    ('posts.post', Post, ('text', 'pub_date', 'author', 'group', 'image')),
+    ('posts.comment', Comment, ('post', 'author', 'text', 'created')),
+    ('posts.follow', Follow, ('user', 'author')),
+)
+DATE_FIELDS = ('date_joined', 'last_login', 'pub_date', 'created')
+
+
+class TransferError(Exception):
+    pass
+
+
+def _default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def export(stream, batch_size=BATCH_SIZE):
+    """
+    Пишет пользователей, группы, посты, комментарии и подписки в stream
+    по одному объекту в строке, в формате записей dumpdata.
+    Строки читаются из базы итератором, по batch_size за раз.
+    """
+    written = 0
+    for label, model, fields in MODELS:
+        rows = model.objects.order_by('pk').values('pk', *fields)
+        for row in rows.iterator(chunk_size=batch_size):
+            pk = row.pop('pk')
+            stream.write(json.dumps(
+                {'model': label, 'pk': pk, 'fields': row},
+                ensure_ascii=False,
+                default=_default,
+            ))
+            stream.write('\n')
+            written += 1
+    return written
+
+
+def _read_array(stream):
+    """Элементы JSON-массива, разобранные по мере чтения файла."""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(READ_SIZE).lstrip()[1:]
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except ValueError:
+            chunk = stream.read(READ_SIZE)
+            if not chunk:
+                raise TransferError('Файл оборвался посреди массива')
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def read_objects(path):
+    """
+    Записи из файла выгрузки: JSON Lines от export() или
+    массив dumpdata вроде dump.json. Файл не читается целиком.
+    """
+    with open(path, encoding='utf-8') as stream:
+        head = stream.read(READ_SIZE).lstrip()
+        stream.seek(0)
+        if head.startswith('['):
+            yield from _read_array(stream)
+            return
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise TransferError(f'Строка {number}: {error}')
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _max_pk(model):
+    return model.objects.aggregate(top=Max('pk'))['top'] or 0
+
+
+@contextmanager
+def explicit_dates():
+    """Позволяет задать pub_date и created при bulk_create."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """
+    Потоковая загрузка выгрузки в базу, в которой уже могут быть данные.
+
+    Файл читается заново для каждой модели, поэтому порядок записей
+    в нём не важен, а в памяти держится одна пачка. Пользователи
+    и группы сопоставляются с существующими по username и slug,
+    их новые id хранятся в словарях. Посты и комментарии получают id
+    со сдвигом, который записан в файле контрольной точки, так что
+    повторный запуск после сбоя пропускает загруженные пачки и не
+    создаёт дублей. Сигналы при bulk_create не срабатывают: ленты,
+    счётчики и поисковый индекс пересобираются в конце.
+    """
+
+    def __init__(self, path, checkpoint=None, batch_size=BATCH_SIZE,
+                 progress=None):
+        self.path = path
+        self.checkpoint = checkpoint or f'{path}.checkpoint'
+        self.batch_size = batch_size
+        self.progress = progress or (lambda label, count: None)
+        self.users = {}
+        self.groups = {}
+        self.state = {'offsets': {}, 'done': {}, 'skipped': []}
+
+    def run(self):
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint, encoding='utf-8') as saved:
+                self.state = json.load(saved)
+        self.skipped = set(self.state['skipped'])
+        with explicit_dates():
+            for label, model, fields in MODELS:
+                self._import(label, model)
+        for model in (User, Group, Post, Comment, Follow):
+            self._reset_sequence(model)
+        cache.clear()
+        feed.rebuild()
+        counters.rebuild()
+        trending.rebuild()
+        if search.available():
+            search.rebuild()
+        os.remove(self.checkpoint)
+        return self.state['done']
+
+    def _entries(self, label):
+        return (
+            entry for entry in read_objects(self.path)
+            if entry.get('model') == label
+        )
+
+    def _import(self, label, model):
+        offsets = self.state['offsets']
+        if label not in offsets:
+            # Сдвиг сохраняется до первой вставки: иначе после сбоя
+            # он посчитался бы заново и пачки загрузились бы дважды
+            offsets[label] = _max_pk(model)
+            self._save_state()
+        done = self.state['done'].get(label, 0)
+        handler = getattr(self, f'_build_{model._meta.model_name}')
+        loaded = 0
+        for batch in _batches(self._entries(label), self.batch_size):
+            loaded += len(batch)
+            # Пользователи и группы нужны для словарей id даже
+            # из уже загруженных пачек: повторная загрузка ничего
+            # не создаст, а только найдёт их по username и slug.
+            if loaded <= done and label not in ('auth.user',
+                                                'posts.group'):
+                continue
+            with transaction.atomic():
+                objects = handler(batch, offsets[label])
+                model.objects.bulk_create(objects, ignore_conflicts=True)
+            self.state['done'][label] = max(done, loaded)
+            self._save_state()
+            self.progress(label, loaded)
+
+    def _save_state(self):
+        self.state['skipped'] = sorted(self.skipped)
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as output:
+            json.dump(self.state, output)
+        os.replace(temporary, self.checkpoint)
+
+    def _build_by_key(self, batch, model, key, mapping, make):
+        values = [entry['fields'][key] for entry in batch]
+        existing = dict(
+            model.objects.filter(**{f'{key}__in': values})
+            .values_list(key, 'pk')
+        )
+        objects = []
+        next_pk = _max_pk(model) + 1
+        for entry in batch:
+            value = entry['fields'][key]
+            if value not in existing:
+                existing[value] = next_pk
+                objects.append(make(next_pk, entry['fields']))
+                next_pk += 1
+            mapping[entry['pk']] = existing[value]
+        return objects
+
+    def _build_user(self, batch, offset):
+        def make(pk, fields):
+            return User(pk=pk, **{
+                name: self._value(name, fields.get(name))
+                for name in MODELS[0][2] if name in fields
+            })
+        return self._build_by_key(batch, User, 'username', self.users, make)
+
+    def _build_group(self, batch, offset):
+        def make(pk, fields):
+            return Group(pk=pk, title=fields['title'], slug=fields['slug'],
+                         description=fields.get('description', ''))
+        return self._build_by_key(batch, Group, 'slug', self.groups, make)
+
+    def _build_post(self, batch, offset):
+        objects = []
+        for entry in batch:
+            fields = entry['fields']
+            author = self.users.get(fields['author'])
+            if author is None:
+                self.skipped.add(entry['pk'])
+                continue
+            objects.append(Post(
+                pk=offset + entry['pk'],
+                text=fields['text'],
+                pub_date=self._value('pub_date', fields['pub_date']),
+                author_id=author,
+                group_id=self.groups.get(fields.get('group')),
+                image=fields.get('image') or '',
+            ))
+        return objects
+
+    def _build_comment(self, batch, offset):
+        post_offset = self.state['offsets']['posts.post']
+        objects = []
+        for entry in batch:
+            fields = entry['fields']
+            author = self.users.get(fields['author'])
+            if author is None or fields['post'] in self.skipped:
+                continue
+            objects.append(Comment(
+                pk=offset + entry['pk'],
+                post_id=post_offset + fields['post'],
+                author_id=author,
+                text=fields['text'],
+                created=self._value('created', fields['created']),
+            ))
+        return objects
+
+    def _build_follow(self, batch, offset):
+        objects = []
+        for entry in batch:
+            user = self.users.get(entry['fields']['user'])
+            author = self.users.get(entry['fields']['author'])
+            if user is not None and author is not None:
+                objects.append(Follow(user_id=user, author_id=author))
+        return objects
+
+    @staticmethod
+    def _value(name, value):
+        if name in DATE_FIELDS and isinstance(value, str):
+            return parse_datetime(value)
+        return value
+
+    @staticmethod
+    def _reset_sequence(model):
+        statements = connection.ops.sequence_reset_sql(no_style(), [model])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
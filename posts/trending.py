@@ -0,0 +1,178 @@
+import datetime
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, TrendingScore
+
+# Рейтинг поста — log2 суммы вкладов автора и комментариев, каждый
+# из которых умножен на 2 ** (время вклада в периодах полураспада
+# от EPOCH). Затухание со временем у всех постов одинаковое, поэтому
+# порядок по такому числу совпадает с порядком по затухшей сумме,
+# а сохранённые рейтинги не нужно пересчитывать с течением времени.
+EPOCH = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+# Во сколько комментариев обходится удвоение числа подписчиков автора
+FOLLOWERS_WEIGHT = 1.0
+BATCH_SIZE = 500
+
+
+def _half_lives(moment):
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 60 * 60
+    return (moment - EPOCH).total_seconds() / half_life
+
+
+def _author_term(pub_date, followers):
+    weight = 1 + FOLLOWERS_WEIGHT * math.log2(1 + followers)
+    return _half_lives(pub_date) + math.log2(weight)
+
+
+def _add(score, term):
+    """log2(2 ** score + 2 ** term) без переполнения."""
+    high, low = max(score, term), min(score, term)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def _subtract(score, term):
+    """log2(2 ** score - 2 ** term); -inf, если вычитать нечего."""
+    if term >= score:
+        return -math.inf
+    return score + math.log2(1 - 2 ** (term - score))
+
+
+def cutoff():
+    """Посты, опубликованные раньше, в рейтинг не попадают."""
+    return timezone.now() - datetime.timedelta(days=settings.TRENDING_DAYS)
+
+
+def trim_at(moment):
+    """Когда убирать из рейтинга посты, устаревшие к концу суток moment."""
+    return datetime.datetime.combine(
+        moment.date() + datetime.timedelta(days=1),
+        datetime.time(),
+        tzinfo=moment.tzinfo,
+    )
+
+
+def top():
+    """
+    Посты из рейтинга, от самых популярных. Сортировка идёт по индексу
+    (score, post), поэтому первые N постов стоят N строк, а не
+    просмотра всех комментариев. Устаревшие посты отбрасываются и до
+    ночной обрезки: рейтинг давних постов затух, и они стоят в конце.
+    """
+    return Post.objects.filter(
+        trending__isnull=False, pub_date__gte=cutoff(),
+    ).annotate(
+        trending_score=F('trending__score'),
+    ).order_by('-trending_score', '-pk')
+
+
+def post_added(post):
+    if post.pub_date < cutoff():
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).count()
+    TrendingScore.objects.create(
+        post=post,
+        score=_author_term(post.pub_date, followers),
+        followers=followers,
+    )
+
+
+def _change(post_id, term, add):
+    """
+    Прибавляет вклад к рейтингу поста или вычитает его. Постов вне
+    рейтинга это не касается. Рейтинг не опускается ниже вклада
+    автора, даже если округления накопились.
+    """
+    with transaction.atomic(savepoint=False):
+        row = TrendingScore.objects.select_for_update(of=('self',)).filter(
+            post_id=post_id,
+        ).values_list('score', 'followers', 'post__pub_date').first()
+        if row is None:
+            return
+        score, followers, pub_date = row
+        if add:
+            score = _add(score, term)
+        else:
+            score = max(
+                _subtract(score, term), _author_term(pub_date, followers),
+            )
+        TrendingScore.objects.filter(post_id=post_id).update(score=score)
+
+
+def comment_added(comment):
+    _change(comment.post_id, _half_lives(comment.created), add=True)
+
+
+def comment_removed(comment):
+    _change(comment.post_id, _half_lives(comment.created), add=False)
+
+
+@transaction.atomic
+def author_rescored(author_id):
+    """
+    Заменяет вклад автора в рейтинги его постов вкладом по текущему
+    числу подписчиков. Посты, посчитанные уже по нему, не трогает,
+    поэтому повторный вызов ничего не меняет.
+    """
+    followers = Follow.objects.filter(author_id=author_id).count()
+    rows = TrendingScore.objects.select_for_update(of=('self',)).filter(
+        post__author_id=author_id,
+    ).exclude(followers=followers).values_list(
+        'post_id', 'score', 'followers', 'post__pub_date',
+    )
+    changed = []
+    for post_id, score, old, pub_date in rows:
+        term = _author_term(pub_date, followers)
+        score = _subtract(
+            _add(score, term), _author_term(pub_date, old),
+        )
+        changed.append(TrendingScore(
+            post_id=post_id,
+            score=max(score, term),
+            followers=followers,
+        ))
+    TrendingScore.objects.bulk_update(
+        changed, ['score', 'followers'], batch_size=BATCH_SIZE,
+    )
+
+
+def trim():
+    """Убирает из рейтинга посты старше TRENDING_DAYS дней."""
+    TrendingScore.objects.filter(post__pub_date__lt=cutoff()).delete()
+
+
+@transaction.atomic
+def rebuild():
+    """Пересчитывает рейтинг с нуля по постам, комментариям и подпискам."""
+    since = cutoff()
+    TrendingScore.objects.all().delete()
+    followers = dict(
+        Follow.objects.order_by().values('author').annotate(
+            count=Count('pk'),
+        ).values_list('author', 'count')
+    )
+    scores = {}
+    posts = Post.objects.filter(pub_date__gte=since).values_list(
+        'pk', 'author_id', 'pub_date',
+    )
+    for pk, author_id, pub_date in posts.iterator():
+        count = followers.get(author_id, 0)
+        scores[pk] = TrendingScore(
+            post_id=pk,
+            score=_author_term(pub_date, count),
+            followers=count,
+        )
+    comments = Comment.objects.filter(
+        post__pub_date__gte=since,
+    ).values_list('post_id', 'created')
+    for post_id, created in comments.iterator():
+        row = scores.get(post_id)
+        if row is not None:
+            row.score = _add(row.score, _half_lives(created))
+    TrendingScore.objects.bulk_create(
+        scores.values(), batch_size=BATCH_SIZE,
+    )
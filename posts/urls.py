@@ -4,9 +4,18 @@ from . import views
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("feed.<str:fmt>", views.index_feed, name="index_feed"),
+    path("group/", views.group_index, name="group_index"),
     path("group/<slug:slug>/", views.group_post, name="group_post"),
+    path(
+        "group/<slug:slug>/feed.<str:fmt>",
+        views.group_feed,
+        name="group_feed",
+    ),
     path("new/", views.post_new, name="post_new"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("trending/", views.trending_index, name="trending"),
+    path("search/", views.search_posts, name="search"),
     path(
         "<str:username>/follow/",
         views.profile_follow,
@@ -18,6 +27,11 @@ urlpatterns = [
         name="profile_unfollow",
     ),
     path('<str:username>/', views.profile, name='profile'),
+    path(
+        '<str:username>/feed.<str:fmt>',
+        views.profile_feed,
+        name='profile_feed',
+    ),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path(
         '<str:username>/<int:post_id>/edit/',
@@ -29,6 +43,11 @@ urlpatterns = [
         views.post_delete,
         name='post_delete',
     ),
+    path(
+        '<str:username>/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments',
+    ),
     path(
         "<username>/<int:post_id>/comment",
         views.add_comment,
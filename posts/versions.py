@@ -0,0 +1,50 @@
+import time
+
+from django.db.models import BigIntegerField, F, Value
+from django.db.models.functions import Greatest
+
+from .models import Version
+
+# Версии хранятся в базе, а не в кеше: кеш locmem у каждого процесса
+# свой, и правка в одном процессе не меняла бы ETag в остальных
+
+
+def _now():
+    return int(time.time() * 1000)
+
+
+def current(key):
+    """
+    Версия данных под ключом key — время их последнего изменения
+    в миллисекундах. Если версии ещё нет, данные считаются
+    изменёнными сейчас.
+    """
+    stamps = list(
+        Version.objects.filter(key=key).values_list('stamp', flat=True)
+    )
+    if stamps:
+        return stamps[0]
+    now = _now()
+    Version.objects.bulk_create(
+        [Version(key=key, stamp=now)], ignore_conflicts=True,
+    )
+    return now
+
+
+def bump(*keys):
+    """
+    Выпускает новую версию данных под ключами keys. Запись идёт
+    в транзакции изменения, поэтому новую версию видят вместе
+    с самими данными.
+    """
+    # Две записи за одну миллисекунду тоже дают разные версии
+    updated = Version.objects.filter(key__in=keys).update(
+        stamp=Greatest(
+            F('stamp') + 1, Value(_now(), output_field=BigIntegerField()),
+        ),
+    )
+    if updated < len(set(keys)):
+        Version.objects.bulk_create(
+            [Version(key=key, stamp=_now()) for key in keys],
+            ignore_conflicts=True,
+        )
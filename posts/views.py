@@ -1,34 +1,65 @@
-from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.urls import reverse
 
 from datetime import datetime
-
+from urllib.parse import urlencode
+
+from yatube.caching import cache_page_shared
+from yatube.concurrency import gather
+from yatube.metrics import query_budget
+from yatube.routers import read_only, use_primary
+from yatube.sqlite import retry_on_lock
+
+from . import (
+    counters, feed, graph, groups, images, search, syndication, trending,
+)
+from .conditional import group_page, post_page, profile_page
+from .permissions import can_edit, can_follow
 from .forms import PostForm, CommentForm
+from .paginator import (
+    COMMENTS_PER_PAGE, CursorPage, CursorPaginator, GROUPS_PER_PAGE, PER_PAGE,
+    InvalidCursor, clean_cursor, decode_cursor, encode_cursor, first_query,
+)
 
 from .models import Group, Post, User, Follow
 
 
-def following_check(user, author_username):
-    if not user.is_authenticated:
-        return False
-    try:
-        following = Follow.objects.get(
-            author__username=author_username,
-            user=user,
-        )
-    except Follow.DoesNotExist:
-        following = False
-    return following
+def author_with_stats(username):
+    """Автор со счётчиками: строка счётчиков создаётся при первом чтении."""
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
+    )
+    counters.for_user(author)
+    return author
 
 
-@cache_page(5 * 1, key_prefix="index_page")
+def feed_page(posts, params):
+    paginator = CursorPaginator(posts)
+    return paginator, paginator.get_page(params)
+
+
+def comments_page(post, params):
+    """
+    Комментарии поста и их страница: с начала или после курсора
+    after. Строки не считаются, авторы подтягиваются тем же запросом.
+    """
+    comments = post.comments.select_related('author').order_by(
+        'created', 'pk',
+    )
+    paginator = CursorPaginator(comments, COMMENTS_PER_PAGE, jump_limit=0)
+    return comments, paginator.get_page(params)
+
+
+@cache_page_shared(5 * 1, key_prefix="index_page")
+@query_budget(4)
+@read_only
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    paginator = CursorPaginator(post_list)
+    page = paginator.get_page(request.GET)
 
     return render(
         request,
@@ -37,13 +68,56 @@ def index(request):
     )
 
 
-def group_post(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
+@cache_page_shared(5 * 1, key_prefix="trending_page")
+@query_budget(4)
+@read_only
+def trending_index(request):
+    """Популярные посты: по недавним комментариям и подписчикам автора."""
+    paginator = CursorPaginator(trending.top().for_feed())
+    page = paginator.get_page(request.GET)
+
+    return render(
+        request,
+        'index.html',
+        {
+            'page': page,
+            'paginator': paginator,
+            'index': False,
+            'follow': False,
+            'trending': True,
+        },
+    )
+
 
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+@query_budget(4)
+@read_only
+def group_index(request):
+    """
+    Каталог сообществ со статистикой из GroupStats: число записей,
+    авторов и дата последней записи не пересчитываются при показе.
+    """
+    paginator = CursorPaginator(
+        Group.objects.select_related('stats').order_by('title', 'pk'),
+        GROUPS_PER_PAGE,
+    )
+    page = paginator.get_page(request.GET)
+    for group in page:
+        counters.for_group(group)
+    return render(
+        request,
+        'groups.html',
+        {'page': page, 'paginator': paginator},
+    )
+
+
+@group_page
+@query_budget(9)
+@read_only
+def group_post(request, slug):
+    group = groups.lookup(slug)
+    if group is None:
+        raise Http404
+    paginator, page = feed_page(group.posts.for_feed(), request.GET)
     return render(
         request,
         "group.html",
@@ -51,7 +125,83 @@ def group_post(request, slug):
     )
 
 
+@query_budget(2)
+@read_only
+def index_feed(request, fmt):
+    return syndication.response(
+        request, syndication.INDEX, fmt,
+        'Последние обновления на сайте', reverse('index'),
+        lambda: Post.objects.for_feed(),
+    )
+
+
+@query_budget(3)
+@read_only
+def group_feed(request, slug, fmt):
+    group = groups.lookup(slug)
+    if group is None:
+        raise Http404
+    return syndication.response(
+        request, syndication.group_scope(group.pk), fmt,
+        f'Записи сообщества {group.title}',
+        reverse('group_post', args=(slug,)),
+        lambda: group.posts.for_feed(),
+    )
+
+
+@query_budget(3)
+@read_only
+def profile_feed(request, username, fmt):
+    def posts():
+        author = get_object_or_404(User, username=username)
+        return Post.objects.filter(author=author).for_feed()
+
+    return syndication.response(
+        request, syndication.author_scope(username), fmt,
+        f'Записи пользователя {username}',
+        reverse('profile', args=(username,)),
+        posts,
+    )
+
+
+@query_budget(5)
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    after = None
+    if request.GET.get('after'):
+        try:
+            after = clean_cursor(
+                decode_cursor(request.GET['after']), search.CURSOR_FIELDS,
+            )
+        except InvalidCursor:
+            # Как и в лентах, негодный курсор открывает первую страницу
+            pass
+    posts = search.search(query, after, PER_PAGE + 1)
+
+    next_query = previous_query = None
+    if len(posts) > PER_PAGE:
+        posts = posts[:PER_PAGE]
+        last = posts[-1]
+        next_query = urlencode({
+            'q': query,
+            'after': encode_cursor([last.search_rank, last.pk]),
+        })
+    if after is not None:
+        previous_query = urlencode({'q': query})
+    page = CursorPage(
+        posts, None, None, next_query, previous_query,
+        first_query(request.GET),
+    )
+    return render(
+        request,
+        'search.html',
+        {'query': query, 'page': page},
+    )
+
+
 @login_required
+@use_primary
+@retry_on_lock
 def post_new(request):
     if not request.method == 'POST':
         form = PostForm()
@@ -73,53 +223,108 @@ def post_new(request):
     post.author = request.user
     post.pub_date = datetime.now()
     post.save()
+    images.schedule(post)
 
     return redirect('index')
 
 
+@profile_page
+@query_budget(13)
+@read_only
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    posts = user.posts.all()
-    paginator = Paginator(posts, 10)
-
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = following_check(request.user, username)
+    user, (paginator, page) = gather(
+        lambda: author_with_stats(username),
+        lambda: feed_page(
+            Post.objects.filter(author__username=username).for_feed(),
+            request.GET,
+        ),
+    )
     return render(
         request,
         'profile/profile.html',
         {
             'author': user,
+            'stats': counters.for_user(user),
             'page': page,
             'paginator': paginator,
-            'following': following,
+            'following': graph.follows(request.user, user.pk),
         },
     )
 
 
+@post_page
+@query_budget(11)
+@read_only
 def post_view(request, username, post_id):
-    user = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, pk=post_id, author__username=username)
+    user, post = gather(
+        lambda: author_with_stats(username),
+        lambda: get_object_or_404(
+            Post.objects.for_feed(),
+            pk=post_id,
+            author__username=username,
+        ),
+    )
     form = CommentForm()
-    comments = post.comments.all()
-    following = following_check(request.user, username)
+    comments, page = comments_page(post, request.GET)
     return render(
         request,
         'posts/post.html',
         {
             'author': user,
+            'stats': counters.for_user(user),
             'post': post,
             'form': form,
-            'items': comments,
-            'following': following,
+            'items': page,
+            'comments': comments,
+            'following': graph.follows(request.user, user.pk),
         },
     )
 
 
+@query_budget(3)
+@read_only
+def post_comments(request, username, post_id):
+    """
+    Следующая страница комментариев для кнопки «Показать ещё»:
+    HTML-фрагмент, а с format=json — список комментариев и адрес
+    следующей страницы.
+    """
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        pk=post_id,
+        author__username=username,
+    )
+    comments, page = comments_page(post, request.GET)
+    if request.GET.get('format') != 'json':
+        return render(
+            request,
+            'includes_posts/comment_list.html',
+            {'post': post, 'items': page},
+        )
+    next_url = None
+    if page.has_next():
+        next_url = reverse('post_comments', args=(username, post_id))
+        next_url = f'{next_url}?{page.next_query}&format=json'
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created,
+            }
+            for comment in page
+        ],
+        'next': next_url,
+    })
+
+
 @login_required
+@use_primary
+@retry_on_lock
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, pk=post_id, author__username=username)
-    if not post.author == request.user:
+    if not can_edit(request.user, post):
         return redirect('post', username=username, post_id=post_id)
     form = PostForm(
         request.POST or None,
@@ -138,14 +343,20 @@ def post_edit(request, username, post_id):
             'posts/post_new.html',
             {'post': post, 'form': form, 'is_edit': True},
         )
-    form.save()
+    post = form.save()
+    if 'image' in form.changed_data:
+        # Миниатюра прежней картинки новой не подходит
+        Post.objects.filter(pk=post.pk).update(thumbnail='')
+        images.schedule(post)
     return redirect('post', username=request.user.username, post_id=post_id)
 
 
 @login_required
+@use_primary
+@retry_on_lock
 def post_delete(request, username, post_id):
     post = get_object_or_404(Post, pk=post_id, author__username=username)
-    if not post.author == request.user:
+    if not can_edit(request.user, post):
         return redirect('post', username=username, post_id=post_id)
     post.delete()
     return redirect('index')
@@ -165,82 +376,78 @@ def server_error(request):
 
 
 @login_required
+@query_budget(14)
+@use_primary
+@retry_on_lock
 def add_comment(request, username, post_id):
-    user = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, pk=post_id, author__username=username)
-    comments = post.comments.all()
-    form = CommentForm(request.POST)
-
-    if not request.method == 'POST':
-        form = CommentForm()
-        return render(
-            request,
-            'posts/post.html',
-            {
-                'author': user,
-                'post': post,
-                'form': form,
-                'items': comments
-            },
-        )
-
-    if not form.is_valid():
-        return render(
-            request,
-            'posts/post.html',
-            {
-                'author': user,
-                'post': post,
-                'form': form,
-                'items': comments
-            },
-        )
-
-    comment = form.save(commit=False)
-    comment.post = get_object_or_404(
-        Post,
+    post = get_object_or_404(
+        Post.objects.for_feed(),
         pk=post_id,
         author__username=username,
     )
-    comment.author = request.user
-    comment.created = datetime.now()
-    comment.save()
-    return redirect('post', username, post_id)
+    form = CommentForm(request.POST if request.method == 'POST' else None)
+    if form.is_bound and form.is_valid():
+        comment = form.save(commit=False)
+        # Пост уже прочитан: повторный запрос за ним не нужен
+        comment.post = post
+        comment.author = request.user
+        comment.created = datetime.now()
+        comment.save()
+        return redirect('post', username, post_id)
+
+    comments, page = comments_page(post, request.GET)
+    return render(
+        request,
+        'posts/post.html',
+        {
+            'author': post.author,
+            'stats': counters.for_user(post.author),
+            'post': post,
+            'form': form,
+            'items': page,
+            'comments': comments,
+        },
+    )
 
 
 @login_required
+@query_budget(7)
+@read_only
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = feed.timeline(request.user).for_feed()
+    paginator = CursorPaginator(post_list)
+    page = paginator.get_page(request.GET)
 
     return render(
         request,
         'index.html',
-        {'page': page, 'paginator': paginator, 'index': False, 'follow': True},
+        {
+            'page': page,
+            'paginator': paginator,
+            'index': False,
+            'follow': True,
+            'suggestions': graph.suggestions(request.user),
+        },
     )
 
 
 @login_required
+@use_primary
+@retry_on_lock
 def profile_follow(request, username):
-    if not request.user == User.objects.get(username=username) \
-            and not Follow.objects.filter(
-        user=request.user,
-        author=User.objects.get(username=username)
-    ).count():
-        Follow.objects.create(
-            user=request.user,
-            author=User.objects.get(username=username)
-        )
+    author = get_object_or_404(User, username=username)
+    if can_follow(request.user, author):
+        # Кеш подписок мог отстать от базы: повтор не должен падать
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('index')
 
 
 @login_required
+@use_primary
+@retry_on_lock
 def profile_unfollow(request, username):
-    Follow.objects.get(
+    Follow.objects.filter(
         user=request.user,
-        author=User.objects.get(username=username)
+        author__username=username,
     ).delete()
     return redirect('index')
@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        "pk", "name", "status", "attempts", "run_at", "created", "finished",
+    )
+    search_fields = ("name", "key")
+    list_filter = ("status", "name")
+    empty_value_display = "-пусто-"
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.core.signals import request_started
+
+
+class TasksConfig(AppConfig):
+    name = 'tasks'
+
+    def ready(self):
+        from . import queue
+        request_started.connect(
+            queue.request_started, dispatch_uid='tasks.queue.start',
+        )
@@ -0,0 +1,55 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks import queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из очереди в базе: повторяет упавшие '
+        'с растущей паузой и забирает задачи, брошенные исполнителями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='выполнить готовые задачи и выйти',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1,
+            help='пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='выполнить не больше стольких задач за проход',
+        )
+        parser.add_argument(
+            '--purge-days',
+            type=int,
+            help='удалять выполненные задачи старше стольких дней '
+                 '(по умолчанию TASK_KEEP_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        keep = timedelta(
+            days=options['purge_days'] or settings.TASK_KEEP_DAYS,
+        )
+        while True:
+            done = queue.run_pending(options['limit'])
+            if done:
+                self.stdout.write(f'Выполнено задач: {done}')
+            if options['once']:
+                queue.purge(keep)
+                return
+            # Под постоянной нагрузкой очередь не пустеет, поэтому
+            # выполненные задачи чистятся по времени, а не в простое
+            queue.purge_due(keep)
+            if not done:
+                time.sleep(options['interval'])
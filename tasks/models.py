@@ -0,0 +1,66 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField(max_length=200, verbose_name="Задача")
+    args = models.TextField(default='[]', verbose_name="Аргументы")
+    key = models.CharField(
+        max_length=200,
+        unique=True,
+        blank=True,
+        null=True,
+        verbose_name="Ключ идемпотентности",
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name="Состояние",
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Попыток",
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=5,
+        verbose_name="Наибольшее число попыток",
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Выполнить не раньше",
+    )
+    locked_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Занята исполнителем до",
+    )
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Поставлена",
+    )
+    finished = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Завершена",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,273 @@
+import json
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# Пауза перед повтором растёт вдвое с каждой неудачной попыткой
+RETRY_DELAY = timedelta(seconds=10)
+# Сколько задача может выполняться, прежде чем её заберёт
+# другой исполнитель: процесс мог упасть посреди задачи
+LEASE = timedelta(minutes=5)
+
+_registry = {}
+_executor = None
+_poller = None
+_stopping = threading.Event()
+_lock = threading.Lock()
+_last_purge = None
+
+
+def task(func=None, *, max_attempts=MAX_ATTEMPTS, atomic=True):
+    """
+    Регистрирует функцию как фоновую задачу. Аргументы задачи
+    хранятся в базе в JSON, поэтому передавать нужно id, а не объекты.
+    Задача с atomic=False выполняется вне транзакции: так работают
+    задачи, которые сами фиксируют прогресс, чтобы повтор продолжил
+    с места сбоя, а не начал заново.
+    """
+    def decorator(func):
+        func.task_name = f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        func.atomic = atomic
+        _registry[func.task_name] = func
+        return func
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def enqueue(func, *args, key=None, delay=None):
+    """
+    Ставит задачу в очередь в текущей транзакции: если запись,
+    породившая задачу, откатится, задача тоже исчезнет. Задача
+    с уже известным ключом key не ставится повторно. Возвращает
+    задачу или None, если такой ключ уже был.
+    """
+    task = Task(
+        name=func.task_name,
+        args=json.dumps(args),
+        key=key,
+        max_attempts=func.max_attempts,
+    )
+    inline = settings.TASKS_MODE == 'inline' and not delay
+    if delay:
+        task.run_at = timezone.now() + delay
+    if inline:
+        # До фиксации транзакции задачу не видит никто, кроме нас
+        task.status = Task.RUNNING
+        task.attempts = 1
+        task.locked_until = timezone.now() + LEASE
+    if key is None:
+        task.save()
+    else:
+        try:
+            with transaction.atomic():
+                task.save()
+        except IntegrityError:
+            return None
+
+    if inline:
+        execute(task)
+    elif settings.TASKS_MODE == 'thread':
+        transaction.on_commit(wake)
+    return task
+
+
+def _ready(now):
+    return (
+        Q(status=Task.QUEUED, run_at__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim():
+    """
+    Забирает следующую готовую задачу. SQLite не умеет SELECT ... FOR
+    UPDATE SKIP LOCKED, поэтому задача занимается условным UPDATE:
+    из нескольких исполнителей его выполнит только один.
+    """
+    while True:
+        now = timezone.now()
+        pk = Task.objects.filter(_ready(now)).order_by(
+            'run_at', 'pk',
+        ).values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        taken = Task.objects.filter(_ready(now), pk=pk).update(
+            status=Task.RUNNING,
+            locked_until=now + LEASE,
+            attempts=F('attempts') + 1,
+        )
+        if taken:
+            return Task.objects.get(pk=pk)
+
+
+def execute(task):
+    """
+    Выполняет занятую задачу в транзакции: при ошибке её записи откатываются,
+    и повтор начинает с чистого листа. Исключение не выходит наружу,
+    а превращается в повтор с паузой или в статус failed.
+    """
+    func = _registry.get(task.name)
+    try:
+        if func is None:
+            raise LookupError(f'Задача {task.name} не зарегистрирована')
+        if func.atomic:
+            with transaction.atomic():
+                func(*json.loads(task.args))
+        else:
+            func(*json.loads(task.args))
+    except Exception:
+        logger.exception('Задача %s #%s не выполнена', task.name, task.pk)
+        error = traceback.format_exc()
+        if task.attempts >= task.max_attempts:
+            changes = {'status': Task.FAILED, 'finished': timezone.now()}
+        else:
+            delay = RETRY_DELAY * 2 ** (task.attempts - 1)
+            changes = {
+                'status': Task.QUEUED,
+                'run_at': timezone.now() + delay,
+            }
+        Task.objects.filter(pk=task.pk).update(
+            locked_until=None, last_error=error, **changes,
+        )
+        return False
+    Task.objects.filter(pk=task.pk).update(
+        status=Task.DONE, locked_until=None, finished=timezone.now(),
+    )
+    return True
+
+
+def run_pending(limit=None):
+    """Выполняет готовые задачи, пока они есть. Возвращает их число."""
+    done = 0
+    while limit is None or done < limit:
+        task = claim()
+        if task is None:
+            break
+        execute(task)
+        done += 1
+    return done
+
+
+def purge(older_than):
+    """Удаляет выполненные задачи, завершённые раньше older_than назад."""
+    deleted, _ = Task.objects.filter(
+        status=Task.DONE,
+        finished__lt=timezone.now() - older_than,
+    ).delete()
+    return deleted
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.TASK_THREADS,
+            thread_name_prefix='tasks',
+        )
+    return _executor
+
+
+def purge_due(keep=None):
+    """
+    Удаляет выполненные задачи старше keep (по умолчанию TASK_KEEP_DAYS
+    дней), если с прошлой чистки в этом процессе прошло не меньше
+    TASK_PURGE_INTERVAL секунд. Возвращает число удалённых задач.
+    """
+    global _last_purge
+    now = time.monotonic()
+    with _lock:
+        if (
+            _last_purge is not None
+            and now - _last_purge < settings.TASK_PURGE_INTERVAL
+        ):
+            return 0
+        _last_purge = now
+    if keep is None:
+        keep = timedelta(days=settings.TASK_KEEP_DAYS)
+    return purge(keep)
+
+
+def _drain():
+    close_old_connections()
+    try:
+        run_pending()
+        purge_due()
+    except Exception:
+        logger.exception('Исполнитель фоновых задач остановился')
+    finally:
+        close_old_connections()
+
+
+def wake():
+    """Будит потоки процесса сервера, выполняющие очередь."""
+    return executor().submit(_drain)
+
+
+def _poll():
+    # Новый проход не ставится, пока не закончился предыдущий
+    running = None
+    while not _stopping.wait(settings.TASK_POLL_INTERVAL):
+        if running is None or running.done():
+            running = wake()
+
+
+def start():
+    """
+    Запускает поток, который раз в TASK_POLL_INTERVAL секунд будит
+    потоки очереди: так выполняются отложенные задачи и задачи,
+    пришедшие на повтор, даже если новых записей нет.
+    """
+    global _poller
+    with _lock:
+        if _poller is not None:
+            return
+        _stopping.clear()
+        _poller = threading.Thread(
+            target=_poll, name='tasks-poll', daemon=True,
+        )
+        _poller.start()
+
+
+def request_started(**kwargs):
+    """
+    Первый запрос к процессу сервера запускает опрос очереди. В режиме
+    worker задачи выполняет run_tasks, а TASK_POLL_INTERVAL = None
+    отключает опрос совсем.
+    """
+    if (
+        _poller is None
+        and settings.TASKS_MODE != 'worker'
+        and settings.TASK_POLL_INTERVAL is not None
+    ):
+        start()
+
+
+def shutdown():
+    """
+    Останавливает опрос и потоки процесса сервера, дождавшись начатых
+    задач. Следующий wake запустит потоки заново.
+    """
+    global _executor, _poller
+    with _lock:
+        poller, _poller = _poller, None
+    if poller is not None:
+        _stopping.set()
+        poller.join()
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -1,4 +1,14 @@
+import pytest
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def inline_tasks(settings):
+    # Задачи выполняются прямо в тесте, без потоков сервера: тестовая
+    # база SQLite в памяти не ждёт блокировок
+    settings.TASKS_MODE = 'inline'
+    settings.TASK_POLL_INTERVAL = None
@@ -0,0 +1,151 @@
+import base64
+import json
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Follow, Post
+
+
+def read(response):
+    return json.loads(b''.join(response.streaming_content))
+
+
+def basic(username, password):
+    token = base64.b64encode(f'{username}:{password}'.encode()).decode()
+    return {'HTTP_AUTHORIZATION': f'Basic {token}'}
+
+
+@pytest.fixture
+def many_posts(user, group):
+    for i in range(7):
+        Post.objects.create(text=f'Пост {i}', author=user, group=group)
+
+
+class TestApi:
+
+    @pytest.mark.django_db
+    def test_cursor_pages(self, client, many_posts):
+        page = read(client.get('/api/v1/posts/?limit=3'))
+        texts = [post['text'] for post in page['results']]
+        while page['next']:
+            page = read(client.get(page['next']))
+            texts += [post['text'] for post in page['results']]
+        assert texts == [f'Пост {i}' for i in reversed(range(7))], \
+            'Проверьте, что курсор проходит все посты без пропусков и повторов'
+
+    @pytest.mark.django_db
+    def test_sparse_fields_and_include(self, client, many_posts):
+        with CaptureQueriesContext(connection) as queries:
+            page = read(client.get(
+                '/api/v1/posts/?fields=text&include=author,group&limit=5',
+            ))
+        assert set(page['results'][0]) == {'text', 'author', 'group'}, \
+            'Проверьте, что ?fields= оставляет в ответе только выбранные поля'
+        assert page['results'][0]['author']['username'] == 'TestUser'
+        assert page['results'][0]['group']['slug'] == 'test-link'
+        assert len(queries) == 2, \
+            'Связанные объекты из ?include= должны читаться одним запросом ' \
+            'со страницей, а не по запросу на пост'
+        listing = [q['sql'] for q in queries if '"text"' in q['sql']][0]
+        assert '"comment_count"' not in listing, \
+            'Проверьте, что из базы читаются только столбцы выбранных полей'
+
+        response = client.get('/api/v1/posts/?fields=nope')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_etag(self, client, user, many_posts):
+        response = client.get('/api/v1/posts/')
+        etag = response['ETag']
+        assert client.get(
+            '/api/v1/posts/', HTTP_IF_NONE_MATCH=etag,
+        ).status_code == 304, 'Проверьте, что неизменный список отдаётся как 304'
+
+        Post.objects.create(text='Ещё пост', author=user)
+        assert client.get(
+            '/api/v1/posts/', HTTP_IF_NONE_MATCH=etag,
+        ).status_code == 200, 'Новый пост должен менять ETag списка'
+
+    @pytest.mark.django_db
+    def test_write_permissions(self, django_user_model, user, post):
+        django_user_model.objects.create_user('Other', password='secret')
+        client = Client()
+        url = f'/api/v1/posts/{post.pk}/'
+        body = json.dumps({'text': 'Чужая правка'})
+
+        assert client.patch(
+            url, body, content_type='application/json',
+        ).status_code == 401
+        assert client.patch(
+            url, body, content_type='application/json',
+            **basic('Other', 'secret'),
+        ).status_code == 403, 'Править пост может только автор'
+        response = client.patch(
+            url, json.dumps({'text': 'Правка'}),
+            content_type='application/json', **basic('TestUser', '1234567'),
+        )
+        assert response.json()['text'] == 'Правка'
+        assert client.delete(
+            url, **basic('TestUser', '1234567'),
+        ).status_code == 204
+        assert not Post.objects.filter(pk=post.pk).exists()
+
+    @pytest.mark.django_db
+    def test_create_and_comment(self, user, group):
+        client = Client()
+        auth = basic('TestUser', '1234567')
+        response = client.post(
+            '/api/v1/posts/',
+            json.dumps({'text': 'Пост через API', 'group': group.slug}),
+            content_type='application/json', **auth,
+        )
+        assert response.status_code == 201
+        post = Post.objects.get(pk=response.json()['id'])
+        assert post.group == group and post.author == user
+
+        assert client.post(
+            '/api/v1/posts/', json.dumps({'text': ''}),
+            content_type='application/json', **auth,
+        ).json()['errors']['text']
+
+        client.post(
+            f'/api/v1/posts/{post.pk}/comments/',
+            json.dumps({'text': 'Комментарий'}),
+            content_type='application/json', **auth,
+        )
+        comments = read(client.get(f'/api/v1/posts/{post.pk}/comments/'))
+        assert [c['text'] for c in comments['results']] == ['Комментарий']
+
+    @pytest.mark.django_db
+    def test_session_write_needs_csrf(self, user):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(user)
+        response = client.post(
+            '/api/v1/posts/', json.dumps({'text': 'Пост'}),
+            content_type='application/json',
+        )
+        assert response.status_code == 403, \
+            'Запись по сессии браузера должна требовать CSRF-токен'
+
+    @pytest.mark.django_db
+    def test_follows(self, django_user_model, user):
+        author = django_user_model.objects.create_user('Author')
+        client = Client()
+        auth = basic('TestUser', '1234567')
+        assert client.get('/api/v1/follows/').status_code == 401
+        for expected in (201, 400):
+            response = client.post(
+                '/api/v1/follows/', json.dumps({'author': 'Author'}),
+                content_type='application/json', **auth,
+            )
+            assert response.status_code == expected, \
+                'Подписаться на автора можно только один раз'
+        follows = read(client.get('/api/v1/follows/', **auth))
+        assert [f['author'] for f in follows['results']] == ['Author']
+        assert client.delete(
+            '/api/v1/follows/Author/', **auth,
+        ).status_code == 204
+        assert not Follow.objects.filter(user=user, author=author).exists()
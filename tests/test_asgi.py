@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+import pytest
+from django.core.cache import cache
+from django.http import Http404
+
+from yatube import concurrency
+from yatube.asgi import application
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Карточки постов кешируются по pk, а в этих тестах pk повторяются
+    cache.clear()
+
+
+def get(path, headers=()):
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': b'',
+        'headers': list(headers),
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    body = b''.join(m.get('body', b'') for m in messages[1:])
+    return messages[0]['status'], body.decode()
+
+
+def thread_name():
+    return threading.current_thread().name
+
+
+class TestAsgi:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages(self, user, post):
+        status, body = get(f'/{user.username}/')
+        assert status == 200, 'Проверьте, что yatube.asgi отдаёт страницы'
+        assert 'Тестовый пост 1' in body
+        status, _ = get('/no-such-user/')
+        assert status == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_gather_in_threads(self, settings):
+        settings.READ_THREADS = 4
+        names = concurrency.gather(thread_name, thread_name, thread_name)
+        assert names[0] == threading.current_thread().name
+        assert all(name.startswith('reads') for name in names[1:]), \
+            'Проверьте, что независимые чтения идут в потоках пула'
+
+        def missing():
+            raise Http404
+        with pytest.raises(Http404):
+            concurrency.gather(thread_name, missing)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_threaded_profile(self, settings, client, user, post):
+        settings.READ_THREADS = 4
+        settings.QUERY_BUDGET_STRICT = True
+        response = client.get(f'/{user.username}/')
+        assert response.status_code == 200
+        assert response.context['page'][0] == post, \
+            'Страница профиля с пулом чтений должна совпадать с обычной'
+
+    @pytest.mark.django_db
+    def test_sequential_in_transaction(self, settings):
+        settings.READ_THREADS = 4
+        names = concurrency.gather(thread_name, thread_name)
+        assert names == [threading.current_thread().name] * 2, \
+            'Внутри транзакции чтения должны идти в потоке запроса'
@@ -0,0 +1,52 @@
+import pytest
+from django.core.cache import cache
+from django.test import Client
+
+from posts.management.commands.bench import (
+    next_pages, percentile, regressions, summarize,
+)
+from posts.models import Post
+
+
+class TestBench:
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile(values, 99) == 99
+        assert percentile([7], 99) == 7
+        assert percentile([], 50) == 0
+
+    def test_regressions(self):
+        samples = [('index', 200, 0.01, 2)] * 10
+        baseline = {'views': summarize(samples, 1)}
+        assert regressions({'views': summarize(samples, 1)}, baseline, 0.2) == []
+
+        slower = [('index', 200, 0.02, 3)] * 9 + [('index', 500, 0.02, 3)]
+        found = regressions({'views': summarize(slower, 2)}, baseline, 0.2)
+        assert any(line.startswith('index: p95_ms') for line in found), \
+            'Проверьте, что рост p95 считается регрессией'
+        assert any(line.startswith('index: queries') for line in found), \
+            'Проверьте, что рост числа запросов считается регрессией'
+        assert any(line.startswith('index: errors') for line in found)
+        assert any(line.startswith('all: rps') for line in found)
+
+    @pytest.mark.django_db
+    def test_next_pages_follow_cursors(self, user):
+        cache.clear()
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=user) for i in range(120)
+        )
+        urls = next_pages(Client(), '/')
+        assert len(urls) == 4
+        assert all('after=' in url for url in urls), \
+            'Дальние страницы длинной ленты должны открываться по курсору'
+        firsts = []
+        for url in urls:
+            # Страницы ленты закешированы, а контекст нужен свежий
+            cache.clear()
+            firsts.append(Client().get(url).context['page'][0].pk)
+        assert firsts == sorted(firsts, reverse=True)
+        assert len(set(firsts)) == 4, \
+            'Каждая следующая страница должна начинаться с новых постов'
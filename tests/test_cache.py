@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+
+from yatube.caching import get_or_build
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestSharedCache:
+
+    def test_stale_value_served_while_rebuilding(self):
+        assert get_or_build('page', lambda: 'old', timeout=0) == 'old'
+        time.sleep(0.01)
+        cache.add('page:lock', 1)
+        assert get_or_build('page', lambda: 'new', timeout=60) == 'old', \
+            'Пока другой процесс пересобирает значение, отдаётся старое'
+        cache.delete('page:lock')
+        assert get_or_build('page', lambda: 'new', timeout=60) == 'new', \
+            'Устаревшее значение должно пересобираться'
+
+    def test_single_flight_on_cold_cache(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(get_or_build('cold', build, 60))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == ['value'] * 5
+        assert len(builds) == 1, 'Пустой кеш должен собирать только один поток'
@@ -0,0 +1,120 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts import counters
+from posts.models import Comment, Post, UserStats
+from posts.paginator import COMMENTS_PER_PAGE
+
+
+def add_comments(post, author, count):
+    for i in range(count):
+        Comment.objects.create(post=post, author=author, text=f'Комментарий {i}')
+
+
+class TestCommentsPage:
+
+    @pytest.mark.django_db
+    def test_stored_count(self, user, post):
+        add_comments(post, user, 3)
+        post.refresh_from_db()
+        assert post.comment_count == 3, \
+            'Проверьте, что новый комментарий увеличивает comment_count поста'
+
+        Comment.objects.filter(post=post).first().delete()
+        post.refresh_from_db()
+        assert post.comment_count == 2, \
+            'Проверьте, что удаление комментария уменьшает comment_count поста'
+
+        Post.objects.filter(pk=post.pk).update(comment_count=0)
+        counters.rebuild()
+        post.refresh_from_db()
+        assert post.comment_count == 2, \
+            'Проверьте, что counters.rebuild() пересчитывает comment_count'
+
+    @pytest.mark.django_db
+    def test_post_delete_counts_comments_at_once(self, django_user_model,
+                                                 user, post):
+        other = django_user_model.objects.create_user(username='Other')
+        add_comments(post, user, 20)
+        add_comments(post, other, 10)
+        counters.for_user(user)
+        counters.for_user(other)
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        stats = dict(UserStats.objects.values_list('user', 'comments_count'))
+        assert stats == {user.pk: 0, other.pk: 0}, \
+            'Проверьте, что удаление поста списывает комментарии их авторам'
+        assert not [q for q in queries if 'comment_count' in q['sql']], \
+            'Удаление поста не должно сдвигать его comment_count по комментарию'
+        counted = [
+            q for q in queries if 'posts_userstats' in q['sql']
+        ]
+        assert len(counted) == 3, \
+            'Комментарии удалённого поста должны списываться по автору, ' \
+            'а не по одному'
+
+    @pytest.mark.django_db
+    def test_edit_keeps_background_fields(self, user, post):
+        add_comments(post, user, 1)
+        Post.objects.filter(pk=post.pk).update(thumbnail='cache/ready.jpg')
+        post.text = 'Правка'
+        post.save()
+        stored = Post.objects.get(pk=post.pk)
+        assert stored.text == 'Правка'
+        assert stored.comment_count == 1, \
+            'Правка поста не должна затирать comment_count из устаревшего экземпляра'
+        assert stored.thumbnail == 'cache/ready.jpg', \
+            'Правка поста не должна затирать готовую миниатюру'
+        assert post.comment_count == 1, \
+            'После сохранения экземпляр должен видеть актуальные счётчики'
+
+    @pytest.mark.django_db
+    def test_post_page_shows_first_page(self, client, user, post):
+        add_comments(post, user, COMMENTS_PER_PAGE + 5)
+        response = client.get(f'/{user.username}/{post.pk}/')
+        items = response.context['items']
+        assert len(items) == COMMENTS_PER_PAGE, \
+            'Проверьте, что на странице поста выводится одна страница комментариев'
+        assert items[0].text == 'Комментарий 0'
+        assert items.has_next()
+        assert 'js-more-comments' in response.content.decode()
+
+    @pytest.mark.django_db
+    def test_load_more(self, client, user, post):
+        add_comments(post, user, COMMENTS_PER_PAGE + 5)
+        page = client.get(f'/{user.username}/{post.pk}/').context['items']
+        url = f'/{user.username}/{post.pk}/comments/?{page.next_query}'
+
+        response = client.get(url)
+        assert response.status_code == 200
+        texts = [item.text for item in response.context['items']]
+        assert texts == [f'Комментарий {i}' for i in range(COMMENTS_PER_PAGE, COMMENTS_PER_PAGE + 5)], \
+            'Проверьте, что фрагмент отдаёт следующую страницу комментариев'
+        assert 'js-more-comments' not in response.content.decode()
+
+        data = client.get(f'{url}&format=json').json()
+        assert [comment['text'] for comment in data['comments']] == texts
+        assert data['next'] is None
+        assert data['comments'][0]['author'] == user.username
+
+    @pytest.mark.django_db
+    def test_load_more_queries(self, client, user, post,
+                               django_assert_max_num_queries):
+        add_comments(post, user, COMMENTS_PER_PAGE * 3)
+        with django_assert_max_num_queries(3):
+            client.get(f'/{user.username}/{post.pk}/comments/?format=json')
+
+    @pytest.mark.django_db
+    def test_add_comment_reads_post_once(self, user_client, user, post):
+        url = f'/{post.author.username}/{post.pk}/comment'
+        with CaptureQueriesContext(connection) as queries:
+            response = user_client.post(url, {'text': 'Новый'})
+        assert response.status_code == 302
+        reads = [
+            query for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "posts_post"' in query['sql']
+        ]
+        assert len(reads) == 1, \
+            'Добавление комментария должно читать пост один раз'
+        assert Comment.objects.get(text='Новый').post_id == post.pk
@@ -0,0 +1,140 @@
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def page_urls(post):
+    return (
+        f'/{post.author.username}/{post.pk}/',
+        f'/{post.author.username}/',
+        f'/group/{post.group.slug}/',
+    )
+
+
+class TestConditionalGet:
+
+    @pytest.mark.django_db
+    def test_not_modified(self, client, post_with_group):
+        for url in page_urls(post_with_group):
+            response = client.get(url)
+            assert response.status_code == 200
+            assert response.has_header('ETag'), \
+                f'Проверьте, что страница `{url}` отдаёт ETag'
+            assert response.has_header('Last-Modified'), \
+                f'Проверьте, что страница `{url}` отдаёт Last-Modified'
+            assert 'no-cache' in response['Cache-Control']
+
+            response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            assert response.status_code == 304, \
+                f'Проверьте, что `{url}` отвечает 304 на совпавший ETag'
+            assert not response.content
+
+    @pytest.mark.django_db
+    def test_if_modified_since(self, client, post_with_group):
+        url = f'/group/{post_with_group.group.slug}/'
+        last_modified = client.get(url)['Last-Modified']
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304, \
+            'Проверьте, что страница отвечает 304 на If-Modified-Since'
+
+    @pytest.mark.django_db
+    def test_changes_invalidate(self, client, user, post_with_group):
+        etags = [client.get(url)['ETag'] for url in page_urls(post_with_group)]
+        Comment.objects.create(post=post_with_group, author=user, text='Новый')
+        for url, etag in zip(page_urls(post_with_group), etags):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 200, \
+                f'Новый комментарий должен менять ETag страницы `{url}`'
+
+        url = f'/{post_with_group.author.username}/{post_with_group.pk}/'
+        etag = client.get(url)['ETag']
+        post_with_group.text = 'Исправленный текст'
+        post_with_group.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, \
+            'Правка поста должна менять ETag страницы'
+        assert 'Исправленный текст' in response.content.decode()
+
+    @pytest.mark.django_db
+    def test_viewer_in_etag(self, user_client, django_user_model,
+                            post_with_group):
+        url = f'/{post_with_group.author.username}/'
+        anonymous = Client().get(url)['ETag']
+        response = user_client.get(url)
+        assert response['ETag'] != anonymous, \
+            'Страница пользователя и анонима должна иметь разный ETag'
+        assert not response.has_header('Last-Modified'), \
+            'Пользователю Last-Modified не отдаётся: подписки его не меняют'
+        assert 'Cookie' in response['Vary']
+
+        reader = django_user_model.objects.create_user(username='reader')
+        client = Client()
+        client.force_login(reader)
+        etag = client.get(url)['ETag']
+        client.get(f'/{post_with_group.author.username}/follow/')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, \
+            'Подписка должна менять ETag страницы автора'
+
+    @pytest.mark.django_db
+    def test_validators_do_not_scan(self, client, user, post_with_group):
+        Comment.objects.create(post=post_with_group, author=user, text='Новый')
+        for url in page_urls(post_with_group)[1:]:
+            etag = client.get(url)['ETag']
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 304
+            sql = ' '.join(query['sql'] for query in queries)
+            assert 'posts_comment' not in sql and 'SUM(' not in sql, \
+                f'ETag страницы `{url}` не должен считаться по всем ' \
+                'постам и комментариям'
+
+    @pytest.mark.django_db
+    def test_group_rename_changes_author_page(self, client, post_with_group):
+        url = f'/{post_with_group.author.username}/'
+        etag = client.get(url)['ETag']
+        group = post_with_group.group
+        group.title = 'Новое название'
+        group.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, \
+            'Новое название группы должно менять ETag страниц её авторов'
+        assert 'Новое название' in response.content.decode()
+
+    @pytest.mark.django_db
+    def test_versions_shared_between_processes(self, client, post_with_group):
+        etags = [client.get(url)['ETag'] for url in page_urls(post_with_group)]
+        # У другого процесса сервера свой кеш locmem, в нём версий нет
+        cache.clear()
+        for url, etag in zip(page_urls(post_with_group), etags):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 304, \
+                f'Версия страницы `{url}` должна быть общей для всех ' \
+                'процессов, а не жить в кеше одного из них'
+
+    @pytest.mark.django_db
+    def test_csrf_cookie_in_etag(self, user_client, post_with_group):
+        url = f'/{post_with_group.author.username}/{post_with_group.pk}/'
+        user_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        etag = user_client.get(url)['ETag']
+        user_client.cookies[settings.CSRF_COOKIE_NAME] = 'b' * 64
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, \
+            'Новая CSRF-cookie должна менять ETag: в формах страницы токен'
+
+    @pytest.mark.django_db
+    def test_missing_page(self, client):
+        response = client.get('/group/missing/', HTTP_IF_NONE_MATCH='"x"')
+        assert response.status_code == 404
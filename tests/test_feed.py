@@ -0,0 +1,62 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from posts import feed
+from posts.models import FeedEntry, Follow, Post
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def author():
+    return get_user_model().objects.create_user(username='FeedAuthor')
+
+
+class TestFeed:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fan_out_on_write(self, user, author):
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(text='Пост для ленты', author=author)
+        assert FeedEntry.objects.filter(user=user, post=post).exists(), \
+            'Проверьте, что новый пост попадает в ленты подписчиков'
+        assert list(feed.timeline(user)) == [post]
+
+        post.delete()
+        assert not FeedEntry.objects.filter(user=user).exists(), \
+            'Проверьте, что удалённый пост пропадает из лент'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_and_unfollow(self, user, author):
+        old = Post.objects.create(text='Старый пост', author=author)
+        Follow.objects.create(user=user, author=author)
+        assert list(feed.timeline(user)) == [old], \
+            'Проверьте, что при подписке в ленту попадают старые посты автора'
+
+        Follow.objects.get(user=user, author=author).delete()
+        assert not FeedEntry.objects.filter(user=user).exists(), \
+            'Проверьте, что при отписке посты автора пропадают из ленты'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_popular_author_merged_on_read(self, settings, user, author):
+        settings.FEED_FANOUT_LIMIT = 2
+        other = get_user_model().objects.create_user(username='FeedReader')
+        Follow.objects.create(user=user, author=author)
+        Follow.objects.create(user=other, author=author)
+        assert author.pk in feed.popular_authors()
+
+        post = Post.objects.create(text='Пост популярного автора', author=author)
+        assert not FeedEntry.objects.filter(post=post).exists(), \
+            'Посты популярных авторов не должны раскладываться по лентам'
+        assert post in feed.timeline(user)
+
+        Follow.objects.get(user=other, author=author).delete()
+        assert author.pk not in feed.popular_authors()
+        assert list(feed.timeline(user)) == [post], \
+            'Проверьте, что посты бывшего популярного автора остаются в ленте'
@@ -0,0 +1,149 @@
+import json
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from posts import counters, graph
+from posts.models import FeedEntry, Follow, Post
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def authors(django_user_model):
+    return [
+        django_user_model.objects.create_user(username=f'Author{i}')
+        for i in range(4)
+    ]
+
+
+class TestGraph:
+
+    @pytest.mark.django_db
+    def test_cached_followees(self, django_assert_num_queries, user, authors):
+        first, second = authors[:2]
+        Follow.objects.create(user=user, author=first)
+        assert graph.followees(user.pk) == {first.pk}
+        with django_assert_num_queries(0):
+            assert graph.follows(user, first.pk), \
+                'Повторная проверка подписки не должна идти в базу'
+            assert not graph.follows(user, second.pk)
+
+        Follow.objects.create(user=user, author=second)
+        assert graph.followees(user.pk) == {first.pk, second.pk}, \
+            'Проверьте, что новая подписка сбрасывает кеш подписок'
+        Follow.objects.filter(user=user, author=first).delete()
+        assert graph.followees(user.pk) == {second.pk}, \
+            'Проверьте, что отписка сбрасывает кеш подписок'
+
+    @pytest.mark.django_db
+    def test_bulk(self, user, authors):
+        counters.for_user(user)
+        for author in authors:
+            counters.for_user(author)
+        Post.objects.create(text='Пост автора', author=authors[0])
+        Follow.objects.create(user=user, author=authors[1])
+
+        followed = graph.follow(
+            user, [author.pk for author in authors] + [user.pk, 10 ** 6],
+        )
+        assert followed == {authors[0].pk, authors[2].pk, authors[3].pk}, \
+            'Себя, несуществующих и уже отслеживаемых авторов нужно пропускать'
+        assert graph.followees(user.pk) == {author.pk for author in authors}
+        user.stats.refresh_from_db()
+        assert user.stats.following_count == 4
+        authors[0].stats.refresh_from_db()
+        assert authors[0].stats.followers_count == 1, \
+            'Проверьте, что пачка подписок сдвигает счётчики авторов'
+        assert FeedEntry.objects.filter(user=user).count() == 1, \
+            'Проверьте, что после пачки подписок лента дополняется'
+
+        assert graph.unfollow(user, [authors[0].pk, authors[1].pk]) == 2
+        assert graph.followees(user.pk) == {authors[2].pk, authors[3].pk}
+        user.stats.refresh_from_db()
+        assert user.stats.following_count == 2
+        assert not FeedEntry.objects.filter(user=user).exists()
+
+    @pytest.mark.django_db
+    def test_bulk_counts_only_inserted(self, user, authors):
+        for person in [user, *authors]:
+            counters.for_user(person)
+        raced = []
+
+        def racing(execute, sql, params, many, context):
+            # Параллельная подписка вставляет строку, пока проверяются авторы
+            if 'FROM "auth_user"' in sql and not raced:
+                raced.append(sql)
+                Follow.objects.create(user=user, author=authors[0])
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(racing):
+            followed = graph.follow(user, [authors[0].pk, authors[1].pk])
+        assert raced
+        assert followed == {authors[1].pk}, \
+            'Строки, вставленные параллельно, не должны считаться своими'
+        user.stats.refresh_from_db()
+        assert user.stats.following_count == 2
+        authors[0].stats.refresh_from_db()
+        assert authors[0].stats.followers_count == 1, \
+            'Счётчики не должны сдвигаться дважды за одну подписку'
+
+    @pytest.mark.django_db
+    def test_suggestions(self, user, authors):
+        friend, other, popular, rare = authors
+        graph.follow(user, [friend.pk, other.pk])
+        graph.follow(friend, [popular.pk, rare.pk, user.pk])
+        graph.follow(other, [popular.pk, friend.pk])
+        assert graph.suggestions(user) == [popular, rare], \
+            'Проверьте, что предлагаются авторы друзей по числу их читателей, ' \
+            'без самого пользователя и уже отслеживаемых'
+
+    @pytest.mark.django_db
+    def test_pages_skip_follow_table(self, user_client, user, authors):
+        Follow.objects.create(user=user, author=authors[0])
+        user_client.get(f'/{authors[0].username}/')
+        with CaptureQueriesContext(connection) as queries:
+            response = user_client.get(f'/{authors[0].username}/')
+        assert response.context['following'] is True
+        assert not [q for q in queries if 'posts_follow' in q['sql']], \
+            'Проверка подписки на странице профиля должна идти через кеш'
+
+        user_client.get(f'/{authors[0].username}/unfollow/')
+        response = user_client.get(f'/{authors[0].username}/')
+        assert response.context['following'] is False
+        assert user_client.get(
+            f'/{authors[0].username}/unfollow/',
+        ).status_code == 302, 'Повторная отписка не должна падать'
+
+    @pytest.mark.django_db
+    def test_api(self, user, authors):
+        client = Client()
+        client.force_login(user)
+        names = [author.username for author in authors[:3]]
+        response = client.post(
+            '/api/v1/follows/', json.dumps({'authors': names}),
+            content_type='application/json',
+        )
+        assert response.json() == {'created': 3}
+        graph.follow(authors[0], [authors[3].pk])
+
+        response = client.get('/api/v1/suggestions/?fields=username')
+        assert response.json()['results'] == [{'username': 'Author3'}]
+
+        response = client.delete(
+            '/api/v1/follows/', json.dumps({'authors': names[:2]}),
+            content_type='application/json',
+        )
+        assert response.json() == {'deleted': 2}
+        assert client.post(
+            '/api/v1/follows/', json.dumps({'authors': 'Author0'}),
+            content_type='application/json',
+        ).status_code == 400
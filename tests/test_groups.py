@@ -0,0 +1,86 @@
+import pytest
+
+from posts import counters, groups
+from posts.models import Group, GroupStats, Post
+
+
+@pytest.fixture
+def stats(group):
+    return counters.for_group(group)
+
+
+def current(group):
+    return GroupStats.objects.get(group=group)
+
+
+class TestGroupStats:
+
+    @pytest.mark.django_db
+    def test_incremental(self, django_user_model, user, group, stats):
+        other = django_user_model.objects.create_user(username='Other')
+        first = Post.objects.create(text='Первый', author=user, group=group)
+        Post.objects.create(text='Второй', author=user, group=group)
+        last = Post.objects.create(text='Третий', author=other, group=group)
+        result = current(group)
+        assert (result.posts_count, result.authors_count) == (3, 2), \
+            'Проверьте, что новый пост в группе увеличивает счётчики'
+        assert result.last_post == last.pub_date
+
+        last.delete()
+        result = current(group)
+        assert (result.posts_count, result.authors_count) == (2, 1), \
+            'Проверьте, что удаление последнего поста автора уменьшает число авторов'
+        assert result.last_post == Post.objects.filter(
+            group=group,
+        ).latest('pub_date').pub_date, \
+            'После удаления последней записи дата берётся у предыдущей'
+
+        moved = Group.objects.create(title='Другая', slug='other')
+        counters.for_group(moved)
+        first.group = moved
+        first.save()
+        assert current(group).posts_count == 1
+        assert current(moved).posts_count == 1, \
+            'Проверьте, что перенос поста учитывается в обеих группах'
+
+        GroupStats.objects.update(posts_count=0)
+        counters.rebuild()
+        assert current(group).posts_count == 1
+        assert current(moved).authors_count == 1
+
+    @pytest.mark.django_db
+    def test_directory(self, client, settings, group, post_with_group, stats):
+        settings.QUERY_BUDGET_STRICT = True
+        response = client.get('/group/')
+        assert response.status_code == 200
+        assert group.title in response.content.decode(), \
+            'Проверьте, что каталог показывает группы'
+        assert response.context['page'][0].stats.posts_count == 1
+
+
+class TestGroupLookup:
+
+    @pytest.mark.django_db
+    def test_cached_until_edited(self, django_assert_num_queries, group):
+        groups.clear()
+        assert groups.lookup(group.slug) == group
+        with django_assert_num_queries(0):
+            assert groups.lookup(group.slug) == group, \
+                'Повторный поиск группы по slug не должен идти в базу'
+
+        group.title = 'Новое название'
+        group.slug = 'new-link'
+        group.save()
+        assert groups.lookup('test-link') is None, \
+            'После правки группы прежний slug не должен находиться'
+        assert groups.lookup('new-link').title == 'Новое название'
+
+    @pytest.mark.django_db
+    def test_evicts_least_recent(self, monkeypatch):
+        monkeypatch.setattr(groups, 'CACHE_SIZE', 2)
+        groups.clear()
+        for slug in ('a', 'b', 'c'):
+            Group.objects.create(title=slug, slug=slug)
+            groups.lookup(slug)
+        assert list(groups._cache) == ['b', 'c'], \
+            'Кеш групп должен вытеснять давно не запрошенные'
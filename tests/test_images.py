@@ -0,0 +1,81 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from django.core.files.base import File
+from django.db import connection
+
+from posts import images
+from posts.models import Post
+
+
+def get_image_file(name, size=(120, 80)):
+    file_obj = BytesIO()
+    Image.new('RGB', size=size, color=(200, 0, 0)).save(file_obj, 'png')
+    file_obj.seek(0)
+    return File(file_obj, name=name)
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.TASKS_MODE = 'inline'
+    settings.IMAGE_PROCESSES = 0
+    settings.POST_IMAGE_WIDTHS = (360, 960)
+    settings.POST_IMAGE_FORMATS = ('webp', 'jpeg')
+    return tmp_path
+
+
+class TestThumbnails:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_thumbnail_generated_on_upload(self, user_client, media):
+        response = user_client.post(
+            '/new/',
+            data={'text': 'Пост с картинкой', 'image': get_image_file('pic.png')},
+        )
+        assert response.status_code in (301, 302)
+        post = Post.objects.get(text='Пост с картинкой')
+        assert post.thumbnail, 'Проверьте, что после загрузки готовится миниатюра'
+        with Image.open(media / post.thumbnail) as thumbnail:
+            assert thumbnail.size == (960, 339)
+        for name in ('pic_360x127.webp', 'pic_360x127.jpg', 'pic_960x339.webp'):
+            assert (media / 'cache' / 'posts' / name).exists(), \
+                'Проверьте, что готовятся все ширины и форматы картинки'
+
+        content = user_client.get(f'/{post.author.username}/').content.decode()
+        assert post.thumbnail_url in content, \
+            'Проверьте, что в ленте выводится готовая миниатюра'
+        assert 'type="image/webp"' in content and '360w' in content, \
+            'Проверьте, что в ленте выводится srcset со всеми вариантами'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_backfill_command(self, settings, user, media):
+        from django.core.management import call_command
+
+        post = Post.objects.create(
+            text='Старый пост', author=user, image=get_image_file('old.png'),
+        )
+        assert post.thumbnail == ''
+        settings.IMAGE_PROCESSES = 1
+        call_command('generate_thumbnails')
+        post.refresh_from_db()
+        assert post.thumbnail, 'Проверьте, что команда готовит миниатюры'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_encoding_outside_transaction(self, monkeypatch, user, media):
+        render = images.render_variants
+        in_transaction = []
+
+        def recording(name):
+            in_transaction.append(connection.in_atomic_block)
+            return render(name)
+
+        monkeypatch.setattr(images, 'render_variants', recording)
+        post = Post.objects.create(
+            text='Пост', author=user, image=get_image_file('big.png'),
+        )
+        images.schedule(post)
+        post.refresh_from_db()
+        assert post.thumbnail and in_transaction == [False], \
+            'Картинка должна кодироваться вне транзакции задачи'
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from django.core.cache import cache
+
+from posts import views
+from posts.models import Comment, Follow, Post
+from yatube import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    cache.clear()
+    metrics.registry.reset()
+    yield
+    cache.clear()
+
+
+def add_posts(author, group, count):
+    for i in range(count):
+        post = Post.objects.create(text=f'Пост {i}', author=author, group=group)
+        Comment.objects.create(post=post, author=author, text='Комментарий')
+    return post
+
+
+class TestMetrics:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_query_budgets(self, settings, user_client, user, group):
+        from django.contrib.auth import get_user_model
+        settings.QUERY_BUDGET_STRICT = True
+        author = get_user_model().objects.create_user(username='BudgetAuthor')
+        Follow.objects.create(user=user, author=author)
+        for count in (1, 15):
+            post = add_posts(author, group, count)
+            for url in [
+                '/',
+                f'/group/{group.slug}/',
+                f'/{author.username}/',
+                f'/{author.username}/{post.pk}/',
+                '/follow/',
+                '/search/?q=пост',
+            ]:
+                cache.clear()
+                assert user_client.get(url).status_code == 200
+            response = user_client.post(
+                f'/{author.username}/{post.pk}/comment',
+                {'text': 'Новый комментарий'},
+            )
+            assert response.status_code == 302
+
+    @pytest.mark.django_db(transaction=True)
+    def test_budget_exceeded(self, settings, monkeypatch, client, group):
+        settings.QUERY_BUDGET_STRICT = True
+        monkeypatch.setattr(views.group_post, 'query_budget', 1)
+        with pytest.raises(metrics.QueryBudgetExceeded):
+            client.get(f'/group/{group.slug}/')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_metrics_endpoint(self, client, user, group):
+        add_posts(user, group, 2)
+        client.get('/')
+        client.get('/')
+        client.get(f'/group/{group.slug}/')
+
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        text = response.content.decode()
+        assert 'yatube_request_duration_seconds_count{view="index"} 2' in text, \
+            'Проверьте, что время ответа считается по страницам'
+        assert 'yatube_db_queries_bucket{view="group_post",le="+Inf"} 1' in text
+        assert 'yatube_template_duration_seconds_sum{view="group_post"}' in text
+        assert 'yatube_cache_total{view="index",result="miss"} 1' in text
+        assert 'yatube_cache_total{view="index",result="hit"} 1' in text, \
+            'Проверьте, что считаются попадания в кеш страниц'
+
+        response = client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        assert response.status_code == 404, \
+            'Метрики должны быть доступны только с внутренних адресов'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_slow_request_logged(self, settings, caplog, client, user, group):
+        settings.SLOW_REQUEST_SECONDS = 0
+        add_posts(user, group, 1)
+        client.get(f'/group/{group.slug}/')
+        records = [
+            record for record in caplog.records
+            if record.name == 'yatube.metrics'
+        ]
+        assert records, 'Проверьте, что медленные запросы пишутся в лог'
+        trace = json.loads(records[0].getMessage().split(' ', 2)[2])
+        assert trace['view'] == 'group_post'
+        assert trace['queries'] > 0 and trace['slowest_sql'], \
+            'В логе медленного запроса должны быть его SQL-запросы'
@@ -0,0 +1,75 @@
+import pytest
+from django.core import mail
+from django.utils import timezone
+
+from posts import notifications
+from posts.models import Digest, Follow, Post
+from posts.tasks import send_digests
+from tasks.models import Task
+from yatube.metrics import registry
+
+
+@pytest.fixture
+def followers(django_user_model):
+    author = django_user_model.objects.create_user(username='Writer')
+    readers = [
+        django_user_model.objects.create_user(
+            username=f'reader{i}', email=f'reader{i}@example.com',
+        )
+        for i in range(3)
+    ]
+    readers.append(django_user_model.objects.create_user(username='noemail'))
+    for reader in readers:
+        Follow.objects.create(user=reader, author=author)
+    Post.objects.create(text='Первый пост', author=author)
+    Post.objects.create(text='Второй пост', author=author)
+    return readers
+
+
+def after_window():
+    return timezone.now() + notifications.window()
+
+
+class TestNotifications:
+
+    @pytest.mark.django_db
+    def test_one_digest_per_user(self, followers):
+        assert notifications.send_due(after_window()) == 3
+        assert len(mail.outbox) == 3, \
+            'Проверьте, что каждый подписчик с адресом получает одно письмо'
+        message = mail.outbox[0]
+        assert message.to == ['reader0@example.com']
+        assert 'Первый пост' in message.body and 'Второй пост' in message.body, \
+            'Проверьте, что в дайджест попадают все посты окна'
+        assert '/Writer/' in message.body
+
+        assert notifications.send_due(after_window()) == 0, \
+            'Дайджест за окно не должен рассылаться повторно'
+
+    @pytest.mark.django_db
+    def test_batches_and_metrics(self, settings, followers):
+        settings.NOTIFY_BATCH_SIZE = 2
+        registry.reset()
+        notifications.send_due(after_window())
+        assert registry.counters['notification_batches'] == 2, \
+            'Проверьте, что письма уходят пачками по NOTIFY_BATCH_SIZE'
+        assert registry.counters['notifications_sent'] == 3
+        assert 'yatube_notifications_sent_total 3' in registry.render()
+
+    @pytest.mark.django_db
+    def test_resume_after_failure(self, followers):
+        until = notifications.window_end(timezone.now())
+        Digest.objects.create(
+            since=until - notifications.window(),
+            until=until,
+            last_user=followers[1].pk,
+        )
+        notifications.send_due(after_window())
+        assert [message.to for message in mail.outbox] == [
+            ['reader2@example.com'],
+        ], 'Прерванная рассылка должна продолжаться со следующего получателя'
+
+    @pytest.mark.django_db
+    def test_one_task_per_window(self, followers):
+        assert Task.objects.filter(name=send_digests.task_name).count() == 1, \
+            'Проверьте, что на окно дайджеста ставится одна рассылка'
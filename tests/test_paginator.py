@@ -1,6 +1,8 @@
 import pytest
+from django.core.cache import cache
 
-from django.core.paginator import Paginator, Page
+from posts.paginator import CursorPaginator as Paginator, CursorPage as Page
+from posts.paginator import encode_cursor
 
 
 class TestGroupPaginatorView:
@@ -36,3 +38,93 @@ class TestGroupPaginatorView:
             'Проверьте, что передали переменную `page` в контекст страницы `/`'
         assert type(response.context['page']) == Page, \
             'Проверьте, что переменная `page` на странице `/` типа `Page`'
+
+
+class TestCursorPaginator:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cursor_pages(self, user):
+        from django.http import QueryDict
+        from posts.models import Post
+
+        for i in range(25):
+            Post.objects.create(text=f'Пост {i}', author=user)
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+        paginator = Paginator(Post.objects.all(), 10, jump_limit=1)
+        page = paginator.get_page(QueryDict())
+        assert page.number is None, \
+            'Длинная лента должна листаться по курсору, а не по номерам'
+        seen = list(page)
+        while page.has_next():
+            page = paginator.get_page(QueryDict(page.next_query))
+            seen += list(page)
+        assert seen == expected, 'Проверьте, что курсор обходит все посты по порядку'
+
+        page = paginator.get_page(QueryDict(page.previous_query))
+        assert list(page) == expected[10:20], \
+            'Проверьте, что курсор `before` возвращает предыдущую страницу'
+        assert page.has_next() and page.has_previous()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_small_feed_jump_to_page(self, user):
+        from django.http import QueryDict
+        from posts.models import Post
+
+        for i in range(15):
+            Post.objects.create(text=f'Пост {i}', author=user)
+        paginator = Paginator(Post.objects.all(), 10)
+        page = paginator.get_page(QueryDict('page=2'))
+        assert page.number == 2
+        assert list(page.page_range) == [1, 2]
+        assert len(page) == 5
+        assert not page.has_next() and page.has_previous()
+
+
+GARBAGE_CURSORS = [
+    'мусор',
+    '!!!',
+    encode_cursor(['не дата', 1]),
+    encode_cursor([1, 2]),
+    encode_cursor([None, None]),
+    encode_cursor(['2020-01-01T00:00:00', 1]),
+    encode_cursor(['2020-01-01T00:00:00+00:00', 'abc']),
+    encode_cursor(['2020-01-01T00:00:00+00:00', 2 ** 70]),
+    encode_cursor([{'a': 1}, [1]]),
+    encode_cursor([float('nan'), 1]),
+    encode_cursor(['abc', True]),
+]
+
+
+class TestGarbageCursors:
+
+    @pytest.mark.django_db
+    def test_pages_fall_back_to_first(self, user_client, user, post_with_group):
+        post = post_with_group
+        urls = [
+            '/',
+            '/group/',
+            f'/group/{post.group.slug}/',
+            f'/{user.username}/',
+            f'/{user.username}/{post.pk}/',
+            f'/{user.username}/{post.pk}/comments/',
+            '/follow/',
+            '/trending/',
+        ]
+        for url in urls:
+            for cursor in GARBAGE_CURSORS:
+                for direction in ('after', 'before'):
+                    cache.clear()
+                    response = user_client.get(
+                        url, {direction: cursor},
+                    )
+                    assert response.status_code == 200, \
+                        f'Негодный курсор на {url} должен открывать первую страницу'
+
+    @pytest.mark.django_db
+    def test_api_rejects(self, client, user, post):
+        for url in ('/api/v1/posts/', f'/api/v1/posts/{post.pk}/comments/'):
+            for cursor in GARBAGE_CURSORS:
+                response = client.get(url, {'after': cursor})
+                assert response.status_code == 400, \
+                    f'Негодный курсор в API {url} должен давать 400'
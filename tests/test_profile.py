@@ -1,7 +1,10 @@
 import pytest
 
-from django.core.paginator import Paginator, Page
+from posts.paginator import CursorPaginator as Paginator, CursorPage as Page
 from django.contrib.auth import get_user_model
+from django.urls import get_resolver
+
+from users.validators import RESERVED_USERNAMES
 
 
 def get_field_context(context, field_type):
@@ -50,3 +53,64 @@ class TestProfileView:
             'Проверьте, что передали статьи автора в контекст страницы `/<username>/` типа `Page`'
         assert len(page_context.object_list) == 0, \
             'Проверьте, что правильные статьи автора в контекст страницы `/<username>/`'
+
+
+class TestUserStats:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_counters_follow_source_tables(self, user, post):
+        from django.core.management import call_command
+        from posts import counters
+        from posts.models import Comment, Follow, UserStats
+
+        reader = get_user_model().objects.create_user(username='StatsReader')
+        stats = counters.for_user(user)
+        assert stats.posts_count == 1
+
+        Follow.objects.create(user=reader, author=user)
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        stats = UserStats.objects.get(user=user)
+        assert stats.followers_count == 1, 'Проверьте, что считаются подписчики'
+        assert stats.comments_count == 1, 'Проверьте, что считаются комментарии'
+
+        post.delete()
+        stats = UserStats.objects.get(user=user)
+        assert stats.posts_count == 0, 'Проверьте, что удаление поста уменьшает счётчик'
+        assert stats.comments_count == 0
+        assert list(counters.mismatches()) == []
+
+        UserStats.objects.filter(user=user).update(followers_count=10)
+        assert [u for u, diff in counters.mismatches()] == [user]
+        call_command('rebuild_user_stats')
+        assert UserStats.objects.get(user=user).followers_count == 1
+
+
+class TestReservedUsernames:
+
+    def test_site_routes_reserved(self):
+        prefixes = set()
+        for pattern in get_resolver().url_patterns:
+            route = str(pattern.pattern).lstrip('^')
+            for inner in getattr(pattern, 'url_patterns', [pattern]):
+                full = route + str(inner.pattern).lstrip('^')
+                segment = full.split('/')[0]
+                if '/' in full and segment and '<' not in segment:
+                    prefixes.add(segment)
+        assert prefixes - RESERVED_USERNAMES == set(), \
+            'Первые сегменты адресов сайта должны быть запрещены как имена'
+
+    @pytest.mark.django_db
+    def test_signup_rejects_reserved(self, client):
+        data = {
+            'first_name': 'Имя', 'last_name': 'Фамилия', 'email': '',
+            'password1': 'Sl0zhnyi-parol', 'password2': 'Sl0zhnyi-parol',
+        }
+        response = client.post('/auth/signup/', {**data, 'username': 'trending'})
+        assert response.status_code == 200
+        assert 'username' in response.context['form'].errors, \
+            'Имя, занятое адресом сайта, нельзя выбрать при регистрации'
+        assert not get_user_model().objects.filter(username='trending').exists()
+
+        response = client.post('/auth/signup/', {**data, 'username': 'reader'})
+        assert response.status_code in (301, 302)
+        assert get_user_model().objects.filter(username='reader').exists()
@@ -0,0 +1,129 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Follow, Post
+from posts.paginator import encode_cursor
+
+
+def count_queries(client, url):
+    # Первый запрос создаёт недостающие строки счётчиков
+    client.get(url)
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context)
+
+
+def add_posts(author, group, count):
+    for i in range(count):
+        post = Post.objects.create(text=f'Пост {i}', author=author, group=group)
+        Comment.objects.create(post=post, author=author, text='Комментарий')
+
+
+class TestFeedQueries:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feed_pages_constant_queries(self, user_client, user, group):
+        from django.contrib.auth import get_user_model
+        author = get_user_model().objects.create_user(username='QueryAuthor')
+        Follow.objects.create(user=user, author=author)
+        urls = [
+            '/',
+            f'/group/{group.slug}/',
+            f'/{author.username}/',
+            '/follow/',
+        ]
+
+        add_posts(author, group, 1)
+        few = {url: count_queries(user_client, url) for url in urls}
+        add_posts(author, group, 9)
+        many = {url: count_queries(user_client, url) for url in urls}
+
+        for url in urls:
+            assert few[url] == many[url], \
+                f'Число запросов на странице `{url}` не должно зависеть от числа постов'
+
+
+def query_plans(client, url):
+    """Планы SQLite для всех SELECT, выполненных при открытии страницы."""
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    plans = {}
+    with connection.cursor() as cursor:
+        for query in context.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+            plans[query['sql']] = [row[-1] for row in cursor.fetchall()]
+    return plans
+
+
+class TestQueryPlans:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feeds_read_by_index(self, user_client, user, group):
+        from django.contrib.auth import get_user_model
+        author = get_user_model().objects.create_user(username='PlanAuthor')
+        Follow.objects.create(user=user, author=author)
+        add_posts(author, group, 3)
+        post = Post.objects.first()
+        after = encode_cursor([post.pub_date, post.pk])
+        urls = [
+            '/',
+            f'/?after={after}',
+            f'/group/{group.slug}/',
+            f'/{author.username}/',
+            f'/{author.username}/?after={after}',
+            '/follow/',
+            f'/follow/?after={after}',
+            f'/{author.username}/{post.pk}/',
+        ]
+        for url in urls:
+            user_client.get(url)
+            for sql, plan in query_plans(user_client, url).items():
+                details = '\n'.join(plan)
+                assert 'USE TEMP B-TREE' not in details, \
+                    f'Запрос на странице `{url}` сортирует строки без ' \
+                    f'индекса:\n{sql}\n{details}'
+                assert not any(
+                    step.startswith('SCAN posts_')
+                    and 'INDEX' not in step
+                    for step in plan
+                ), f'Запрос на странице `{url}` читает таблицу целиком:' \
+                   f'\n{sql}\n{details}'
+
+
+class TestPostCardCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_card_cached_until_edit(self, client, user, group):
+        from posts.cards import card_key
+
+        post = Post.objects.create(text='Текст карточки', author=user, group=group)
+        cache.clear()
+        url = f'/group/{group.slug}/'
+        client.get(url)
+        assert cache.get(card_key(post)) is not None, \
+            'Проверьте, что карточка поста кешируется'
+
+        Post.objects.filter(pk=post.pk).update(text='Обход кеша')
+        assert 'Текст карточки' in client.get(url).content.decode(), \
+            'Проверьте, что карточка берётся из кеша'
+
+        post.refresh_from_db()
+        post.text = 'Новый текст'
+        post.save()
+        assert post.version == 2
+        assert 'Новый текст' in client.get(url).content.decode(), \
+            'Проверьте, что правка поста сбрасывает кеш карточки'
+
+        group.title = 'Новое название'
+        group.save()
+        profile = client.get(f'/{user.username}/').content.decode()
+        assert 'Новое название' in profile, \
+            'Проверьте, что правка группы сбрасывает кеш карточек'
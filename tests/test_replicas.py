@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+from django.conf import settings
+
+from posts.management.commands.replicate import replicate
+from posts.models import Post
+from yatube.routers import PIN_SESSION_KEY, ReplicaRouter
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Куда роутер отправлял чтение постов. Реплика — та же тестовая база."""
+    monkeypatch.setattr(settings, 'DATABASE_REPLICAS', ['default'])
+    seen = []
+    db_for_read = ReplicaRouter.db_for_read
+
+    def spy(self, model, **hints):
+        alias = db_for_read(self, model, **hints)
+        if model is Post:
+            seen.append(alias)
+        return alias
+
+    monkeypatch.setattr(ReplicaRouter, 'db_for_read', spy)
+    return seen
+
+
+class TestReplicaRouting:
+
+    @pytest.mark.django_db
+    def test_feed_reads_go_to_replica(self, reads, client, post_with_group):
+        reads.clear()
+        client.get(f'/group/{post_with_group.group.slug}/')
+        assert reads and set(reads) == {'default'}, \
+            'Проверьте, что страница группы читает посты из реплики'
+
+    @pytest.mark.django_db
+    def test_session_pinned_after_write(self, reads, user_client,
+                                        post_with_group):
+        url = f'/group/{post_with_group.group.slug}/'
+        reads.clear()
+        user_client.get(url)
+        assert set(reads) == {'default'}
+
+        user_client.post(
+            f'/{post_with_group.author.username}/{post_with_group.pk}/comment',
+            {'text': 'Комментарий'},
+        )
+        assert user_client.session.get(PIN_SESSION_KEY), \
+            'Проверьте, что после записи сессия закрепляется за основной базой'
+        reads.clear()
+        user_client.get(url)
+        assert reads and set(reads) == {None}, \
+            'После записи пользователь должен читать из основной базы'
+
+    @pytest.mark.django_db
+    def test_anonymous_not_pinned(self, reads, client, post_with_group):
+        client.get('/new/')
+        assert PIN_SESSION_KEY not in client.session
+
+
+def test_replicate(tmp_path):
+    primary = str(tmp_path / 'primary.sqlite3')
+    replica = str(tmp_path / 'replica.sqlite3')
+    with sqlite3.connect(primary) as connection:
+        connection.execute('CREATE TABLE post (text TEXT)')
+        connection.execute("INSERT INTO post VALUES ('Новый пост')")
+    replicate(primary, replica)
+    with sqlite3.connect(replica) as connection:
+        rows = connection.execute('SELECT text FROM post').fetchall()
+    assert rows == [('Новый пост',)], \
+        'Проверьте, что replicate копирует основную базу в реплику'
@@ -0,0 +1,100 @@
+import pytest
+from django.db import connection
+
+from posts import search
+from posts.models import Comment, Post
+from posts.paginator import encode_cursor
+from tests.test_paginator import GARBAGE_CURSORS
+
+
+@pytest.fixture(autouse=True)
+def clean_index(transactional_db):
+    # Очистка базы между тестами не трогает виртуальные таблицы FTS5
+    search.rebuild()
+
+
+class TestSearch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_search_page(self, client, user):
+        post = Post.objects.create(text='Рецепт борща', author=user)
+        other = Post.objects.create(text='Заметки о погоде', author=user)
+        Comment.objects.create(post=other, author=user, text='Лучше борщ')
+
+        response = client.get('/search/', {'q': 'борщ'})
+        assert response.status_code == 200, \
+            'Проверьте, что страница `/search/` работает'
+        found = list(response.context['page'])
+        assert post in found and other in found, \
+            'Проверьте, что поиск находит посты по тексту и по комментариям'
+        assert found[0] == post, \
+            'Совпадение в посте должно быть выше совпадения в комментарии'
+        assert '<mark>борща</mark>' in response.content.decode(), \
+            'Проверьте, что найденные слова подсвечиваются'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_follows_changes(self, user):
+        post = Post.objects.create(text='Старый текст', author=user)
+        post.text = 'Новый текст'
+        post.save()
+        assert search.search('новый') == [post], \
+            'Проверьте, что после правки пост ищется по новому тексту'
+        assert search.search('старый') == [], \
+            'Проверьте, что после правки старый текст убирается из индекса'
+
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        post.delete()
+        assert search.search('новый') == [], \
+            'Проверьте, что удалённый пост пропадает из поиска'
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {search.COMMENT_INDEX}')
+            assert cursor.fetchone() == (0,), \
+                'Комментарии удалённого поста должны уходить из индекса'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pagination(self, client, user):
+        for number in range(15):
+            Post.objects.create(text=f'Пост номер {number}', author=user)
+
+        response = client.get('/search/', {'q': 'пост'})
+        page = response.context['page']
+        assert len(page) == 10 and page.has_next()
+
+        response = client.get(f'/search/?{page.next_query}')
+        rest = response.context['page']
+        assert len(rest) == 5 and not rest.has_next(), \
+            'Проверьте, что вторая страница поиска продолжает первую'
+        assert not set(page) & set(rest)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_garbage_cursor(self, client, user):
+        Post.objects.create(text='Пост про суп', author=user)
+        for cursor in GARBAGE_CURSORS + [
+            encode_cursor([-1.5, 'abc']), encode_cursor([-1.5, 2 ** 70]),
+            encode_cursor([-1.5]),
+        ]:
+            response = client.get('/search/', {'q': 'суп', 'after': cursor})
+            assert response.status_code == 200, \
+                'Негодный курсор поиска должен открывать первую страницу'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_first_page_link_keeps_query(self, client, user):
+        for number in range(15):
+            Post.objects.create(text=f'Пост номер {number}', author=user)
+        page = client.get('/search/', {'q': 'пост'}).context['page']
+        response = client.get(f'/search/?{page.next_query}')
+        assert 'href="?q=%D0%BF%D0%BE%D1%81%D1%82">В начало' in \
+            response.content.decode(), \
+            'Ссылка «В начало» должна сохранять запрос поиска'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_admin_search_without_words(self, admin_client, user):
+        Post.objects.create(text='Ура!!!', author=user)
+        response = admin_client.get('/admin/posts/post/', {'q': '!!!'})
+        assert response.status_code == 200, \
+            'Поиск в админке по строке без слов не должен падать'
+        assert [post.text for post in response.context['cl'].result_list] \
+            == ['Ура!!!']
+        response = admin_client.get('/admin/posts/post/', {'q': 'ура'})
+        assert [post.text for post in response.context['cl'].result_list] \
+            == ['Ура!!!']
@@ -0,0 +1,52 @@
+import pytest
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+
+from yatube.sqlite import retry_on_lock
+
+
+class TestSqliteProfile:
+
+    def test_pragmas_on_connect(self, tmp_path, django_db_blocker):
+        handler = ConnectionHandler({
+            'default': {
+                'ENGINE': 'yatube.sqlite',
+                'NAME': str(tmp_path / 'db.sqlite3'),
+                'OPTIONS': {'pragmas': {'query_only': 1}},
+            },
+        })
+        connection = handler['default']
+        try:
+            with django_db_blocker.unblock(), connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                assert cursor.fetchone()[0] == 'wal', \
+                    'Проверьте, что соединение переводит базу в режим WAL'
+                with pytest.raises(OperationalError):
+                    cursor.execute('CREATE TABLE test (id INTEGER)')
+        finally:
+            connection.close()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_retry_on_lock(self):
+        calls = []
+
+        @retry_on_lock(delay=0)
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        assert write() == 'ok'
+        assert len(calls) == 3, \
+            'Проверьте, что запись повторяется, пока база заблокирована'
+
+        @retry_on_lock(delay=0)
+        def broken():
+            calls.append(1)
+            raise OperationalError('no such table')
+
+        calls.clear()
+        with pytest.raises(OperationalError):
+            broken()
+        assert len(calls) == 1, 'Другие ошибки повторять не нужно'
@@ -0,0 +1,123 @@
+import json
+from xml.etree import ElementTree
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts import syndication
+from posts.models import Post
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def body(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class TestSyndication:
+
+    @pytest.mark.django_db
+    def test_formats(self, client, settings, post_with_group):
+        settings.QUERY_BUDGET_STRICT = True
+        group = post_with_group.group
+        author = post_with_group.author.username
+        for url in ('/feed.rss', f'/group/{group.slug}/feed.rss',
+                    f'/{author}/feed.rss'):
+            response = client.get(url)
+            assert response['Content-Type'].startswith('application/rss+xml')
+            channel = ElementTree.fromstring(body(response)).find('channel')
+            items = channel.findall('item')
+            assert [item.findtext('description') for item in items] == [
+                post_with_group.text,
+            ], f'Проверьте, что лента {url} отдаёт посты'
+            assert items[0].findtext('link').endswith(
+                f'/{author}/{post_with_group.pk}/',
+            )
+
+        feed = ElementTree.fromstring(body(client.get('/feed.atom')))
+        entry = feed.find(f'{ATOM}entry')
+        assert entry.findtext(f'{ATOM}author/{ATOM}name') == author
+        assert entry.find(f'{ATOM}category').get('term') == group.slug
+
+        data = json.loads(body(client.get(f'/{author}/feed.json')))
+        assert data['version'] == 'https://jsonfeed.org/version/1.1'
+        assert [item['content_text'] for item in data['items']] == [
+            post_with_group.text,
+        ]
+
+        assert client.get('/feed.html').status_code == 404
+        assert client.get('/nobody/feed.rss').status_code == 404
+        assert client.get('/group/nothing/feed.rss').status_code == 404
+
+    @pytest.mark.django_db
+    def test_cached_until_post_written(self, client, user, post):
+        response = client.get('/feed.atom')
+        assert response.streaming, 'Лента без кеша должна отдаваться потоком'
+        first = body(response)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = client.get('/feed.atom')
+            conditional = client.get('/feed.atom', HTTP_IF_NONE_MATCH=etag)
+        assert body(cached) == first, 'Повторный запрос должен брать ленту из кеша'
+        assert conditional.status_code == 304
+        assert len(queries) == 2 and all(
+            'posts_version' in query['sql'] for query in queries
+        ), 'Закешированная лента и условный GET читают из базы только версию'
+
+        Post.objects.create(text='Новый пост', author=user)
+        response = client.get('/feed.atom', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, \
+            'Проверьте, что новый пост сбрасывает кеш и ETag ленты'
+        assert 'Новый пост' in body(response).decode()
+
+        post.text = 'Исправленный текст'
+        post.save()
+        assert 'Исправленный текст' in body(
+            client.get(f'/{user.username}/feed.rss'),
+        ).decode(), 'Проверьте, что правка поста обновляет ленту автора'
+
+    @pytest.mark.django_db
+    def test_versions_shared_between_processes(self, client, user, post):
+        response = client.get('/feed.atom')
+        body(response)
+        etag = response['ETag']
+        # У другого процесса сервера свой кеш locmem, в нём версий нет
+        cache.clear()
+        response = client.get('/feed.atom', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, \
+            'Версия ленты должна быть общей для всех процессов'
+
+        # Правку записал другой процесс: кеш этого процесса о ней
+        # не знает, и тело прежней версии в нём остаётся
+        body(client.get('/feed.atom'))
+        Post.objects.filter(pk=post.pk).update(text='Правка')
+        syndication.forget(syndication.INDEX)
+        assert 'Правка' in body(client.get('/feed.atom')).decode(), \
+            'Тело ленты прежней версии не должно отдаваться после правки'
+
+    @pytest.mark.django_db
+    def test_group_rename(self, client, post_with_group):
+        author = post_with_group.author.username
+        urls = ('/feed.rss', f'/{author}/feed.atom', f'/{author}/feed.json')
+        etags = [client.get(url)['ETag'] for url in urls]
+        group = post_with_group.group
+        group.title = 'Новое название'
+        group.save()
+        for url, etag in zip(urls, etags):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 200, \
+                f'Новое название группы должно менять ETag ленты {url}'
+            assert 'Новое название' in body(response).decode(), \
+                f'Проверьте, что лента {url} выводит новое название группы'
@@ -0,0 +1,134 @@
+import time
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from posts.tasks import fan_out
+from posts.models import FeedEntry, Follow, Post
+from tasks import queue
+from tasks.models import Task
+
+calls = []
+
+
+@queue.task(max_attempts=2)
+def flaky(fail_times):
+    calls.append(fail_times)
+    if len(calls) <= fail_times:
+        raise RuntimeError('временная ошибка')
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(username='TaskAuthor')
+
+
+class TestTaskQueue:
+
+    @pytest.mark.django_db
+    def test_worker_mode(self, settings, user, author):
+        settings.TASKS_MODE = 'worker'
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(text='Пост', author=author)
+        assert not FeedEntry.objects.filter(post=post).exists(), \
+            'В режиме worker раскладка по лентам не должна идти в запросе'
+
+        call_command('run_tasks', '--once')
+        assert FeedEntry.objects.filter(user=user, post=post).exists(), \
+            'Проверьте, что run_tasks выполняет задачи из очереди'
+        assert Task.objects.get(name=fan_out.task_name).status == Task.DONE
+
+    @pytest.mark.django_db
+    def test_idempotency_key(self, settings):
+        settings.TASKS_MODE = 'worker'
+        assert queue.enqueue(flaky, 0, key='flaky:1') is not None
+        assert queue.enqueue(flaky, 0, key='flaky:1') is None, \
+            'Задача с тем же ключом не должна ставиться повторно'
+        queue.run_pending()
+        assert calls == [0]
+
+    @pytest.mark.django_db
+    def test_rolled_back_with_transaction(self, settings):
+        settings.TASKS_MODE = 'worker'
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                queue.enqueue(flaky, 0)
+                raise RuntimeError
+        assert not Task.objects.exists(), \
+            'Задача должна откатываться вместе с записью, которая её поставила'
+
+    @pytest.mark.django_db
+    def test_retry_then_fail(self, settings):
+        settings.TASKS_MODE = 'worker'
+        task = queue.enqueue(flaky, 5)
+        queue.run_pending()
+        task.refresh_from_db()
+        assert task.status == Task.QUEUED and task.attempts == 1
+        assert task.run_at > timezone.now(), \
+            'Упавшая задача должна повторяться после паузы'
+        assert 'временная ошибка' in task.last_error
+        assert queue.run_pending() == 0
+
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+        queue.run_pending()
+        task.refresh_from_db()
+        assert task.status == Task.FAILED, \
+            'После max_attempts попыток задача помечается failed'
+
+    @pytest.mark.django_db
+    def test_abandoned_task_reclaimed(self, settings):
+        settings.TASKS_MODE = 'worker'
+        task = queue.enqueue(flaky, 0)
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.RUNNING,
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        assert queue.run_pending() == 1, \
+            'Задачу упавшего исполнителя должен забрать другой'
+        task.refresh_from_db()
+        assert task.status == Task.DONE
+
+    @pytest.mark.django_db(transaction=True)
+    def test_thread_mode(self, settings, user, author):
+        settings.TASKS_MODE = 'thread'
+
+        # Тестовая база SQLite в памяти не ждёт блокировок. Поэтому
+        # каждая запись идёт одной транзакцией, как в запросе, а потоки
+        # задач, разбуженные её фиксацией, останавливаются до следующей
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+        queue.shutdown()
+        with transaction.atomic():
+            post = Post.objects.create(text='Пост', author=author)
+        queue.shutdown()
+        assert Task.objects.get(name=fan_out.task_name).status == Task.DONE, \
+            'Потоки сервера должны выполнить задачи после фиксации'
+        assert FeedEntry.objects.filter(user=user, post=post).exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_poll_runs_delayed_and_purges(self, settings, monkeypatch):
+        settings.TASK_POLL_INTERVAL = 0.05
+        settings.TASK_KEEP_DAYS = 0
+        settings.TASK_PURGE_INTERVAL = 0
+        monkeypatch.setattr(queue, '_last_purge', None)
+        queue.enqueue(flaky, 0, delay=timedelta(milliseconds=100))
+        assert calls == [], 'Отложенная задача не выполняется сразу'
+
+        queue.request_started()
+        deadline = time.monotonic() + 5
+        while not calls:
+            assert time.monotonic() < deadline, \
+                'Опрос очереди должен выполнить отложенную задачу'
+            time.sleep(0.01)
+        queue.shutdown()
+        assert calls == [0]
+        assert not Task.objects.exists(), \
+            'Выполненные задачи должны чиститься потоками сервера'
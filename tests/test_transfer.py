@@ -0,0 +1,91 @@
+import os
+
+import pytest
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from posts import counters, transfer
+from posts.models import Comment, FeedEntry, Follow, Post, TrendingScore
+
+
+@pytest.fixture
+def exported(tmp_path, user, group):
+    author = get_user_model().objects.create_user(username='TransferAuthor')
+    Follow.objects.create(user=user, author=author)
+    for i in range(5):
+        post = Post.objects.create(
+            text=f'Пост {i}', author=author, group=group,
+        )
+        Comment.objects.create(post=post, author=user, text=f'Ответ {i}')
+    path = tmp_path / 'export.jsonl'
+    with open(path, 'w', encoding='utf-8') as output:
+        transfer.export(output)
+    return str(path)
+
+
+def snapshot():
+    return (
+        sorted(Post.objects.values_list(
+            'text', 'pub_date', 'author__username', 'group__slug',
+        )),
+        sorted(Comment.objects.values_list(
+            'text', 'post__text', 'author__username',
+        )),
+        sorted(Follow.objects.values_list(
+            'user__username', 'author__username',
+        )),
+    )
+
+
+class TestTransfer:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_export_import_round_trip(self, exported):
+        before = snapshot()
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+
+        transfer.Importer(exported, batch_size=2).run()
+        assert snapshot() == before, \
+            'Проверьте, что после загрузки выгрузки данные совпадают'
+        assert FeedEntry.objects.count() == 5, \
+            'Проверьте, что после загрузки ленты пересобираются'
+        assert not list(counters.mismatches()), \
+            'Проверьте, что после загрузки счётчики пересчитываются'
+        assert TrendingScore.objects.count() == 5, \
+            'Проверьте, что после загрузки пересчитывается рейтинг популярного'
+        assert not os.path.exists(f'{exported}.checkpoint')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_resume_after_failure(self, monkeypatch, exported):
+        before = snapshot()
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+
+        build_comment = transfer.Importer._build_comment
+        calls = []
+
+        def failing(importer, batch, offset):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise RuntimeError('Сбой посреди загрузки')
+            return build_comment(importer, batch, offset)
+
+        monkeypatch.setattr(transfer.Importer, '_build_comment', failing)
+        with pytest.raises(RuntimeError):
+            transfer.Importer(exported, batch_size=2).run()
+        assert os.path.exists(f'{exported}.checkpoint')
+        assert Comment.objects.count() == 2
+
+        monkeypatch.setattr(transfer.Importer, '_build_comment', build_comment)
+        transfer.Importer(exported, batch_size=2).run()
+        assert snapshot() == before, \
+            'Проверьте, что повторный запуск догружает данные без дублей'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_import_dumpdata_array(self):
+        path = os.path.join(settings.BASE_DIR, 'dump.json')
+        done = transfer.Importer(path, batch_size=7).run()
+        assert done['posts.post'] == 48
+        assert Post.objects.count() == 48
+        assert Comment.objects.count() == 28
@@ -0,0 +1,125 @@
+import datetime
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Follow, Post, TrendingScore
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def posts(django_user_model, user):
+    author = django_user_model.objects.create_user(username='Popular')
+    return [
+        Post.objects.create(text=f'Пост {i}', author=author)
+        for i in range(3)
+    ]
+
+
+def scores():
+    return dict(TrendingScore.objects.values_list('post_id', 'score'))
+
+
+def ranked():
+    return list(trending.top().values_list('text', flat=True))
+
+
+class TestTrending:
+
+    @pytest.mark.django_db
+    def test_comments_and_followers(self, django_user_model, user, posts):
+        first, second, _ = posts
+        assert ranked() == ['Пост 2', 'Пост 1', 'Пост 0'], \
+            'Без комментариев свежий пост должен идти первым'
+        for _ in range(2):
+            Comment.objects.create(post=first, author=user, text='Комментарий')
+        assert ranked()[0] == 'Пост 0', \
+            'Проверьте, что комментарии поднимают пост в рейтинге'
+
+        other = django_user_model.objects.create_user(username='Other')
+        mine = Post.objects.create(text='Новый пост', author=other)
+        before = scores()[mine.pk]
+        Follow.objects.create(user=user, author=other)
+        assert scores()[mine.pk] > before, \
+            'Проверьте, что подписчики автора поднимают его посты'
+        assert scores()[second.pk] < scores()[first.pk]
+
+        Comment.objects.filter(post=first).delete()
+        Follow.objects.all().delete()
+        assert scores()[mine.pk] == pytest.approx(before), \
+            'Отписка должна возвращать рейтинг постов автора'
+        assert ranked()[:2] == ['Новый пост', 'Пост 2']
+
+    @pytest.mark.django_db
+    def test_matches_rebuild(self, django_user_model, user, posts):
+        Follow.objects.create(user=user, author=posts[0].author)
+        for post in posts[:2]:
+            Comment.objects.create(post=post, author=user, text='Комментарий')
+        Comment.objects.create(post=posts[0], author=user, text='Ещё')
+        incremental = scores()
+
+        trending.rebuild()
+        rebuilt = scores()
+        assert set(rebuilt) == set(incremental)
+        for pk, score in rebuilt.items():
+            assert incremental[pk] == pytest.approx(score), \
+                'Рейтинг, посчитанный по ходу записи, должен совпадать ' \
+                'с пересчитанным с нуля'
+
+    @pytest.mark.django_db
+    def test_post_delete_skips_comments(self, user, posts):
+        for number in range(10):
+            Comment.objects.create(
+                post=posts[0], author=user, text=f'Комментарий {number}',
+            )
+        with CaptureQueriesContext(connection) as queries:
+            posts[0].delete()
+        assert posts[0].pk not in scores()
+        touched = [q for q in queries if 'posts_trendingscore' in q['sql']]
+        assert len(touched) == 1, \
+            'Рейтинг удалённого поста не должен пересчитываться ' \
+            'по каждому комментарию'
+
+    @pytest.mark.django_db
+    def test_decay(self, user, posts):
+        old, recent, _ = posts
+        Comment.objects.create(post=old, author=user, text='Давний')
+        Comment.objects.create(post=recent, author=user, text='Свежий')
+        Comment.objects.filter(post=old).update(
+            created=timezone.now() - datetime.timedelta(days=2),
+        )
+        trending.rebuild()
+        assert scores()[recent.pk] > scores()[old.pk], \
+            'Проверьте, что давние комментарии весят меньше свежих'
+
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=timezone.now() - datetime.timedelta(days=30),
+        )
+        assert 'Пост 0' not in ranked(), \
+            'Устаревшие посты не должны показываться и до обрезки'
+        trending.trim()
+        assert old.pk not in scores(), \
+            'Устаревшие посты должны убираться из рейтинга'
+
+    @pytest.mark.django_db
+    def test_page(self, client, settings, user, posts):
+        settings.QUERY_BUDGET_STRICT = True
+        Comment.objects.create(post=posts[0], author=user, text='Комментарий')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/trending/')
+        assert response.status_code == 200
+        assert [post.text for post in response.context['page']] == [
+            'Пост 0', 'Пост 2', 'Пост 1',
+        ]
+        assert not [q for q in queries if 'posts_comment' in q['sql']], \
+            'Страница популярного не должна читать комментарии'
@@ -1,6 +1,8 @@
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
+from .validators import validate_username
+
 
 #  создадим собственный класс для формы регистрации
 #  сделаем его наследником предустановленного класса UserCreationForm
@@ -10,3 +12,8 @@ class CreationForm(UserCreationForm):
         model = User
         # укажем, какие поля должны быть видны в форме и в каком порядке
         fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data["username"]
+        validate_username(username)
+        return username
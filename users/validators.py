@@ -0,0 +1,17 @@
+from django.core.exceptions import ValidationError
+
+# Первые сегменты адресов сайта. Профиль /<username>/ с таким именем
+# перекрыли бы страницы сайта, поэтому зарегистрироваться под ним нельзя.
+# Новый адрес в корне сайта нужно добавить и сюда
+RESERVED_USERNAMES = frozenset({
+    '__debug__', 'about', 'admin', 'api', 'auth', 'follow', 'group',
+    'media', 'metrics', 'new', 'search', 'static', 'trending',
+})
+
+
+def validate_username(value):
+    if value in RESERVED_USERNAMES:
+        raise ValidationError(
+            'Это имя занято адресом сайта, выберите другое',
+            code='reserved',
+        )
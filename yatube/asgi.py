@@ -0,0 +1,145 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``:
+
+    uvicorn yatube.asgi:application
+
+Django 2.2 обрабатывает запросы только синхронно, поэтому ASGI-сервер
+получает адаптер: тело запроса принимается и ответ отправляется в цикле
+событий, а Django выполняет запрос в пуле из ASGI_THREADS потоков.
+Медленный клиент не занимает поток, пока загружает запрос или читает
+ответ, и число одновременных запросов к базе ограничено размером пула.
+"""
+
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+wsgi_application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402 — после настройки Django
+
+
+def build_environ(scope, body):
+    """WSGI environ по запросу ASGI и уже принятому телу."""
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('server'):
+        environ['SERVER_NAME'], port = scope['server']
+        environ['SERVER_PORT'] = str(port)
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope['headers']:
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin1')
+        if name in environ:
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = f'{environ[name]}{separator}{value}'
+        environ[name] = value
+    return environ
+
+
+class WsgiToAsgi:
+    """
+    ASGI-приложение поверх WSGI-приложения. Ответ собирается целиком
+    в потоке пула, вместе с чтением из базы для потоковых ответов,
+    и отправляется клиенту уже после того, как поток освободился.
+    """
+
+    def __init__(self, wsgi_application, executor):
+        self.wsgi_application = wsgi_application
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемое соединение {scope["type"]}')
+        body = io.BytesIO()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        loop = asyncio.get_running_loop()
+        status, headers, chunks = await loop.run_in_executor(
+            self.executor, self.run, build_environ(scope, body),
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        for chunk in chunks:
+            await send({
+                'type': 'http.response.body',
+                'body': chunk,
+                'more_body': True,
+            })
+        await send({'type': 'http.response.body'})
+
+    def run(self, environ):
+        """Выполняет запрос в потоке пула: (статус, заголовки, части тела)."""
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [
+                int(status.split()[0]),
+                [
+                    (name.lower().encode('latin1'), value.encode('latin1'))
+                    for name, value in headers
+                ],
+            ]
+
+        response = self.wsgi_application(environ, start_response)
+        try:
+            chunks = [chunk for chunk in response if chunk]
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return started[0], started[1], chunks
+
+    @staticmethod
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = WsgiToAsgi(
+    wsgi_application,
+    ThreadPoolExecutor(
+        max_workers=settings.ASGI_THREADS,
+        thread_name_prefix='asgi',
+    ),
+)
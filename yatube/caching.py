@@ -0,0 +1,90 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_response_headers
+
+from . import metrics
+
+LOCK_TIMEOUT = 10
+WAIT_STEP = 0.05
+
+
+def _wait_for(key):
+    deadline = time.time() + LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_build(key, build, timeout, stale_timeout=None):
+    """
+    Значение из кеша с защитой от одновременной пересборки.
+
+    После timeout секунд значение считается устаревшим, но ещё
+    stale_timeout секунд хранится в кеше. Пересобирает его только
+    процесс, захвативший блокировку, остальные отдают старое значение.
+    Если значения нет совсем, остальные ждут сборки до LOCK_TIMEOUT.
+    build() может вернуть None — такое значение не кешируется.
+    """
+    if stale_timeout is None:
+        stale_timeout = settings.CACHE_STALE_TIMEOUT
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    if entry is not None and time.time() < entry[0]:
+        metrics.count_cache('hit')
+        return entry[1]
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not locked:
+        if entry is None:
+            entry = _wait_for(key)
+        if entry is not None:
+            metrics.count_cache('stale')
+            return entry[1]
+    metrics.count_cache('miss')
+    try:
+        value = build()
+        if value is not None:
+            cache.set(
+                key,
+                (time.time() + timeout, value),
+                timeout + stale_timeout,
+            )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
+
+
+def cache_page_shared(timeout, key_prefix):
+    """
+    Замена cache_page для общего кеша: страница кешируется отдельно
+    для каждого пользователя и адреса и пересобирается одним процессом.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            user = request.user.pk if request.user.is_authenticated else ''
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            built = []
+
+            def build():
+                response = view(request, *args, **kwargs)
+                built.append(response)
+                if response.status_code != 200 or response.streaming:
+                    return None
+                patch_response_headers(response, timeout)
+                return response
+
+            response = get_or_build(f'{key_prefix}:{user}:{path}', build,
+                                    timeout)
+            return response if response is not None else built[0]
+        return wrapper
+    return decorator
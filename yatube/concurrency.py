@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import routers
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.READ_THREADS,
+            thread_name_prefix='reads',
+        )
+    return _executor
+
+
+def _run(call, replica, wrappers):
+    """
+    Выполняет чтение в потоке пула так, как если бы оно шло в потоке
+    запроса: из той же реплики и с теми же обёртками SQL-запросов,
+    которые считают их для метрик и бюджета страницы.
+    """
+    with ExitStack() as stack:
+        stack.enter_context(routers.reading_from(replica))
+        for alias, functions in wrappers.items():
+            for function in functions:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(function),
+                )
+        try:
+            return call()
+        finally:
+            for connection in connections.all():
+                connection.close_if_unusable_or_obsolete()
+
+
+def gather(*calls):
+    """
+    Выполняет независимые чтения одновременно в пуле из READ_THREADS
+    потоков и возвращает их результаты по порядку. Исключение первого
+    упавшего чтения, например Http404, поднимается в вызывающем потоке.
+    У каждого потока своё соединение с базой, поэтому внутри открытой
+    транзакции чтения идут по очереди: незафиксированные изменения
+    другим соединениям не видны.
+    """
+    if settings.READ_THREADS < 2 or len(calls) < 2 or \
+            connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return [call() for call in calls]
+    replica = routers.current_replica()
+    wrappers = {
+        connection.alias: list(connection.execute_wrappers)
+        for connection in connections.all()
+    }
+    futures = [
+        executor().submit(_run, call, replica, wrappers)
+        for call in calls[1:]
+    ]
+    # Первое чтение идёт в потоке запроса, чтобы не ждать свободный поток
+    results = [calls[0]()]
+    return results + [future.result() for future in futures]
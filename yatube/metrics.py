@@ -0,0 +1,286 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+# Счётчики фоновой работы вне запросов: имя и описание
+COUNTERS = {
+    'notifications_sent': 'Отправлено писем-дайджестов',
+    'notification_batches': 'Пачек писем, отправленных через соединение',
+    'notification_seconds': 'Время отправки писем',
+}
+# Сколько самых медленных SQL-запросов попадает в лог медленного запроса
+SLOW_TRACE_QUERIES = 5
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus с меткой view."""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.counts = defaultdict(lambda: [0] * len(buckets))
+        self.sums = defaultdict(float)
+        self.totals = defaultdict(int)
+
+    def observe(self, view, value):
+        counts = self.counts[view]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self.sums[view] += value
+        self.totals[view] += 1
+
+    def lines(self):
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} histogram'
+        for view in sorted(self.totals):
+            label = f'view="{view}"'
+            for bound, count in zip(self.buckets, self.counts[view]):
+                yield f'{self.name}_bucket{{{label},le="{bound}"}} {count}'
+            total = self.totals[view]
+            yield f'{self.name}_bucket{{{label},le="+Inf"}} {total}'
+            yield f'{self.name}_sum{{{label}}} {self.sums[view]:.6f}'
+            yield f'{self.name}_count{{{label}}} {total}'
+
+
+class Registry:
+    """Метрики процесса: гистограммы по страницам и счётчики кеша."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.histograms = {
+            'duration': Histogram(
+                'yatube_request_duration_seconds',
+                'Время ответа',
+                DURATION_BUCKETS,
+            ),
+            'queries': Histogram(
+                'yatube_db_queries',
+                'Число SQL-запросов за запрос',
+                QUERY_BUCKETS,
+            ),
+            'sql': Histogram(
+                'yatube_db_duration_seconds',
+                'Время SQL-запросов за запрос',
+                DURATION_BUCKETS,
+            ),
+            'templates': Histogram(
+                'yatube_template_duration_seconds',
+                'Время отрисовки шаблонов за запрос',
+                DURATION_BUCKETS,
+            ),
+        }
+        self.cache = defaultdict(int)
+        self.counters = defaultdict(float)
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def record(self, stats):
+        with self.lock:
+            self.histograms['duration'].observe(stats.view, stats.duration)
+            self.histograms['queries'].observe(stats.view, stats.queries)
+            self.histograms['sql'].observe(stats.view, stats.sql_time)
+            self.histograms['templates'].observe(
+                stats.view, stats.template_time,
+            )
+            for result, count in stats.cache.items():
+                self.cache[stats.view, result] += count
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for histogram in self.histograms.values():
+                lines.extend(histogram.lines())
+            lines.append('# HELP yatube_cache_total Обращения к кешу страниц')
+            lines.append('# TYPE yatube_cache_total counter')
+            for (view, result), count in sorted(self.cache.items()):
+                lines.append(
+                    f'yatube_cache_total{{view="{view}",result="{result}"}} '
+                    f'{count}'
+                )
+            for name, description in COUNTERS.items():
+                lines.append(f'# HELP yatube_{name}_total {description}')
+                lines.append(f'# TYPE yatube_{name}_total counter')
+                lines.append(
+                    f'yatube_{name}_total {self.counters[name]:g}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestStats:
+    def __init__(self, request):
+        self.request = request
+        self.view = 'unknown'
+        self.budget = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.duration = 0.0
+        self.cache = defaultdict(int)
+        self.slowest = []
+
+    def on_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            spent = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += spent
+            self.slowest.append((spent, sql))
+            self.slowest.sort(reverse=True)
+            del self.slowest[SLOW_TRACE_QUERIES:]
+
+    def trace(self, status):
+        return {
+            'view': self.view,
+            'method': self.request.method,
+            'path': self.request.get_full_path(),
+            'status': status,
+            'duration_ms': round(self.duration * 1000, 1),
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 1),
+            'templates_ms': round(self.template_time * 1000, 1),
+            'cache': dict(self.cache),
+            'slowest_sql': [
+                {'ms': round(spent * 1000, 1), 'sql': sql[:500]}
+                for spent, sql in self.slowest
+            ],
+        }
+
+
+def current():
+    """Замеры текущего запроса или None вне запроса."""
+    return getattr(_local, 'stats', None)
+
+
+def count_cache(result):
+    """Отмечает обращение к кешу: hit, stale или miss."""
+    stats = current()
+    if stats is not None:
+        stats.cache[result] += 1
+
+
+def query_budget(limit):
+    """
+    Сколько SQL-запросов может сделать страница. Превышение попадает
+    в лог, а при QUERY_BUDGET_STRICT — становится ошибкой.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class MetricsMiddleware:
+    """
+    Считает для каждой страницы время ответа, число и время SQL-запросов,
+    время отрисовки шаблонов и обращения к кешу. Медленные запросы
+    пишутся в лог yatube.metrics одной строкой JSON.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats(request)
+        _local.stats = stats
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(stats.on_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        stats.duration = time.perf_counter() - started
+        match = request.resolver_match
+        if match is not None and match.url_name:
+            stats.view = match.url_name
+        registry.record(stats)
+
+        if stats.duration >= settings.SLOW_REQUEST_SECONDS:
+            logger.warning(
+                'slow request %s',
+                json.dumps(stats.trace(response.status_code)),
+            )
+        if stats.budget is not None and stats.queries > stats.budget:
+            message = (
+                f'{stats.view}: {stats.queries} SQL-запросов '
+                f'при бюджете {stats.budget}'
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current()
+        if stats is not None:
+            stats.budget = getattr(view_func, 'query_budget', None)
+
+
+def metrics_view(request):
+    """Метрики процесса в текстовом формате Prometheus."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats = current()
+            if stats is not None:
+                stats.template_time += time.perf_counter() - started
+
+
+class Templates(DjangoTemplates):
+    """Шаблоны Django, которые замеряют время отрисовки страницы."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,101 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Ключ сессии: пользователь что-то записал, и до конца сессии
+# он читает только из основной базы, чтобы сразу видеть свои записи
+PIN_SESSION_KEY = 'db_pinned'
+# Таблицы, которые всегда читаются из основной базы: сессия и
+# пользователь после входа или регистрации должны быть видны сразу,
+# а не после репликации
+PRIMARY_APPS = ('sessions', 'auth')
+
+_local = threading.local()
+
+
+def read_only(view):
+    """Представление только читает: его запросы можно отдать реплике."""
+    view.replica_reads = True
+    return view
+
+
+def use_primary(view):
+    """
+    Представление пишет: сессия закрепляется за основной базой, и
+    все следующие страницы пользователь читает уже из неё.
+    """
+    view.pins_primary = True
+    return view
+
+
+def current_replica():
+    """Реплика, из которой читает текущий поток, или None."""
+    return getattr(_local, 'replica', None)
+
+
+@contextmanager
+def reading_from(alias):
+    """Направляет чтение текущего потока в реплику alias."""
+    previous = current_replica()
+    _local.replica = alias
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+class ReplicaMiddleware:
+    """Выбирает реплику для представлений, помеченных @read_only."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.replica = None
+        try:
+            return self.get_response(request)
+        finally:
+            _local.replica = None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Представление с обоими декораторами (например, в API)
+        # читает из реплики на GET и закрепляет сессию на записи
+        safe = request.method in ('GET', 'HEAD')
+        reads = getattr(view_func, 'replica_reads', False)
+        if getattr(view_func, 'pins_primary', False) and \
+                not (safe and reads):
+            if request.user.is_authenticated and \
+                    not request.session.get(PIN_SESSION_KEY):
+                request.session[PIN_SESSION_KEY] = True
+            return
+        if not settings.DATABASE_REPLICAS:
+            return
+        if reads and not request.session.get(PIN_SESSION_KEY):
+            # Одна реплика на весь запрос, чтобы страница была согласованной
+            _local.replica = random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    """
+    Чтение в представлениях @read_only идёт в одну из реплик
+    DATABASE_REPLICAS, всё остальное — в основную базу. Реплики
+    не мигрируются: их содержимое копируется с основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return None
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        # Явно, иначе объект, прочитанный из реплики, сохранялся бы в неё
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
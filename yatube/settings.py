@@ -42,6 +42,8 @@ INSTALLED_APPS = [
     'users',
     'posts',
     'about',
+    'tasks',
+    'api',
     'ckeditor',
     'django.contrib.sites',
     'django.contrib.flatpages',
@@ -56,8 +58,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'yatube.routers.ReplicaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -71,7 +75,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.Templates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -92,12 +96,52 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# Профиль базы выбирается переменной окружения YATUBE_DB.
+# production — SQLite в режиме WAL (см. yatube/sqlite/base.py)
+# с соединениями, которые живут между запросами, и отдельными
+# соединениями только на чтение к тому же файлу.
+# replica — основная база и реплика в отдельном файле, которую
+# обновляет команда replicate; так проверяется отставание реплики.
+# Все базы, кроме default, считаются репликами (yatube/routers.py)
+DATABASE_PATH = os.path.join(BASE_DIR, 'db.sqlite3')
+PRIMARY_DATABASE = {
+    'ENGINE': 'yatube.sqlite',
+    'NAME': DATABASE_PATH,
+    'CONN_MAX_AGE': 600,
+    'OPTIONS': {'timeout': 5},
+}
+
+
+def replica_database(path):
+    return {
+        **PRIMARY_DATABASE,
+        'NAME': path,
+        'OPTIONS': {'timeout': 5, 'pragmas': {'query_only': 1}},
+        'TEST': {'MIRROR': 'default'},
     }
+
+
+DATABASE_PROFILES = {
+    'dev': {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': DATABASE_PATH,
+        },
+    },
+    'production': {
+        'default': PRIMARY_DATABASE,
+        'read': replica_database(DATABASE_PATH),
+    },
+    'replica': {
+        'default': PRIMARY_DATABASE,
+        'replica': replica_database(
+            os.path.join(BASE_DIR, 'replica.sqlite3'),
+        ),
+    },
 }
+DATABASES = DATABASE_PROFILES[os.environ.get('YATUBE_DB', 'dev')]
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
 
 
 # Password validation
@@ -163,9 +207,91 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 # Идентификатор текущего сайта
 SITE_ID = 1
 
-CACHES = {
-    'default': {
+# Кеш выбирается переменной окружения YATUBE_CACHE. locmem у каждого
+# процесса свой, остальные варианты общие для всех процессов сервера:
+# file — каталог на локальном диске, db — таблица в SQLite (создаётся
+# командой createcachetable), memcached — сервер из YATUBE_CACHE_LOCATION
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION', '127.0.0.1:11211'),
+    },
 }
-
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'locmem')],
+}
+# Сколько секунд после устаревания страница из кеша ещё отдаётся,
+# пока один из процессов строит новую
+CACHE_STALE_TIMEOUT = 60
+
+# Авторы с таким числом подписчиков и больше не раскладываются по лентам
+# подписчиков при публикации, их посты подмешиваются в ленту при чтении
+FEED_FANOUT_LIMIT = 1000
+
+# Сколько секунд процесс хранит группу, найденную по slug. Правка
+# в этом же процессе сбрасывает её сразу, в остальных — за это время
+GROUP_CACHE_SECONDS = 60
+
+# Вклад комментария и подписчиков автора в рейтинг «Популярного»
+# убывает вдвое за TRENDING_HALF_LIFE_HOURS часов. Посты старше
+# TRENDING_DAYS дней из рейтинга убираются
+TRENDING_HALF_LIFE_HOURS = 12
+TRENDING_DAYS = 7
+
+# Фоновые задачи (раскладка постов по лентам, миниатюры) хранятся
+# в таблице tasks_task. YATUBE_TASKS выбирает, кто их выполняет:
+# thread — TASK_THREADS потоков процесса сервера после фиксации
+# транзакции; inline — сразу при постановке, в том же запросе;
+# worker — только отдельный процесс python manage.py run_tasks.
+# В режимах thread и inline процесс сервера раз в TASK_POLL_INTERVAL
+# секунд сам проверяет очередь: так выполняются отложенные задачи.
+# Выполненные задачи хранятся TASK_KEEP_DAYS дней, а чистятся не чаще
+# раза в TASK_PURGE_INTERVAL секунд
+TASKS_MODE = os.environ.get('YATUBE_TASKS', 'thread')
+TASK_THREADS = 2
+TASK_POLL_INTERVAL = 5
+TASK_KEEP_DAYS = 7
+TASK_PURGE_INTERVAL = 60 * 60
+
+# Независимые чтения страниц профиля и поста (автор со счётчиками,
+# страница постов или пост, подписка) могут идти одновременно в пуле
+# из READ_THREADS потоков; 0 — по очереди в потоке запроса. С локальным
+# SQLite чтение занимает доли миллисекунды и передача в поток стоит
+# дороже, пул окупается, когда база отвечает по сети.
+# ASGI_THREADS — сколько запросов одновременно выполняет Django
+# под ASGI-сервером (yatube/asgi.py)
+READ_THREADS = 0
+ASGI_THREADS = 8
+
+# Письма подписчикам о новых постах собираются в один дайджест
+# за окно NOTIFY_DIGEST_MINUTES и уходят пачками по NOTIFY_BATCH_SIZE
+# писем через одно соединение с почтовым сервером
+NOTIFY_DIGEST_MINUTES = 60
+NOTIFY_BATCH_SIZE = 100
+# Ширины и форматы, в которых сохраняются картинки постов для srcset.
+# jpeg нужен всегда: это запасной вариант для старых браузеров
+POST_IMAGE_WIDTHS = (360, 720, 960, 1440)
+POST_IMAGE_FORMATS = ('webp', 'jpeg')
+# Число процессов, кодирующих картинки. None — по числу ядер,
+# 0 — кодировать в том же процессе
+IMAGE_PROCESSES = None
+
+# Запросы дольше стольких секунд пишутся в лог yatube.metrics
+# вместе с самыми медленными SQL-запросами
+SLOW_REQUEST_SECONDS = 0.5
+# Превышение бюджета SQL-запросов страницы: False — предупреждение
+# в логе, True — ошибка (включается в тестах)
+QUERY_BUDGET_STRICT = False
+# С каких адресов доступна страница /metrics
+METRICS_ALLOWED_IPS = INTERNAL_IPS
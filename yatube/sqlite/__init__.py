@@ -0,0 +1,43 @@
+import random
+import time
+from functools import wraps
+
+from django.db import OperationalError, connections, transaction
+
+RETRY_ATTEMPTS = 5
+RETRY_DELAY = 0.05
+
+
+def is_locked(error):
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def retry_on_lock(view=None, using='default', attempts=RETRY_ATTEMPTS,
+                  delay=RETRY_DELAY):
+    """
+    Выполняет функцию в транзакции и повторяет её, если SQLite ответил
+    «database is locked». В WAL читатели не мешают писателю, но пишет
+    только одна транзакция за раз, а транзакция, начавшаяся с чтения,
+    получает эту ошибку сразу, не дожидаясь busy timeout, если другая
+    транзакция успела записать раньше. Пауза между попытками растёт
+    вдвое, со случайным разбросом, чтобы писатели не сталкивались снова.
+    Внутри уже открытой транзакции повторять нечего: функция просто
+    вызывается.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if connections[using].in_atomic_block:
+                return function(*args, **kwargs)
+            for attempt in range(attempts):
+                try:
+                    with transaction.atomic(using=using):
+                        return function(*args, **kwargs)
+                except OperationalError as error:
+                    if not is_locked(error) or attempt == attempts - 1:
+                        raise
+                time.sleep(delay * 2 ** attempt * random.uniform(0.5, 1.5))
+        return wrapper
+    if view is not None:
+        return decorator(view)
+    return decorator
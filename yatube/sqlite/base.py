@@ -0,0 +1,30 @@
+from django.db.backends.sqlite3 import base
+
+# Настройки соединения для нагруженного сервера: журнал WAL, чтобы
+# чтение не ждало записи, fsync только при контрольных точках WAL,
+# временные таблицы в памяти и чтение файла базы через mmap
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite, который при открытии соединения выполняет PRAGMA
+    из OPTIONS['pragmas'] поверх PRAGMAS.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
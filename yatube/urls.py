@@ -3,6 +3,8 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from yatube.metrics import metrics_view
+
 handler404 = "posts.views.page_not_found"
 handler500 = "posts.views.server_error"
 
@@ -11,6 +13,8 @@ urlpatterns = [
         path('about/', include('about.urls', namespace='about')),
         path('auth/', include('users.urls')),
         path('auth/', include('django.contrib.auth.urls')),
+        path('api/v1/', include('api.urls', namespace='api')),
+        path('metrics', metrics_view, name='metrics'),
         path('', include('posts.urls')),
     ]
 